@@ -0,0 +1,95 @@
+"""
+Benchmark of the ordering strategies of `create_collection_query`, fetching the first page of
+a large table ordered by a string column:
+
+    python benchmarks/order_by_strategies.py --rows 500000
+
+For each strategy, prints the SQLite query plan and the mean time to fetch the page. Plans with
+"USE TEMP B-TREE FOR ORDER BY" sort every row of the table instead of walking an index.
+"""
+import argparse
+import random
+import string
+import timeit
+
+from sqlalchemy import Column, Index, Integer, String, create_engine, func, select, text
+from sqlalchemy.orm import declarative_base
+
+from flask_restalchemy.resources.querybuilder import (
+    CollationOrder,
+    NormalizedColumnOrder,
+    create_collection_query,
+    lower_order,
+    raw_order,
+)
+
+Base = declarative_base()
+
+
+class Customer(Base):
+
+    __tablename__ = "Customer"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    city = Column(String(50))
+    # Lower case copy of name, maintained by the application
+    name_key = Column(String(50))
+
+
+STRATEGIES = {
+    "lower() without expression index": ("city", lower_order),
+    "raw": ("name", raw_order),
+    "lower() with expression index": ("name", lower_order),
+    "NOCASE collation": ("name", CollationOrder("NOCASE")),
+    "normalized column": ("name", NormalizedColumnOrder("name_key")),
+}
+
+
+def create_table(engine, rows):
+    Base.metadata.create_all(engine)
+    Index("ix_customer_name", Customer.name).create(engine)
+    Index("ix_customer_name_lower", func.lower(Customer.name)).create(engine)
+    Index("ix_customer_name_nocase", Customer.name.collate("NOCASE")).create(engine)
+    Index("ix_customer_name_key", Customer.name_key).create(engine)
+
+    random.seed(0)
+    letters = string.ascii_letters
+    with engine.begin() as connection:
+        for start in range(0, rows, 50000):
+            values = []
+            for _ in range(start, min(start + 50000, rows)):
+                name = "".join(random.choices(letters, k=12))
+                city = "".join(random.choices(letters, k=12))
+                values.append({"name": name, "city": city, "name_key": name.lower()})
+            connection.execute(Customer.__table__.insert(), values)
+        connection.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--url", default="sqlite://")
+    options = parser.parse_args()
+
+    engine = create_engine(options.url)
+    create_table(engine, options.rows)
+    with engine.connect() as connection:
+        for title, (field_name, strategy) in STRATEGIES.items():
+            args = {"order_by": field_name, "limit": 20}
+            statement = create_collection_query(
+                select(Customer), Customer, None, args, {field_name: strategy}
+            )
+            compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+            elapsed = timeit.timeit(
+                lambda: connection.execute(statement).fetchall(), number=options.repeat
+            )
+            print(f"{title}: {elapsed / options.repeat * 1000:.2f} ms")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+
+if __name__ == "__main__":
+    main()
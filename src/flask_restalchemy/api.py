@@ -1,14 +1,30 @@
+import math
+import time
 from collections.abc import Mapping
+from http import HTTPStatus
 
-from flask import current_app
+from flask import abort, current_app, g, has_request_context, request
 
+from .resources.async_resources import (
+    AsyncCollectionPropertyResource,
+    AsyncModelResource,
+    AsyncToManyRelationResource,
+)
 from .resources.resources import (
+    BaseModelResource,
     BaseResource,
+    ChangeStreamResource,
     CollectionPropertyResource,
     ModelResource,
+    NestedRelationResource,
     ToManyRelationResource,
+    ToManyRelationLinksResource,
     ViewFunctionResource,
+    is_read_request,
 )
+from .batch import CROSS_SHARD_BATCH_ERROR, DEFAULT_MAX_REQUESTS, BatchResource
+from .bulkimport import DEFAULT_IMPORT_BATCH_SIZE
+from .routing import close_request_sessions, get_request_session, get_session_key
 from .serialization import ColumnSerializer, ModelSerializer
 
 
@@ -18,18 +34,80 @@ class Api:
 
     :param callable request_decorators: request decorators for this API object (see
         Flask-Restful decorators docs for more information)
+
+    :param callable async_session_factory: callable that returns a new SQLAlchemy
+        ``AsyncSession`` (like an ``async_sessionmaker``), used by resources added with
+        `asynchronous=True`
+
+    :param str read_replica_bind: Flask-SQLAlchemy bind key (see ``SQLALCHEMY_BINDS``) of a
+        read replica. If set, GET and HEAD requests get sessions bound to the replica, while
+        other requests use the primary database.
+
+    :param float read_your_writes: number of seconds that GET and HEAD requests from a client
+        keep using the primary database after that client writes. The last write time is kept
+        in a cookie. Only used with `read_replica_bind`.
+
+    :param ShardRouter shard_router: routes the sessions of requests to the database shard of
+        their tenant (see :class:`flask_restalchemy.routing.ShardRouter`). Requests without a
+        shard key use the default session.
+
+    :param QueryGuardrails guardrails: default limits on the page sizes, the duration and the
+        cost of the queries of the model resources (see :mod:`flask_restalchemy.guardrails`)
+
+    :param SingleFlight single_flight: coalesces identical concurrent GET requests of the
+        model resources (see :mod:`flask_restalchemy.coalescing`)
+
+    :param ChangeBroker change_broker: if given, the models created, updated and deleted by the
+        model resources are published to the broker, streamed by the models added with
+        `change_stream=True` (see :mod:`flask_restalchemy.changes`)
+
+    :param ReferenceCache reference_cache: snapshots of the models added with
+        `reference=True`, invalidated by the writes of the model resources (see
+        :mod:`flask_restalchemy.reference`)
+
+    :param DumpCache dump_cache: cache of the models serialized by the model resources,
+        discarding the models they write (see :mod:`flask_restalchemy.memoization`)
     """
 
-    def __init__(self, blueprint=None, request_decorators=None):
+    def __init__(
+        self,
+        blueprint=None,
+        request_decorators=None,
+        async_session_factory=None,
+        read_replica_bind=None,
+        read_your_writes=None,
+        shard_router=None,
+        guardrails=None,
+        single_flight=None,
+        change_broker=None,
+        reference_cache=None,
+        dump_cache=None,
+    ):
         """Constructor"""
         # noinspection PyPackageRequirements
         self.default_mediatype = "application/json"
-        self._blueprint = blueprint
+        self._blueprint = None
         self._db = None
+        self._async_session_factory = async_session_factory
+        self._read_replica_bind = read_replica_bind
+        self._read_your_writes = read_your_writes
+        self._shard_router = shard_router
+        self._guardrails = guardrails
+        self._single_flight = single_flight
+        self._change_broker = change_broker
+        self._reference_cache = reference_cache
+        self._dump_cache = dump_cache
         self._api_request_decorators = ResourceDecorators(request_decorators)
+        if blueprint is not None:
+            self.init_app(blueprint)
 
     def init_app(self, blueprint):
         self._blueprint = blueprint
+        if self._read_replica_bind is not None:
+            blueprint.after_request(self._mark_client_write)
+            blueprint.teardown_request(close_request_sessions)
+        if self._shard_router is not None:
+            self._shard_router.init_app(blueprint)
 
     def add_model(
         self,
@@ -40,6 +118,18 @@ class Api:
         request_decorators=None,
         methods=None,
         query_modifier=None,
+        asynchronous=False,
+        read_only_get=False,
+        full_text_search=None,
+        order_by_strategies=None,
+        guardrails=None,
+        single_flight=None,
+        incremental_sync=None,
+        change_stream=False,
+        related_counts=None,
+        reference=False,
+        bulk_import=False,
+        import_batch_size=DEFAULT_IMPORT_BATCH_SIZE,
     ):
         """
         Create API endpoints for the given SQLAlchemy declarative class.
@@ -64,7 +154,53 @@ class Api:
         :param callable query_modifier: function that returns a query and expects a `model` as parameter that
             should be used to create the query and expects a `parent_query` to be incremented with the callback query
             function. The method signature should look like this: query_callback(resource_model, parent_query)
+
+        :param bool asynchronous: if True, use :class:`AsyncModelResource`, backed by the
+            `async_session_factory` sessions
+
+        :param bool read_only_get: if True, GET requests run in read-only transactions (see
+            :class:`BaseModelResource`)
+
+        :param FullTextSearch full_text_search: if given, collections could be searched by the
+            `q` request argument (see :mod:`flask_restalchemy.fulltext`)
+
+        :param dict order_by_strategies: ordering strategies by field name, like
+            `{"name": CollationOrder("NOCASE")}` (see :func:`create_collection_query`)
+
+        :param QueryGuardrails guardrails: limits on the queries of the resource, overriding
+            the `Api` guardrails (see :mod:`flask_restalchemy.guardrails`)
+
+        :param SingleFlight single_flight: coalesces identical concurrent GET requests,
+            overriding the `Api` single flight (see :mod:`flask_restalchemy.coalescing`)
+
+        :param IncrementalSync incremental_sync: if given, collections could be requested in
+            delta mode by the `since` argument, returning the rows changed since a watermark
+            (see :mod:`flask_restalchemy.sync`)
+
+        :param bool change_stream: if True, the changes of the model are streamed as
+            Server-Sent Events by `{url}/events`, using the `Api` change broker (see
+            :class:`ChangeStreamResource`)
+
+        :param list related_counts: names of the to-many relationships of the model whose
+            number of related rows could be requested with collections, like
+            ``?counts=employees`` (see :class:`BaseModelResource`)
+
+        :param bool reference: if True, the model is a read-mostly reference table: item GETs
+            and the collection GETs without arguments are served from its snapshot on the `Api`
+            reference cache (see :class:`flask_restalchemy.reference.ReferenceCache`)
+
+        :param bool bulk_import: if True, rows could be imported in bulk by POST requests to
+            `{url}/import`, streaming an NDJSON or CSV body (see
+            :meth:`ModelResource._bulk_import`)
+
+        :param int import_batch_size: number of rows of the batches of bulk imports, each one
+            committed on its own
         """
+        if reference:
+            assert self._reference_cache is not None, "Api created without a reference_cache"
+            assert query_modifier is None, "query_modifier is not supported by reference models"
+        if bulk_import:
+            assert not asynchronous, "bulk_import is not supported by async resources"
         view_name = view_name or model.__tablename__
         if not serializer_class:
             serializer = self.create_default_serializer(model)
@@ -72,16 +208,50 @@ class Api:
             serializer = serializer_class(model)
         url = url if url is not None else "/" + view_name.lower()
 
-        view_init_args = (model, serializer, self.get_db_session, query_modifier)
+        view_init_args = (
+            model,
+            serializer,
+            self._session_getter(asynchronous),
+            query_modifier,
+        )
         decorators = self._create_decorators(request_decorators)
-        self.add_resource(
-            ModelResource,
+        view_func = self.add_resource(
+            AsyncModelResource if asynchronous else ModelResource,
             url,
             view_name,
             view_init_args,
             decorators=decorators,
+            resource_init_kwargs=self._resource_init_kwargs(
+                asynchronous,
+                read_only_get=read_only_get,
+                full_text_search=full_text_search,
+                order_by_strategies=order_by_strategies,
+                guardrails=guardrails,
+                single_flight=single_flight,
+                incremental_sync=incremental_sync,
+                related_counts=related_counts,
+                reference=reference,
+                import_batch_size=import_batch_size,
+            ),
             methods=methods,
         )
+        if bulk_import:
+            self._blueprint.add_url_rule(
+                f"{url}/import",
+                defaults={"bulk_import": True},
+                view_func=view_func,
+                methods=["POST"],
+            )
+        if change_stream:
+            assert self._change_broker is not None, "Api created without a change_broker"
+            view_func = ChangeStreamResource.as_view(
+                f"{view_name}_events",
+                model,
+                serializer,
+                self._change_broker,
+                request_decorators=decorators,
+            )
+            self._blueprint.add_url_rule(f"{url}/events", view_func=view_func, methods=["GET"])
 
     def add_relation(
         self,
@@ -92,12 +262,24 @@ class Api:
         endpoint_name=None,
         methods=None,
         query_modifier=None,
+        asynchronous=False,
+        read_only_get=False,
+        full_text_search=None,
+        order_by_strategies=None,
+        guardrails=None,
+        single_flight=None,
+        multi_parent=False,
+        related_counts=None,
+        incremental_sync=None,
     ):
         """
         Create API endpoints for the given SQLAlchemy relationship.
 
         :param relation_property: model relationship representing the collection to receive the
-            CRUD operations.
+            CRUD operations. A list of relationships, each one from the target model of the
+            previous one, creates a nested route, like
+            `/company/<int:relation_id_0>/employees/<int:relation_id>/contacts` for
+            ``[Company.employees, Employee.contacts]`` (see :class:`NestedRelationResource`).
 
         :param string url_rule: one or more url routes to match for the resource, standard
              flask routing rules apply. Defaults to model name in lower case.
@@ -117,7 +299,48 @@ class Api:
         :param callable query_modifier: function that returns a query and expects a `model` as parameter that
             should be used to create the query and expects a `parent_query` to be incremented with the callback query
             function. The method signature should look like this: query_callback(resource_model, parent_query)
+
+        :param bool asynchronous: if True, use :class:`AsyncToManyRelationResource`, backed by
+            the `async_session_factory` sessions
+
+        :param bool read_only_get: if True, GET requests run in read-only transactions (see
+            :class:`BaseModelResource`)
+
+        :param FullTextSearch full_text_search: if given, collections could be searched by the
+            `q` request argument (see :mod:`flask_restalchemy.fulltext`)
+
+        :param dict order_by_strategies: ordering strategies by field name, like
+            `{"name": CollationOrder("NOCASE")}` (see :func:`create_collection_query`)
+
+        :param QueryGuardrails guardrails: limits on the queries of the resource, overriding
+            the `Api` guardrails (see :mod:`flask_restalchemy.guardrails`)
+
+        :param SingleFlight single_flight: coalesces identical concurrent GET requests,
+            overriding the `Api` single flight (see :mod:`flask_restalchemy.coalescing`)
+
+        :param bool multi_parent: if True, the children of many parents could be fetched at
+            once by the url rule without the `<int:relation_id>` segment, like
+            `/company/employees?relation_ids=1,2,3` (see
+            :meth:`ToManyRelationResource._parents_response`)
+
+        :param list related_counts: names of the to-many relationships of the model whose
+            number of related rows could be requested with collections, like
+            ``?counts=employees`` (see :class:`BaseModelResource`)
+
+        :param IncrementalSync incremental_sync: if given, the children could be requested in
+            delta mode by the `since` argument (see :meth:`add_model`). Deleted ids are the ones
+            of any deleted row of the model, not only of the children of the parent.
         """
+        relation_path = None
+        if isinstance(relation_property, (list, tuple)):
+            relation_path = list(relation_property)
+            relation_property = relation_path[-1]
+            assert not asynchronous, "Nested relations are not supported by async resources"
+            assert not multi_parent, "multi_parent is not supported by nested relations"
+            for prop, next_prop in zip(relation_path, relation_path[1:]):
+                assert issubclass(
+                    prop.prop.mapper.class_, next_prop.class_
+                ), f"{next_prop} is not a relationship of the target of {prop}"
         model = relation_property.prop.mapper.class_
         related_model = relation_property.class_
         view_name = f"{model.__name__}_{related_model.__name__}".lower()
@@ -126,6 +349,21 @@ class Api:
             serializer = self.create_default_serializer(model)
         else:
             serializer = serializer_class(model)
+        if relation_path:
+            view_name = "_".join(
+                [relation_path[0].class_.__name__]
+                + [prop.prop.mapper.class_.__name__ for prop in relation_path]
+            ).lower()
+            if url_rule:
+                assert all(
+                    f"<int:relation_id_{index}>" in url_rule
+                    for index in range(len(relation_path) - 1)
+                )
+            else:
+                url_rule = "/" + relation_path[0].class_.__tablename__.lower()
+                for index, prop in enumerate(relation_path[:-1]):
+                    url_rule += f"/<int:relation_id_{index}>/{prop.key}"
+                url_rule += f"/<int:relation_id>/{relation_property.key}"
         if url_rule:
             assert "<int:relation_id>" in url_rule
         else:
@@ -135,20 +373,95 @@ class Api:
             )
         endpoint_name = endpoint_name or url_rule
 
+        if relation_path:
+            resource_class = NestedRelationResource
+        elif asynchronous:
+            resource_class = AsyncToManyRelationResource
+        else:
+            resource_class = ToManyRelationResource
         view_init_args = (
-            relation_property,
+            relation_path or relation_property,
             serializer,
-            self.get_db_session,
+            self._session_getter(asynchronous),
             query_modifier,
         )
-        self.add_resource(
-            ToManyRelationResource,
+        view_func = self.add_resource(
+            resource_class,
             url_rule,
             view_name,
             view_init_args,
             decorators=self._create_decorators(request_decorators),
+            resource_init_kwargs=self._resource_init_kwargs(
+                asynchronous,
+                read_only_get=read_only_get,
+                full_text_search=full_text_search,
+                order_by_strategies=order_by_strategies,
+                guardrails=guardrails,
+                single_flight=single_flight,
+                incremental_sync=incremental_sync,
+                related_counts=related_counts,
+            ),
             methods=methods,
         )
+        if multi_parent:
+            assert not asynchronous, "multi_parent is not supported by async resources"
+            parents_url_rule = url_rule.replace("/<int:relation_id>", "")
+            assert parents_url_rule != url_rule, "url_rule must have a /<int:relation_id> segment"
+            self._blueprint.add_url_rule(
+                parents_url_rule,
+                defaults={"relation_id": None, "id": None},
+                view_func=view_func,
+                methods=["GET"],
+            )
+
+    def add_relation_links(
+        self,
+        relation_property,
+        url_rule=None,
+        request_decorators=None,
+        endpoint_name=None,
+    ):
+        """
+        Create an endpoint to link and unlink existing children of the given SQLAlchemy
+        relationship in bulk. POST attaches, DELETE detaches and PUT replaces the links with the
+        children ids given as a JSON list on the request body (see
+        :class:`ToManyRelationLinksResource`).
+
+        :param relation_property: model to-many relationship (many-to-many or one-to-many)
+
+        :param string url_rule: url route to match for the resource, standard flask routing rules
+            apply. Defaults to `/{parent_table}/<int:relation_id>/{relation_name}/links`.
+
+        :param list|dict request_decorators: decorators to be applied to HTTP methods. Could be a
+            list of decorators or a dict mapping HTTP verb types to a list of decorators (dict
+            keys should be 'post', 'put' or 'delete').
+
+        :param string endpoint_name: endpoint name (defaults to
+            `{model_name}_{related_model_name}_links` in lower case)
+        """
+        model = relation_property.prop.mapper.class_
+        related_model = relation_property.class_
+        view_name = endpoint_name or f"{model.__name__}_{related_model.__name__}_links".lower()
+        if url_rule:
+            assert "<int:relation_id>" in url_rule
+        else:
+            parent_endpoint = related_model.__tablename__.lower()
+            url_rule = "/{}/<int:relation_id>/{}/links".format(
+                parent_endpoint, relation_property.key
+            )
+
+        view_func = ToManyRelationLinksResource.as_view(
+            view_name,
+            relation_property,
+            self.create_default_serializer(model),
+            self.get_db_session,
+            request_decorators=self._create_decorators(request_decorators),
+            reference_cache=self._reference_cache,
+            dump_cache=self._dump_cache,
+        )
+        self._blueprint.add_url_rule(
+            url_rule, view_func=view_func, methods=["POST", "PUT", "DELETE"]
+        )
 
     def add_property(
         self,
@@ -161,6 +474,13 @@ class Api:
         endpoint_name=None,
         methods=None,
         query_modifier=None,
+        asynchronous=False,
+        read_only_get=False,
+        full_text_search=None,
+        order_by_strategies=None,
+        guardrails=None,
+        single_flight=None,
+        related_counts=None,
     ):
         if not serializer_class:
             serializer = self.create_default_serializer(property_type)
@@ -182,18 +502,56 @@ class Api:
             model,
             property_name,
             serializer,
-            self.get_db_session,
+            self._session_getter(asynchronous),
             query_modifier,
         )
         self.add_resource(
-            CollectionPropertyResource,
+            AsyncCollectionPropertyResource if asynchronous else CollectionPropertyResource,
             url_rule,
             view_name,
             view_init_args,
             decorators=self._create_decorators(request_decorators),
+            resource_init_kwargs=self._resource_init_kwargs(
+                asynchronous,
+                read_only_get=read_only_get,
+                full_text_search=full_text_search,
+                order_by_strategies=order_by_strategies,
+                guardrails=guardrails,
+                single_flight=single_flight,
+                related_counts=related_counts,
+            ),
             methods=methods,
         )
 
+    def add_batch(
+        self,
+        url="/batch",
+        request_decorators=None,
+        endpoint_name="batch",
+        max_requests=DEFAULT_MAX_REQUESTS,
+    ):
+        """
+        Create an endpoint executing many sub-requests in a single HTTP call, dispatched
+        through the registered resources and sharing one DB session (see
+        :class:`flask_restalchemy.batch.BatchResource`).
+
+        :param string url: url route of the endpoint
+
+        :param list|dict request_decorators: decorators to be applied to the batch request,
+            besides the decorators of the resources of each sub-request
+
+        :param string endpoint_name: endpoint name
+
+        :param int max_requests: maximum number of sub-requests of a batch
+        """
+        view_func = BatchResource.as_view(
+            endpoint_name,
+            self.get_db_session,
+            max_requests=max_requests,
+            request_decorators=self._create_decorators(request_decorators),
+        )
+        self._blueprint.add_url_rule(url, view_func=view_func, methods=["POST"])
+
     def add_resource(
         self,
         resource_class,
@@ -217,6 +575,7 @@ class Api:
             view_name, *resource_init_args, **resource_init_kwargs
         )
         self.register_view(view_func, url_rule, methods=methods)
+        return view_func
 
     def register_view(self, view_func, url, pk="id", pk_type="int", methods=None):
         """
@@ -232,25 +591,27 @@ class Api:
 
         :param pk_type: primary key type
 
-        :param list[str] methods: verbs to be accepted by view
+        :param list[str] methods: verbs to be accepted by view. HEAD is accepted along with GET.
         """
         app = self._blueprint
         if methods is None:
             app.add_url_rule(
-                url, defaults={pk: None}, view_func=view_func, methods=["GET"]
+                url, defaults={pk: None}, view_func=view_func, methods=["GET", "HEAD"]
             )
+            self._register_search(view_func, url, pk)
             app.add_url_rule(url, view_func=view_func, methods=["POST"])
             app.add_url_rule(
                 f"{url}/<{pk_type}:{pk}>",
                 view_func=view_func,
-                methods=["GET", "PUT", "DELETE"],
+                methods=["GET", "HEAD", "PUT", "DELETE"],
             )
         else:
             if "GET_COLLECTION" in methods:
                 methods.remove("GET_COLLECTION")
                 app.add_url_rule(
-                    url, defaults={pk: None}, view_func=view_func, methods=["GET"]
+                    url, defaults={pk: None}, view_func=view_func, methods=["GET", "HEAD"]
                 )
+                self._register_search(view_func, url, pk)
             if "POST" in methods:
                 methods.remove("POST")
                 app.add_url_rule(url, view_func=view_func, methods=["POST"])
@@ -259,6 +620,19 @@ class Api:
                     f"{url}/<{pk_type}:{pk}>", view_func=view_func, methods=methods
                 )
 
+    def _register_search(self, view_func, url, pk):
+        """
+        Register the search URL of model resources collections, `{url}/search`, accepting POST
+        requests with the collection arguments on the JSON body (see `load_search_args`).
+        """
+        if issubclass(getattr(view_func, "view_class", type(None)), BaseModelResource):
+            self._blueprint.add_url_rule(
+                f"{url}/search",
+                defaults={pk: None, "search": True},
+                view_func=view_func,
+                methods=["POST"],
+            )
+
     def route(self, rule, endpoint=None, **kwargs):
         """
         A decorator that is used to register a view function for a
@@ -332,7 +706,40 @@ class Api:
         return ModelSerializer(model_class)
 
     def get_db_session(self):
-        """Returns an SQLAlchemy session. Used by Resources to access the database."""
+        """
+        Returns an SQLAlchemy session. Used by Resources to access the database.
+
+        When a `shard_router` is configured, requests get a session bound to the database shard
+        of their tenant. When a `read_replica_bind` is configured, GET and HEAD requests get a
+        session bound to the replica, unless the client is inside its `read_your_writes`
+        window. These sessions are created once per request.
+
+        The sub-requests of a batch share the session of the batch request (see
+        :meth:`add_batch`), so sub-requests for another shard than the batch fail with a 400
+        error.
+        """
+        db = self._get_db()
+        if not has_request_context():
+            return db.session
+        if "restalchemy_batch_session" in g:
+            session = g.restalchemy_batch_session
+            router = self._shard_router
+            if router is not None and router.get_shard() != get_session_key(session):
+                abort(HTTPStatus.BAD_REQUEST, CROSS_SHARD_BATCH_ERROR)
+            return session
+        if self._shard_router is not None:
+            session = self._shard_router.get_session(db.Query)
+            if session is not None:
+                return session
+        if self._read_replica_bind is None:
+            return db.session
+        if not is_read_request():
+            g.restalchemy_client_write = True
+        elif not self._inside_read_your_writes():
+            return self._get_replica_session(db)
+        return db.session
+
+    def _get_db(self):
         if not self._db:
             # Get the Flask application
             flask_app = current_app
@@ -341,7 +748,69 @@ class Api:
             # 3.x stores the SQLAlchemy instance directly.
             ext = flask_app.extensions["sqlalchemy"]
             self._db = getattr(ext, "db", ext)
-        return self._db.session
+        return self._db
+
+    def _get_replica_session(self, db):
+        bind = self._read_replica_bind
+        return get_request_session(bind, lambda: db.engines[bind], db.Query)
+
+    def _inside_read_your_writes(self):
+        if not self._read_your_writes:
+            return False
+        last_write = request.cookies.get(LAST_WRITE_COOKIE, type=float)
+        return last_write is not None and time.time() - last_write < self._read_your_writes
+
+    def _mark_client_write(self, response):
+        if "restalchemy_batch_session" in g:
+            # Sub-requests of a batch, the batch response is marked instead
+            return response
+        if (
+            self._read_your_writes
+            and g.pop("restalchemy_client_write", False)
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                LAST_WRITE_COOKIE,
+                str(time.time()),
+                max_age=math.ceil(self._read_your_writes),
+                httponly=True,
+            )
+        return response
+
+    def get_async_db_session(self):
+        """Returns a new SQLAlchemy AsyncSession. Used by async Resources to access the database."""
+        assert self._async_session_factory, "Api created without an async_session_factory"
+        return self._async_session_factory()
+
+    def _resource_init_kwargs(
+        self, asynchronous, read_only_get, guardrails, single_flight, **kwargs
+    ):
+        """
+        Keyword arguments of model resources, with the `Api` defaults.
+        """
+        guardrails = guardrails or self._guardrails
+        single_flight = single_flight or self._single_flight
+        kwargs["guardrails"] = guardrails
+        kwargs["change_broker"] = self._change_broker
+        kwargs["reference_cache"] = self._reference_cache
+        kwargs["dump_cache"] = self._dump_cache
+        if asynchronous:
+            assert not read_only_get, "read_only_get is not supported by async resources"
+            assert (
+                guardrails is None or guardrails.statement_timeout is None
+            ), "statement_timeout is not supported by async resources"
+            assert single_flight is None, "single_flight is not supported by async resources"
+            assert (
+                kwargs.get("incremental_sync") is None
+            ), "incremental_sync is not supported by async resources"
+            assert not kwargs.get("reference"), "reference is not supported by async resources"
+            return kwargs
+        kwargs["single_flight"] = single_flight
+        kwargs["read_only_get"] = read_only_get
+        return kwargs
+
+    def _session_getter(self, asynchronous):
+        return self.get_async_db_session if asynchronous else self.get_db_session
 
     @classmethod
     def register_column_serializer(cls, serializer_class, predicate):
@@ -358,6 +827,9 @@ class Api:
         ModelSerializer.EXTRA_SERIALIZERS.append((serializer_class, predicate))
 
 
+LAST_WRITE_COOKIE = "restalchemy_last_write"
+
+
 class ResourceDecorators(Mapping):
     """
     API decorators can be set at the API instance level or per resource added. This class helps
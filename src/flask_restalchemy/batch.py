@@ -0,0 +1,200 @@
+from contextlib import ExitStack, contextmanager
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from flask import abort, current_app, g, request
+from sqlalchemy.orm import scoped_session
+from werkzeug.test import EnvironBuilder
+
+from .resources.resources import BaseResource, load_request_json
+
+DEFAULT_MAX_REQUESTS = 50
+
+
+class BatchResource(BaseResource):
+    """
+    Resource executing many sub-requests in a single HTTP call. The request body is a JSON
+    object with the list of sub-requests, dispatched in order through the registered resources
+    (and their request decorators)::
+
+        POST /batch
+        {
+            "requests": [
+                {"method": "POST", "path": "/company", "body": {"name": "Terrans"}},
+                {"method": "GET", "path": "/company?order_by=name"}
+            ],
+            "transaction": true
+        }
+
+    The response is the list of the sub-responses, like
+    ``[{"status": 201, "headers": {...}, "body": {...}}, ...]``. Sub-requests get the headers
+    of the batch request (like its credentials) and share its DB session, so on sharded APIs
+    they must be on the shard of the batch.
+
+    Without `transaction`, each sub-request commits its own changes, and the changes of failed
+    ones are rolled back. With `transaction`, the changes are committed at the end, only if
+    every sub-request succeeds: otherwise they are rolled back, the sub-requests after the
+    failed one are skipped and the batch fails with a 424 (Failed Dependency) status. The
+    changes are published to the change streams, and the caches invalidated, only once
+    committed (see :func:`deferred_commits`). Sub-requests that would roll back the shared
+    session fail instead.
+
+    :param callable session_getter: a callable that returns the DB session shared by the
+        sub-requests
+
+    :param int max_requests: maximum number of sub-requests of a batch
+
+    :param dict|list request_decorators: decorators of the batch request
+    """
+
+    def __init__(self, session_getter, max_requests=DEFAULT_MAX_REQUESTS, request_decorators=None):
+        super().__init__(request_decorators)
+        self._session_getter = session_getter
+        self._max_requests = max_requests
+
+    def post(self):
+        sub_requests, transaction = self._load_batch()
+        session = self._session_getter()
+        headers = [
+            (name, value) for name, value in request.headers if name.lower() not in BODY_HEADERS
+        ]
+        responses = []
+        after_commit = []
+        g.restalchemy_batch_session = session
+        try:
+            with ExitStack() as stack:
+                if transaction:
+                    after_commit = stack.enter_context(deferred_commits(session))
+                for sub_request in sub_requests:
+                    response = dispatch_sub_request(sub_request, headers)
+                    responses.append(response)
+                    if response["status"] >= HTTPStatus.BAD_REQUEST:
+                        # Discard the changes left by the failed request (or by the batch)
+                        session.rollback()
+                        if transaction:
+                            skipped = {
+                                "status": HTTPStatus.FAILED_DEPENDENCY,
+                                "headers": {},
+                                "body": None,
+                            }
+                            responses.extend([skipped] * (len(sub_requests) - len(responses)))
+                            return responses, HTTPStatus.FAILED_DEPENDENCY
+            if transaction:
+                session.commit()
+                for callback in after_commit:
+                    callback()
+            return responses
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            del g.restalchemy_batch_session
+
+    def _load_batch(self):
+        """
+        :return: the sub-requests and the transaction flag of the request body, aborting with
+            a 400 error if it is invalid
+        """
+        try:
+            data = load_request_json()
+        except ValueError:
+            abort(HTTPStatus.BAD_REQUEST, INVALID_BATCH_ERROR)
+        sub_requests = data.get("requests") if isinstance(data, dict) else None
+        if not isinstance(sub_requests, list) or not all(
+            is_valid_sub_request(sub_request) for sub_request in sub_requests
+        ):
+            abort(HTTPStatus.BAD_REQUEST, INVALID_BATCH_ERROR)
+        if len(sub_requests) > self._max_requests:
+            abort(HTTPStatus.BAD_REQUEST, f"Batches are limited to {self._max_requests} requests")
+        if any(urlsplit(sub_request["path"]).path == request.path for sub_request in sub_requests):
+            abort(HTTPStatus.BAD_REQUEST, "Batches can not be nested")
+        return sub_requests, bool(data.get("transaction", False))
+
+
+def is_valid_sub_request(sub_request):
+    return (
+        isinstance(sub_request, dict)
+        and str(sub_request.get("method", "")).upper() in BATCH_METHODS
+        and isinstance(sub_request.get("path"), str)
+        and sub_request["path"].startswith("/")
+    )
+
+
+def dispatch_sub_request(sub_request, headers):
+    """
+    Dispatch a sub-request through the application, on a request context of its own.
+
+    :param dict sub_request: the `method`, `path` (with the query string) and JSON `body`
+    :param list headers: headers of the sub-request
+    :return: the sub-response, with its `status`, `headers` and `body`
+    """
+    app = current_app._get_current_object()
+    body = {} if sub_request.get("body") is None else {"json": sub_request["body"]}
+    builder = EnvironBuilder(
+        path=sub_request["path"],
+        base_url=request.root_url,
+        method=sub_request["method"].upper(),
+        headers=headers,
+        environ_base={"REMOTE_ADDR": request.remote_addr},
+        **body,
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as error:
+            response = app.make_response(app.handle_exception(error))
+    try:
+        if response.is_streamed:
+            return {
+                "status": HTTPStatus.BAD_REQUEST,
+                "headers": {},
+                "body": STREAMED_RESPONSE_ERROR,
+            }
+        if response.is_json:
+            body = response.get_json()
+        else:
+            body = response.get_data(as_text=True)
+        return {"status": response.status_code, "headers": dict(response.headers), "body": body}
+    finally:
+        response.close()
+
+
+@contextmanager
+def deferred_commits(session):
+    """
+    Turn the commits of the session into flushes while the block runs, so the changes are
+    committed (or rolled back) at once by the caller. The side effects of the commits of the
+    resources (like publishing the changes, see
+    :func:`flask_restalchemy.resources.resources.after_commit`) are deferred too, and
+    the caches are bypassed, so uncommitted changes are not seen outside the session.
+
+    :param Session|scoped_session session:
+    :return: the list of the deferred side effects, callables to be run by the caller once
+        the changes are committed
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    callbacks = []
+    g.restalchemy_after_commit = callbacks
+    session.commit = session.flush
+    try:
+        yield callbacks
+    finally:
+        del session.commit
+        del g.restalchemy_after_commit
+
+
+BATCH_METHODS = ("GET", "HEAD", "POST", "PUT", "DELETE")
+
+# Headers of the batch request body, not forwarded to the sub-requests
+BODY_HEADERS = ("content-type", "content-length")
+
+CROSS_SHARD_BATCH_ERROR = "Sub-requests must be on the shard of the batch"
+STREAMED_RESPONSE_ERROR = "Streamed responses are not supported by batches"
+INVALID_BATCH_ERROR = (
+    'Request body must be a JSON object with a "requests" list of {method, path, body}!'
+)
@@ -0,0 +1,80 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+
+
+def iter_import_rows(stream, mimetype, content_encoding=None):
+    """
+    Parse the rows of a bulk import request body incrementally, so the body is never kept in
+    memory. Bodies are either NDJSON, with a JSON object by line, or CSV, with a header line
+    naming the fields (empty CSV values are loaded as `None`), and could be gzip encoded.
+
+    :param stream: binary stream of the request body
+    :param str mimetype: one of `NDJSON_MIMETYPES` or `CSV_MIMETYPES`
+    :param str content_encoding: `None`, "identity" or "gzip"
+    :return: iterator of (line number, row) pairs, where the row is a dict or the
+        `ValueError` of an invalid line. Errors of the stream itself (like a corrupt gzip
+        stream or an invalid text encoding) are raised while iterating, see
+        `IMPORT_STREAM_ERRORS`.
+    :raise ValueError: if the format or the encoding is not supported
+    """
+    if mimetype not in NDJSON_MIMETYPES + CSV_MIMETYPES:
+        raise ValueError(f"Unsupported import format {mimetype}")
+    if content_encoding not in (None, "identity", "gzip"):
+        raise ValueError(f"Unsupported import encoding {content_encoding}")
+    if content_encoding == "gzip":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if mimetype in CSV_MIMETYPES:
+        return _iter_csv_rows(text)
+    return _iter_ndjson_rows(text)
+
+
+def _iter_ndjson_rows(text):
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, ValueError("Invalid JSON")
+            continue
+        if not isinstance(row, dict):
+            row = ValueError("Rows must be JSON objects")
+        yield line_number, row
+
+
+def _iter_csv_rows(text):
+    reader = csv.DictReader(text)
+    for row in reader:
+        if None in row:
+            row = ValueError("More values than fields")
+        else:
+            row = {name: None if value == "" else value for name, value in row.items()}
+        yield reader.line_num, row
+
+
+def iter_batches(iterable, batch_size):
+    """
+    :return: iterator of the lists of the next `batch_size` items
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+# Maximum number of row errors reported by the response of an import
+MAX_REPORTED_ERRORS = 1000
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl")
+CSV_MIMETYPES = ("text/csv",)
+
+# Errors of the request body stream, raised while the rows are iterated
+IMPORT_STREAM_ERRORS = (OSError, EOFError, UnicodeDecodeError, csv.Error)
@@ -0,0 +1,230 @@
+import json
+from abc import ABC, abstractmethod
+import operator
+import queue
+import re
+import threading
+
+
+class ChangeBroker(ABC):
+    """
+    Fan-out of the change events of models, published by resources after their writes are
+    committed and delivered to the subscribers of change streams (see
+    :class:`ChangeStreamResource`).
+
+    Events are dicts serializable to JSON, like ``{"type": "update", "data": {...}}``, where
+    `data` is the model dumped by the resource that wrote it. Implement this interface on top
+    of a message bus (like Redis pub/sub) to deliver events across processes.
+    """
+
+    @abstractmethod
+    def publish(self, channel, event):
+        """
+        Deliver the event to the current subscribers of the channel.
+
+        :param str channel: name of the channel, see :func:`get_channel`
+        :param dict event:
+        """
+
+    @abstractmethod
+    def subscribe(self, channel):
+        """
+        :param str channel: name of the channel, see :func:`get_channel`
+        :rtype: Subscription
+        """
+
+
+class Subscription(ABC):
+    """
+    Events published on a channel after the subscription was created.
+    """
+
+    @abstractmethod
+    def get(self, timeout):
+        """
+        Wait for the next event.
+
+        :param float timeout: number of seconds to wait
+        :return: the next event, or `None` if none was published before the timeout
+        :raise SubscriptionClosed: if the subscription is closed or lost events
+        """
+
+    @abstractmethod
+    def close(self):
+        pass
+
+
+class SubscriptionClosed(Exception):
+    pass
+
+
+class InProcessBroker(ChangeBroker):
+    """
+    Broker delivering the events to subscribers of the same process.
+
+    :param int max_pending: maximum number of events waiting to be delivered to a subscriber.
+        Subscribers falling behind are closed, so clients reconnect instead of missing events.
+    """
+
+    def __init__(self, max_pending=1000):
+        self._max_pending = max_pending
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def subscribe(self, channel):
+        subscription = InProcessSubscription(self, channel, self._max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+
+class InProcessSubscription(Subscription):
+    def __init__(self, broker, channel, max_pending):
+        self.channel = channel
+        self._broker = broker
+        self._events = queue.Queue(max_pending)
+        self._closed = False
+
+    def put(self, event):
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            self.close()
+
+    def get(self, timeout):
+        if self._closed:
+            raise SubscriptionClosed()
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._closed = True
+        self._broker.unsubscribe(self)
+
+
+def get_channel(model_class):
+    """
+    :return: the name of the channel of the change events of a model
+    """
+    return model_class.__name__
+
+
+def format_event(event):
+    """
+    Format a change event as a Server-Sent Event, named by the change type with the JSON data.
+    """
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def create_event_filter(filters, field_names):
+    """
+    Build a predicate of the dumped data of change events, matching the filters of the
+    collection `filter` argument (see :func:`create_collection_query`). Values are compared
+    with the dumped values. Related columns and the `match` operator are not supported.
+
+    :param dict filters: filters by field name
+    :param field_names: names of the dumped fields
+    :raise ValueError: if the filters are not supported
+    :rtype: callable
+    """
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must be an object")
+    predicates = []
+    for attr, value in filters.items():
+        if attr in ("$or", "$and"):
+            if not isinstance(value, dict):
+                raise ValueError(f"{attr} filters must be an object")
+            items = [create_event_filter({key: item}, field_names) for key, item in value.items()]
+            combine = any if attr == "$or" else all
+            predicates.append(
+                lambda data, items=items, combine=combine: combine(item(data) for item in items)
+            )
+            continue
+        if attr not in field_names:
+            raise ValueError(f"Unknown event filter field {attr}")
+        if isinstance(value, dict):
+            if len(value) != 1:
+                raise ValueError(f"Filter of {attr} must have a single operator")
+            ((op_name, value),) = value.items()
+        else:
+            op_name = "eq"
+        predicates.append(create_event_predicate(attr, op_name, value))
+    return lambda data: all(predicate(data) for predicate in predicates)
+
+
+def create_event_predicate(attr, op_name, value):
+    if op_name not in EVENT_OPERATORS:
+        raise ValueError(f"Unsupported event filter operator {op_name}")
+    if op_name in ("eq", "is") and value is None:
+        return lambda data: data.get(attr) is None
+    if op_name in ("ne", "isnot") and value is None:
+        return lambda data: data.get(attr) is not None
+    op = EVENT_OPERATORS[op_name]
+    if op_name in LIKE_OPERATORS:
+        if not isinstance(value, str):
+            raise ValueError(f"Filter of {attr} with {op_name} must be a string")
+        value = like_pattern(value, case_sensitive=op_name in ("like", "notlike"))
+
+    def predicate(data):
+        field_value = data.get(attr)
+        # Like SQL, comparisons with NULL are not true
+        if field_value is None:
+            return False
+        try:
+            return bool(op(field_value, value))
+        except TypeError:
+            return False
+
+    return predicate
+
+
+def like_pattern(pattern, case_sensitive):
+    """
+    :return: regular expression equivalent to the SQL LIKE pattern
+    """
+    expression = "".join(
+        ".*" if char == "%" else "." if char == "_" else re.escape(char) for char in pattern
+    )
+    return re.compile(expression, re.DOTALL if case_sensitive else re.IGNORECASE | re.DOTALL)
+
+
+EVENT_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "lt": operator.lt,
+    "le": operator.le,
+    "is": operator.is_,
+    "isnot": operator.is_not,
+    "in": lambda field_value, values: field_value in values,
+    "notin": lambda field_value, values: field_value not in values,
+    "between": lambda field_value, values: values[0] <= field_value <= values[1],
+    "startswith": lambda field_value, prefix: field_value.startswith(prefix),
+    "endswith": lambda field_value, suffix: field_value.endswith(suffix),
+    "contains": lambda field_value, text: text in field_value,
+    "like": lambda field_value, pattern: pattern.fullmatch(field_value),
+    "ilike": lambda field_value, pattern: pattern.fullmatch(field_value),
+    "notlike": lambda field_value, pattern: not pattern.fullmatch(field_value),
+    "notilike": lambda field_value, pattern: not pattern.fullmatch(field_value),
+}
+
+LIKE_OPERATORS = ("like", "ilike", "notlike", "notilike")
+
+# Seconds between the comments sent to keep idle change streams open
+HEARTBEAT_INTERVAL = 15
@@ -0,0 +1,115 @@
+import functools
+import json
+import threading
+
+from flask import request
+
+from .resources.resources import get_collection_args, is_deferring_commits
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent GET requests of model resources (single-flight): while a
+    request is being computed, identical requests wait for it and share its result instead of
+    querying the database again. Results are not kept once the computation finishes.
+
+    Requests are identical when they have the same endpoint, URL variables, collection
+    arguments (normalized, so the order of arguments and filter keys does not matter) and
+    auth key. Request decorators still run for every request. Requests of transactional
+    batches are never coalesced.
+
+    :param callable auth_key: called inside the request context, returns a hashable
+        identifying everything that changes the data visible to the caller, besides the URL:
+        the user or its roles, the tenant on sharded APIs, etc. Requests with different keys
+        are never coalesced. Use ``lambda: None`` only if every caller sees the same data.
+    """
+
+    def __init__(self, auth_key):
+        self._auth_key = auth_key
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, method):
+        """
+        Returns the given GET handler coalescing identical concurrent requests.
+        """
+
+        @functools.wraps(method)
+        def coalesced(*args, **kwargs):
+            if is_deferring_commits():
+                # Requests of a transactional batch see its uncommitted changes, which must not
+                # be shared with other requests
+                return method(*args, **kwargs)
+            return self.do(self.request_key(args, kwargs), lambda: method(*args, **kwargs))
+
+        return coalesced
+
+    def do(self, key, function):
+        """
+        Call `function`, unless a call with the same key is in progress: then wait for it and
+        return its result (or raise its error).
+
+        :param key: hashable identifying the call
+        :param callable function:
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            return call.wait()
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def request_key(self, args, kwargs):
+        """
+        :return: the key of the current request, given the arguments of the handler
+        """
+        return (
+            request.endpoint,
+            args,
+            # URL variables, including the ones consumed before the handler is called
+            tuple(sorted({**(request.view_args or {}), **kwargs}.items())),
+            normalize_args(get_collection_args()),
+            self._auth_key(),
+        )
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def normalize_args(args):
+    """
+    Returns the collection arguments as a string that does not depend on the order of the
+    arguments and of the filter keys, or on the filter formatting.
+
+    :param args: arguments of a collection request (see `get_collection_args`)
+    """
+    if hasattr(args, "lists"):
+        args = {name: values[0] if len(values) == 1 else values for name, values in args.lists()}
+    args = dict(args)
+    if isinstance(args.get("filter"), str):
+        try:
+            args["filter"] = json.loads(args["filter"])
+        except ValueError:
+            pass
+    return json.dumps(args, sort_keys=True, default=str)
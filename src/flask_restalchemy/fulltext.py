@@ -0,0 +1,173 @@
+from abc import ABC, abstractmethod
+
+from sqlalchemy import column, desc, func, inspect, table, text
+
+
+class FullTextSearch(ABC):
+    """
+    Base class of full-text search backends, used by resources to filter collections by the
+    `q` request argument. Matches are ordered by relevance, unless `order_by` is requested.
+    Filters, ordering and pagination are applied as usual.
+
+    :param list[str] columns: names of the searchable model columns
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+
+    @abstractmethod
+    def search(self, query, model_class, term, ranked):
+        """
+        Restrict the query to the rows matching the search term.
+
+        :param query: SQLAlchemy query (or select statement) of `model_class`
+        :param class model_class: SQLAlchemy model class representing a database resource
+        :param str term: the searched text
+        :param bool ranked: if True, order the query by relevance (see :meth:`rank`)
+        """
+
+    @abstractmethod
+    def rank(self, model_class, term):
+        """
+        :return: the ordering expression of the rows by relevance to the search term, most
+            relevant first. Only valid on queries restricted by :meth:`search`.
+        """
+
+    def get_columns(self, model_class):
+        mapper = inspect(model_class)
+        for name in self.columns:
+            if name not in mapper.column_attrs:
+                raise ValueError(f"Unknown searchable column {name}")
+        return [getattr(model_class, name) for name in self.columns]
+
+
+class SQLiteFullTextSearch(FullTextSearch):
+    """
+    Full-text search backed by an SQLite FTS5 virtual table that indexes the searchable columns
+    (see :meth:`create_index`). Each word of the search term must match, words ending with `*`
+    match prefixes.
+
+    :param list[str] columns: names of the searchable model columns
+
+    :param str index_name: name of the FTS5 table, defaults to `{table_name}_fts`
+    """
+
+    def __init__(self, columns, index_name=None):
+        super().__init__(columns)
+        self.index_name = index_name
+        self._index_tables = {}
+
+    def search(self, query, model_class, term, ranked):
+        index = self._index_table(model_class)
+        query = query.join(index, index.c.rowid == inspect(model_class).primary_key[0])
+        query = query.filter(index.c[index.name].op("MATCH")(self._match_expression(term)))
+        if ranked:
+            query = query.order_by(self.rank(model_class, term))
+        return query
+
+    def rank(self, model_class, term):
+        return self._index_table(model_class).c.rank
+
+    def create_index(self, connection, model_class):
+        """
+        Create the FTS5 table of the model, if it does not exist, along with the triggers that
+        keep it in sync with the model table. Existing rows are indexed.
+
+        :param Connection connection: SQLAlchemy connection to the SQLite database
+        :param class model_class: SQLAlchemy model class representing a database resource
+        """
+        model_table = inspect(model_class).local_table.name
+        index_name = self._get_index_name(model_class)
+        primary_key = inspect(model_class).primary_key[0].name
+        column_names = ", ".join(column.name for column in self.get_columns(model_class))
+        new_values = ", ".join(f"new.{column.name}" for column in self.get_columns(model_class))
+        old_values = ", ".join(f"old.{column.name}" for column in self.get_columns(model_class))
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5("
+            f"{column_names}, content='{model_table}', content_rowid='{primary_key}')",
+            f"CREATE TRIGGER IF NOT EXISTS {index_name}_ai AFTER INSERT ON {model_table} BEGIN "
+            f"INSERT INTO {index_name}(rowid, {column_names}) "
+            f"VALUES (new.{primary_key}, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {index_name}_ad AFTER DELETE ON {model_table} BEGIN "
+            f"INSERT INTO {index_name}({index_name}, rowid, {column_names}) "
+            f"VALUES ('delete', old.{primary_key}, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {index_name}_au AFTER UPDATE ON {model_table} BEGIN "
+            f"INSERT INTO {index_name}({index_name}, rowid, {column_names}) "
+            f"VALUES ('delete', old.{primary_key}, {old_values}); "
+            f"INSERT INTO {index_name}(rowid, {column_names}) "
+            f"VALUES (new.{primary_key}, {new_values}); END",
+            f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')",
+        ]
+        for statement in statements:
+            connection.execute(text(statement))
+
+    def _get_index_name(self, model_class):
+        return self.index_name or f"{inspect(model_class).local_table.name}_fts"
+
+    def _index_table(self, model_class):
+        # The same table object is used by the join and the rank, so it is not added to the
+        # FROM clause again when the rank is selected (like in window functions)
+        if model_class not in self._index_tables:
+            index_name = self._get_index_name(model_class)
+            # The hidden column named after the table is the left operand of MATCH
+            self._index_tables[model_class] = table(
+                index_name, column("rowid"), column("rank"), column(index_name)
+            )
+        return self._index_tables[model_class]
+
+    @staticmethod
+    def _match_expression(term):
+        """
+        Quote the words of the term, so FTS5 query syntax characters are searched as text.
+        """
+        words = []
+        for word in term.split():
+            prefix = word.endswith("*")
+            word = word.rstrip("*")
+            if word:
+                words.append('"{}"{}'.format(word.replace('"', '""'), "*" if prefix else ""))
+        return " ".join(words) or '""'
+
+
+class PostgresFullTextSearch(FullTextSearch):
+    """
+    Full-text search backed by PostgreSQL text search. The search term is parsed by
+    `websearch_to_tsquery` (supporting quoted phrases, `or` and `-` operators) and matches are
+    ranked with `ts_rank`.
+
+    To use an index, either create a GIN expression index matching the searched vector:
+
+        CREATE INDEX company_fts ON "Company" USING GIN
+            (to_tsvector('english', concat_ws(' ', name, location)))
+
+    or store the vector on a `tsvector` column, given by `vector_column`.
+
+    :param list[str] columns: names of the searchable model columns
+
+    :param str config: text search configuration
+
+    :param str vector_column: name of a model column holding the `tsvector` of the row
+    """
+
+    def __init__(self, columns, config="english", vector_column=None):
+        super().__init__(columns)
+        self.config = config
+        self.vector_column = vector_column
+
+    def search(self, query, model_class, term, ranked):
+        vector = self.get_vector(model_class)
+        query = query.filter(vector.op("@@")(self._ts_query(term)))
+        if ranked:
+            query = query.order_by(self.rank(model_class, term))
+        return query
+
+    def rank(self, model_class, term):
+        return desc(func.ts_rank(self.get_vector(model_class), self._ts_query(term)))
+
+    def _ts_query(self, term):
+        return func.websearch_to_tsquery(self.config, term)
+
+    def get_vector(self, model_class):
+        if self.vector_column is not None:
+            return getattr(model_class, self.vector_column)
+        return func.to_tsvector(self.config, func.concat_ws(" ", *self.get_columns(model_class)))
@@ -0,0 +1,221 @@
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from http import HTTPStatus
+
+from flask import abort
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session
+
+
+class Estimate(namedtuple("Estimate", "cost rows")):
+    """
+    Planner estimate of a query.
+
+    :param float cost: total cost of the query plan, in the database planner units
+    :param float rows: number of rows the query is expected to return
+    """
+
+    __slots__ = ()
+
+
+class QueryGuardrails:
+    """
+    Limits on the queries of model resources, rejecting requests that would load too many rows
+    or keep the database busy for too long with a 400 response.
+
+    :param int default_limit: number of items returned by collections requested without
+        `limit` or `page`, also the default `per_page`. Defaults to `max_limit`.
+
+    :param int max_limit: maximum `limit` and `per_page` accepted
+
+    :param float statement_timeout: number of seconds the statements of GET and HEAD requests
+        (and searches) are allowed to run. Supported on PostgreSQL, MySQL, MariaDB and SQLite.
+
+    :param float max_cost: maximum planner cost of collection and count queries (see
+        `estimator`)
+
+    :param float max_rows: maximum number of rows the planner expects collection and count
+        queries to return (see `estimator`)
+
+    :param callable estimator: called with a connection and a select statement, returns its
+        :class:`Estimate` or `None` if it could not be estimated. Defaults to
+        :func:`explain_estimate`.
+    """
+
+    def __init__(
+        self,
+        default_limit=None,
+        max_limit=None,
+        statement_timeout=None,
+        max_cost=None,
+        max_rows=None,
+        estimator=None,
+    ):
+        if default_limit is None:
+            default_limit = max_limit
+        assert max_limit is None or default_limit <= max_limit, "default_limit over max_limit"
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.statement_timeout = statement_timeout
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.estimator = estimator or explain_estimate
+
+    def check_args(self, args):
+        """
+        Abort collection requests asking for more items than `max_limit`.
+
+        :param args: arguments of the collection request
+        """
+        if self.max_limit is None:
+            return
+        for name in ("limit", "per_page"):
+            try:
+                value = int(args.get(name, 0))
+            except (TypeError, ValueError):
+                # Invalid values are handled by the collection query
+                continue
+            if value > self.max_limit:
+                abort(HTTPStatus.BAD_REQUEST, f"{name} must not exceed {self.max_limit}")
+
+    def check_cost(self, session, statement):
+        """
+        Abort the request if the planner estimate of the statement is over `max_cost` or
+        `max_rows`, before running it.
+
+        :param Session|scoped_session session:
+        :param statement: SQLAlchemy query or select statement
+        """
+        if self.max_cost is None and self.max_rows is None:
+            return
+        if isinstance(session, scoped_session):
+            session = session()
+        if hasattr(statement, "statement"):
+            statement = statement.statement
+        estimate = self.estimator(session.connection(), statement)
+        if estimate is None:
+            return
+        if self.max_cost is not None and estimate.cost > self.max_cost:
+            abort(
+                HTTPStatus.BAD_REQUEST,
+                f"Query rejected, estimated cost {estimate.cost} exceeds {self.max_cost}",
+            )
+        if self.max_rows is not None and estimate.rows > self.max_rows:
+            abort(
+                HTTPStatus.BAD_REQUEST,
+                f"Query rejected, estimated rows {estimate.rows} exceed {self.max_rows}",
+            )
+
+    @contextmanager
+    def apply_statement_timeout(self, session):
+        """
+        Run the block with `statement_timeout` applied to the session connection. Statements
+        canceled by the timeout abort the request with a 400 error.
+
+        :param Session|scoped_session session:
+        """
+        if self.statement_timeout is None:
+            yield
+            return
+        if isinstance(session, scoped_session):
+            session = session()
+        connection = session.connection()
+        dialect_name = connection.dialect.name
+        try:
+            if dialect_name == "sqlite":
+                with sqlite_timeout(connection, self.statement_timeout):
+                    yield
+            else:
+                with dialect_timeout(connection, self.statement_timeout):
+                    yield
+        except OperationalError as error:
+            if not is_timeout_error(error):
+                raise
+            abort(
+                HTTPStatus.BAD_REQUEST,
+                f"Query canceled, it exceeded the timeout of {self.statement_timeout}s",
+            )
+
+
+def explain_estimate(connection, statement):
+    """
+    Estimate a statement using `EXPLAIN (FORMAT JSON)` on PostgreSQL. Returns `None` on other
+    databases.
+
+    :param Connection connection:
+    :param statement: select statement
+    """
+    if connection.dialect.name != "postgresql":
+        return None
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", params)
+    plan = result.scalar()[0]["Plan"]
+    return Estimate(plan["Total Cost"], plan["Plan Rows"])
+
+
+@contextmanager
+def dialect_timeout(connection, timeout):
+    """
+    Set the statement timeout of the connection (see `TIMEOUT_STATEMENTS`), resetting it at
+    the end when it is not scoped to the transaction.
+    """
+    set_timeout, reset = TIMEOUT_STATEMENTS.get(connection.dialect.name, (None, None))
+    if set_timeout:
+        connection.exec_driver_sql(
+            set_timeout.format(milliseconds=int(timeout * 1000), seconds=timeout)
+        )
+    try:
+        yield
+    finally:
+        if reset:
+            connection.exec_driver_sql(reset)
+
+
+@contextmanager
+def sqlite_timeout(connection, timeout):
+    """
+    SQLite has no statement timeout, statements are interrupted by a progress handler once
+    the deadline is reached.
+    """
+    dbapi_connection = connection.connection.dbapi_connection
+    deadline = time.monotonic() + timeout
+    dbapi_connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+    try:
+        yield
+    finally:
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+def is_timeout_error(error):
+    """
+    :param OperationalError error:
+    :return: if the error was raised by a statement canceled by the statement timeout
+    """
+    orig = error.orig
+    if getattr(orig, "pgcode", None) == "57014" or getattr(orig, "sqlstate", None) == "57014":
+        return True
+    if orig.args and orig.args[0] in TIMEOUT_ERROR_CODES:
+        return True
+    return str(orig) == "interrupted"
+
+
+# Statements to set the statement timeout of a connection and to reset it afterwards
+TIMEOUT_STATEMENTS = {
+    # Scoped to the transaction
+    "postgresql": ("SET LOCAL statement_timeout = {milliseconds}", None),
+    "mysql": (
+        "SET SESSION max_execution_time = {milliseconds}",
+        "SET SESSION max_execution_time = DEFAULT",
+    ),
+    "mariadb": (
+        "SET SESSION max_statement_time = {seconds}",
+        "SET SESSION max_statement_time = DEFAULT",
+    ),
+}
+
+# MySQL and MariaDB error numbers of statements interrupted by the timeout
+TIMEOUT_ERROR_CODES = (3024, 1969)
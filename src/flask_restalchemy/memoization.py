@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Row
+
+from .resources.resources import dump_item
+
+
+class DumpCache:
+    """
+    LRU cache of the serialized models dumped by the resources, so the rows of a collection
+    that did not change since the last request are not serialized again. The query still runs:
+    only the serialization is skipped.
+
+    Serialized models are keyed by their serializer, model class, id and version: the value of
+    the SQLAlchemy ``version_id_col`` of the model or, if the model has none, of its
+    `version_attr` attribute (like an ``updated_at`` timestamp), so updates not made through
+    the `Api` are seen too. Models without a version are only cached if `max_age` is given,
+    since updates not made through the `Api` (which always discard the serialized models
+    written) could not be seen otherwise. Serialized models are also kept apart for each
+    session key (like the shard of the tenant when the `Api` has a `shard_router`, see
+    :func:`flask_restalchemy.routing.get_session_key`).
+
+    Nested models are kept along with the model that serializes them, so serializers dumping
+    related models see their changes only once the model itself changes.
+
+    :param int max_size: maximum number of serialized models kept. The least recently used are
+        discarded first.
+
+    :param str version_attr: name of the attribute changed by every update of the models
+        without a ``version_id_col``
+
+    :param float max_age: number of seconds the serialized models without a version are used,
+        before being serialized again. If `None`, models without a version are not cached.
+    """
+
+    def __init__(self, max_size=10000, version_attr="updated_at", max_age=None):
+        self._max_size = max_size
+        self._version_attr = version_attr
+        self._max_age = max_age
+        self._items = OrderedDict()
+        self._serializers = {}
+        self._session_keys = {}
+        self._version_attrs = {}
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def dump(self, serializer, item, session_key=None):
+        """
+        Serialize an entity (or a row, see :func:`dump_item`), unless the serialized model is
+        cached.
+
+        :param session_key: key of the session that loaded the item, see
+            :func:`flask_restalchemy.routing.get_session_key`
+        """
+        model_class = serializer.model_class
+        id, version = self._identity(model_class, item)
+        if id is None:
+            return dump_item(serializer, item)
+        key = (model_class, session_key, id, serializer)
+        with self._lock:
+            cached = self._items.get(key)
+            if (
+                cached is not None
+                and cached[0] == version
+                and not self._expired(model_class, cached)
+            ):
+                self._items.move_to_end(key)
+                self._hits += 1
+                return cached[1]
+            self._misses += 1
+        data = dump_item(serializer, item)
+        with self._lock:
+            self._items[key] = (version, data, time.monotonic())
+            self._items.move_to_end(key)
+            self._serializers.setdefault(model_class, set()).add(serializer)
+            self._session_keys.setdefault(model_class, set()).add(session_key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+        return data
+
+    def invalidate(self, model_class, id=None):
+        """
+        Discard the serialized models of the given class with the given id, or all of them if
+        `id` is `None`, loaded by any session.
+        """
+        with self._lock:
+            if id is None:
+                keys = [key for key in self._items if key[0] is model_class]
+            else:
+                keys = [
+                    (model_class, session_key, id, serializer)
+                    for session_key in self._session_keys.get(model_class, ())
+                    for serializer in self._serializers.get(model_class, ())
+                ]
+            for key in keys:
+                self._items.pop(key, None)
+
+    def stats(self):
+        """
+        :return: the number of hits and misses, the hit rate (`None` before the first dump) and
+            the number of serialized models kept, like
+            ``{"hits": 90, "misses": 10, "hit_rate": 0.9, "size": 10}``
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else None,
+                "size": len(self._items),
+            }
+
+    def _expired(self, model_class, cached):
+        # Models without a version are only cached along with a `max_age`
+        return (
+            self._get_version_attr(model_class) is None
+            and time.monotonic() - cached[2] > self._max_age
+        )
+
+    def _identity(self, model_class, item):
+        """
+        :return: the id and the version of the item. The id is `None` if the item can not be
+            cached: rows without the id, or without the version of a versioned model, or any
+            model without a version if there is no `max_age`.
+        """
+        version_attr = self._get_version_attr(model_class)
+        if version_attr is None and self._max_age is None:
+            return None, None
+        if isinstance(item, Row):
+            values = item._mapping
+            id = values.get("id")
+            if version_attr is None:
+                return id, None
+            if version_attr not in values:
+                return None, None
+            return id, values[version_attr]
+        id = getattr(item, "id", None)
+        return id, getattr(item, version_attr) if version_attr is not None else None
+
+    def _get_version_attr(self, model_class):
+        """
+        :return: the name of the version attribute of the model, or `None` if it has none
+        """
+        if model_class not in self._version_attrs:
+            mapper = inspect(model_class)
+            if mapper.version_id_col is not None:
+                version_attr = mapper.get_property_by_column(mapper.version_id_col).key
+            elif self._version_attr in mapper.column_attrs:
+                version_attr = self._version_attr
+            else:
+                version_attr = None
+            self._version_attrs[model_class] = version_attr
+        return self._version_attrs[model_class]
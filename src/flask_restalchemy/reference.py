@@ -0,0 +1,119 @@
+import threading
+import time
+
+from sqlalchemy.orm import object_session
+
+from .resources.resources import is_deferring_commits
+from .routing import get_session_key
+from .serialization import Field, ModelSerializer
+
+
+class ReferenceCache:
+    """
+    In-process snapshots of small read-mostly tables (reference tables, like contact types or
+    departments), holding their serialized rows. Models added with ``reference=True`` (see
+    :meth:`Api.add_model`) serve their item and collection GET requests from the snapshot, and
+    :class:`ReferenceField` serves nested lookups of the cached models from it.
+
+    Snapshots are loaded by the first request that needs them and are versioned: every write
+    made through the resources of the `Api` invalidates the snapshot of the written model, and
+    a snapshot loaded while a write happened is discarded instead of being kept. Snapshots are
+    kept apart for each session key (like the shard of the tenant when the `Api` has a
+    `shard_router`, see :func:`flask_restalchemy.routing.get_session_key`).
+
+    :param float max_age: number of seconds a snapshot is used before being loaded again, to
+        pick up the changes not made through the `Api` (like the ones of other processes). If
+        `None`, snapshots are kept until invalidated.
+    """
+
+    def __init__(self, max_age=None):
+        self._max_age = max_age
+        self._snapshots = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_snapshot(self, session, model_class, serializer):
+        """
+        :param Session session: session used to load the snapshot, if needed
+        :param class model_class: the SQLAlchemy declarative class
+        :param ModelSerializer serializer: serializer of the snapshot rows
+        :rtype: ReferenceSnapshot
+        """
+        key = (model_class, get_session_key(session), serializer)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            version = self._versions.get(model_class, 0)
+        if snapshot is not None and not self._expired(snapshot):
+            return snapshot
+        snapshot = ReferenceSnapshot.load(session, model_class, serializer, version)
+        with self._lock:
+            if self._versions.get(model_class, 0) == version:
+                self._snapshots[key] = snapshot
+        return snapshot
+
+    def invalidate(self, model_class):
+        """
+        Discard the snapshots of a model, including the ones being loaded.
+        """
+        with self._lock:
+            self._versions[model_class] = self._versions.get(model_class, 0) + 1
+            for key in [key for key in self._snapshots if key[0] is model_class]:
+                del self._snapshots[key]
+
+    def _expired(self, snapshot):
+        return self._max_age is not None and time.monotonic() - snapshot.loaded_at > self._max_age
+
+
+class ReferenceSnapshot:
+    """
+    Serialized rows of a table, ordered by id.
+
+    :param int version: version of the model when the snapshot was loaded
+    :param list items: the serialized rows
+    """
+
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items
+        self.loaded_at = time.monotonic()
+        self._items_by_id = {item["id"]: item for item in items}
+
+    @classmethod
+    def load(cls, session, model_class, serializer, version):
+        models = session.query(model_class).order_by(model_class.id).all()
+        return cls(version, [serializer.dump(model) for model in models])
+
+    def get(self, id):
+        """
+        :return: the serialized row with the given id, or `None` if not found
+        """
+        return self._items_by_id.get(id)
+
+
+class ReferenceField(Field):
+    """
+    Dump-only field of a relationship to a model cached by a :class:`ReferenceCache`: the
+    related model is dumped from the snapshot instead of being serialized again.
+
+    :param class model_class: the related SQLAlchemy declarative class
+    :param ReferenceCache cache:
+    :param ModelSerializer serializer: serializer of the related model, defaults to a
+        `ModelSerializer`
+    """
+
+    def __init__(self, model_class, cache, serializer=None):
+        super().__init__(dump_only=True, serializer=serializer or ModelSerializer(model_class))
+        self.model_class = model_class
+        self.cache = cache
+
+    def dump(self, value):
+        if value is None:
+            return None
+        session = object_session(value)
+        # Snapshots must not be loaded with the uncommitted changes of transactional batches
+        if session is None or is_deferring_commits():
+            return self.serializer.dump(value)
+        snapshot = self.cache.get_snapshot(session, self.model_class, self.serializer)
+        item = snapshot.get(value.id)
+        # Rows created after the snapshot was loaded are still serialized
+        return item if item is not None else self.serializer.dump(value)
@@ -2,8 +2,18 @@ from .resources import (
     ModelResource,
     BaseResource,
     BaseModelResource,
+    ChangeStreamResource,
     CollectionPropertyResource,
+    NestedRelationResource,
     ToManyRelationResource,
+    ToManyRelationLinksResource,
     load_request_json,
     create_response_from_query,
 )
+from .async_resources import (
+    AsyncModelResource,
+    AsyncBaseModelResource,
+    AsyncCollectionPropertyResource,
+    AsyncToManyRelationResource,
+    create_async_response_from_query,
+)
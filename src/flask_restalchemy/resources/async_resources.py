@@ -0,0 +1,273 @@
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+
+from sqlalchemy import func, inspect, select
+
+from .querybuilder import (
+    create_count_query,
+    create_facet_queries,
+    create_related_counts,
+    is_aggregation_request,
+    is_count_request,
+    is_facets_request,
+    is_related_counts_request,
+)
+from .resources import (
+    NOT_FOUND_ERROR,
+    BaseModelResource,
+    CollectionPropertyResource,
+    ModelResource,
+    ToManyRelationResource,
+    dump_aggregation_row,
+    dump_counted_item,
+    dump_facet,
+    get_collection_args,
+    get_page_args,
+    is_empty_collection,
+    limit_page_query,
+)
+
+
+class AsyncBaseModelResource(BaseModelResource):
+    """The Base class for ORM resources backed by an SQLAlchemy ``AsyncSession``. Handlers are
+    coroutines served by Flask async views support (requires ``flask[async]``).
+
+    Reads are done with the ``AsyncSession``, running independent queries (like a page and its
+    count) concurrently on separate sessions. Writes reuse the synchronous implementation
+    through ``AsyncSession.run_sync``.
+
+    :param callable session_getter: a callable that returns a new ``AsyncSession``, like an
+        ``async_sessionmaker``. A session is created for each request. Since every request
+        runs on its own event loop, engines should not pool connections across requests
+        (e.g. use ``NullPool``).
+
+    The other parameters are the same of :class:`BaseModelResource`, but `query_modifier`
+    receives and returns a ``select`` statement.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_session = None
+
+    @property
+    def _db_session(self):
+        # Synchronous facade of the request session, only usable inside `run_sync`
+        return self._async_session.sync_session
+
+    @asynccontextmanager
+    async def _request_session(self):
+        async with self._session_getter() as session:
+            self._async_session = session
+            try:
+                yield session
+            finally:
+                self._async_session = None
+
+    async def _run_sync(self, method, *args, **kwargs):
+        """
+        Run a synchronous handler inside the greenlet context of the request session, where
+        the ORM is allowed to do implicit IO.
+        """
+        async with self._request_session() as session:
+            return await session.run_sync(lambda _: method(*args, **kwargs))
+
+    async def _dump(self, session, model):
+        # Serialization might trigger lazy loads
+        return await session.run_sync(lambda _: self._dump_item(model))
+
+    async def _async_check_cost(self, session, statement):
+        if self._guardrails is not None:
+            await session.run_sync(lambda _: self._check_cost(statement))
+
+    async def _async_collection_response(self, session, statement):
+        """Async version of :meth:`BaseModelResource._collection_response`."""
+        args = get_collection_args()
+        if self._guardrails is not None:
+            self._guardrails.check_args(args)
+        statement = self._full_text_query(statement)
+        if is_count_request(args):
+            statement = self._create_collection_query(statement, args)
+            count_statement = create_count_query(statement, self._resource_model, args)
+            await self._async_check_cost(session, count_statement)
+            return {"count": await session.scalar(count_statement)}
+        if is_facets_request(args):
+            return await create_async_facets_response(
+                statement, self._resource_model, self._serializer, session
+            )
+        statement = self._create_collection_query(statement, args)
+        dump = None
+        if is_related_counts_request(args) and not is_aggregation_request(args):
+            counts = create_related_counts(self._resource_model, args, self._related_counts)
+            statement = statement.add_columns(*counts)
+            dump = functools.partial(dump_counted_item, count_keys=[c.name for c in counts])
+        elif self._uses_dump_cache() and not is_aggregation_request(args):
+            dump = self._cached_dump()
+        await self._async_check_cost(
+            session, limit_page_query(statement, args, self._default_limit)
+        )
+        return await create_async_response_from_query(
+            statement,
+            self._serializer,
+            session,
+            self._session_getter,
+            self._default_limit,
+            dump=dump,
+        )
+
+
+class AsyncModelResource(AsyncBaseModelResource, ModelResource):
+    async def get(self, id=None):
+        async with self._request_session() as session:
+            if id is not None:
+                model = await session.get(self._resource_model, id)
+                if model is None:
+                    return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+                return await self._dump(session, model)
+            statement = select(self._resource_model)
+            if self._query_modifier:
+                statement = self._query_modifier(statement, self._resource_model)
+            return await self._async_collection_response(session, statement)
+
+    async def head(self, id=None):
+        return await self._run_sync(super().head, id)
+
+    async def post(self):
+        return await self._run_sync(super().post)
+
+    async def put(self, id):
+        return await self._run_sync(super().put, id)
+
+    async def delete(self, id):
+        return await self._run_sync(super().delete, id)
+
+
+class AsyncToManyRelationResource(AsyncBaseModelResource, ToManyRelationResource):
+    """Async version of :class:`ToManyRelationResource` (see :class:`AsyncBaseModelResource`)."""
+
+    async def get(self, relation_id, id=None):
+        async with self._request_session() as session:
+            statement = self._relation_query(select(self._resource_model), relation_id)
+            if id:
+                requested_obj = await session.scalar(statement.where(self._resource_model.id == id))
+                if requested_obj is None:
+                    return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+                return await self._dump(session, requested_obj), HTTPStatus.OK
+            if self._query_modifier:
+                statement = self._query_modifier(statement, self._resource_model)
+            return await self._async_relation_collection_response(session, relation_id, statement)
+
+    async def _async_relation_collection_response(self, session, relation_id, statement):
+        collection = await self._async_collection_response(session, statement)
+        # An empty collection might come from the parent EXISTS guard
+        if is_empty_collection(collection) and not await session.run_sync(
+            lambda _: self._related_exists(relation_id)
+        ):
+            return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+        return collection
+
+    async def head(self, relation_id, id=None):
+        return await self._run_sync(super().head, relation_id, id)
+
+    async def post(self, relation_id):
+        return await self._run_sync(super().post, relation_id)
+
+    async def put(self, relation_id, id):
+        return await self._run_sync(super().put, relation_id, id)
+
+    async def delete(self, relation_id, id):
+        return await self._run_sync(super().delete, relation_id, id)
+
+
+class AsyncCollectionPropertyResource(AsyncToManyRelationResource, CollectionPropertyResource):
+    """
+    Async version of :class:`CollectionPropertyResource` (see :class:`AsyncBaseModelResource`).
+    Properties returning a query are executed using the query statement.
+    """
+
+    async def get(self, relation_id, id=None):
+        async with self._request_session() as session:
+            related_obj = None
+            if self._property_name in inspect(self._related_model).relationships:
+                relation_property = getattr(self._related_model, self._property_name)
+                statement = self._relation_query(
+                    select(self._resource_model), relation_id, relation_property
+                )
+            else:
+                related_obj = await session.get(self._related_model, relation_id)
+                if related_obj is None:
+                    return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+                relation_list_or_query = await session.run_sync(
+                    lambda _: getattr(related_obj, self._property_name)
+                )
+                if hasattr(relation_list_or_query, "statement"):
+                    statement = relation_list_or_query.statement
+                else:
+                    statement = self._list_query(
+                        select(self._resource_model), relation_list_or_query
+                    )
+            if self._query_modifier:
+                statement = self._query_modifier(statement, self._related_model)
+            if related_obj is not None:
+                return await self._async_collection_response(session, statement)
+            return await self._async_relation_collection_response(session, relation_id, statement)
+
+
+async def create_async_response_from_query(
+    statement, serializer, session, session_getter, default_limit=None, dump=None
+):
+    """
+    Async version of :func:`create_response_from_query`. When paginating, the page items and
+    the total count are queried concurrently, the count using a new session.
+
+    :param statement: select statement of the resource model
+    :param ModelSerializer serializer: serializer of the resource model
+    :param AsyncSession session: the request session
+    :param callable session_getter: callable that returns a new ``AsyncSession``
+    :param int default_limit: see :func:`create_response_from_query`
+    :param callable dump: see :func:`create_response_from_query`
+    """
+
+    async def fetch_all(page_statement):
+        if dump is not None:
+            result = (await session.execute(page_statement)).unique()
+            # Like legacy queries, statements of a single entity give the entities
+            rows = result.all() if len(result.keys()) > 1 else result.scalars().all()
+            return await session.run_sync(lambda _: [dump(serializer, row) for row in rows])
+        if is_aggregation_request(get_collection_args()):
+            rows = (await session.execute(page_statement)).all()
+            return [dump_aggregation_row(serializer, row) for row in rows]
+        result = await session.scalars(page_statement)
+        items = result.unique().all()
+        # Serialization might trigger lazy loads
+        return await session.run_sync(lambda _: [serializer.dump(item) for item in items])
+
+    args = get_collection_args()
+    if "page" in args:
+        page, per_page = get_page_args(args, default_limit)
+
+        async def count():
+            async with session_getter() as count_session:
+                return await count_session.scalar(
+                    select(func.count()).select_from(statement.order_by(None).subquery())
+                )
+
+        results, total = await asyncio.gather(
+            fetch_all(statement.limit(per_page).offset((page - 1) * per_page)), count()
+        )
+        return {"page": page, "per_page": per_page, "count": total, "results": results}
+    else:
+        return await fetch_all(limit_page_query(statement, args, default_limit))
+
+
+async def create_async_facets_response(statement, model_class, serializer, session):
+    """Async version of :func:`create_facets_response`."""
+    facet_statements = create_facet_queries(
+        statement, model_class, serializer, get_collection_args()
+    )
+    facets = {}
+    for name, facet_statement in facet_statements.items():
+        rows = (await session.execute(facet_statement)).all()
+        facets[name] = dump_facet(serializer, name, rows)
+    return {"facets": facets}
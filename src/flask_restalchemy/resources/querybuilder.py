@@ -1,12 +1,23 @@
-from sqlalchemy import desc, or_, and_, func
+from http import HTTPStatus
+
+from flask import abort
+from sqlalchemy import Enum, String, desc, or_, and_, func, inspect, select
 import json
 import operator
+import re
 from sqlalchemy.ext.associationproxy import AssociationProxyInstance
+from functools import lru_cache
+
+from sqlalchemy.orm import aliased
+from serialchemy import ModelSerializer
+from serialchemy.field import DefaultFieldSerializer
 
 CASE_INSENSITIVE_ORDER_BY_ENABLED = True
 
 
-def create_collection_query(parent_query, model_class, model_serializer, args):
+def create_collection_query(
+    parent_query, model_class, model_serializer, args, order_by_strategies=None
+):
     """
         Build a query using query parameters in the http URL, disposed on the request args.
         The default logical operator is AND, but you can set the OR as in the following examples:
@@ -16,7 +27,16 @@ def create_collection_query(parent_query, model_class, model_serializer, args):
                 or ?filter={"name": {"ilike": "%Terrans 1%"},"location": {"eq": "Location 1"}}
 
         Ordered search is available using 'order_by=<col_name>'. The minus sign ("-<col_name>") could be
-        used to set descending order.
+        used to set descending order. String columns are ordered case-insensitively by default,
+        the ordering expression of each field could be customized by `order_by_strategies` (see
+        `default_order`).
+
+        Columns of related models could be used with dotted paths, like
+        ?filter={"company.location": "Korhal"}&order_by=company.name (see `build_filter_criteria`
+        and `join_path`).
+
+        Filtered rows could be aggregated by the database using 'group_by' and 'agg' (see
+        `create_aggregation_query`).
 
         :param parent_query:
             SQLAlchemy query instance
@@ -30,57 +50,33 @@ def create_collection_query(parent_query, model_class, model_serializer, args):
         :param args:
             arguments of the Flask http request
 
+        :param dict order_by_strategies:
+            callables returning the ordering expression of a column, by field name (like
+            `raw_order`, `lower_order`, `CollationOrder` or `NormalizedColumnOrder`)
+
         :rtype: query
         :return: SQLAlchemy query instance
         """
 
-    def build_filter_operator(column_name, request_filter, serializer):
-        if column_name == "$or":
-            return or_(
-                build_filter_operator(attr, value, serializer)
-                for attr, value in request_filter.items()
-            )
-        elif column_name == "$and":
-            return and_(
-                build_filter_operator(attr, value, serializer)
-                for attr, value in request_filter.items()
-            )
-        if isinstance(request_filter, dict):
-            op_name = next(iter(request_filter))
-            return get_operator(
-                getattr(model_class, column_name),
-                op_name,
-                request_filter.get(op_name),
-                get_field_serializer_or_none(serializer, column_name),
-            )
-        return get_operator(
-            getattr(model_class, column_name),
-            None,
-            request_filter,
-            get_field_serializer_or_none(serializer, column_name),
-        )
-
     res_query = parent_query
     if "filter" in args:
-        filters = json.loads(args["filter"])
-        for attr, value in filters.items():
-            res_query = res_query.filter(
-                build_filter_operator(attr, value, model_serializer)
-            )
+        res_query = create_filter_query(
+            res_query, model_class, model_serializer, get_filters(args)
+        )
+    if is_aggregation_request(args):
+        res_query = create_aggregation_query(
+            res_query, model_class, model_serializer, args
+        )
     if "order_by" in args:
-        fields = args["order_by"].split(",")
-        for field in fields:
-            field_name = field.lstrip("-")
-            column = getattr(model_class, field_name)
-            # Join with the associated table and define column as the associated property to support sorting
-            if isinstance(column, AssociationProxyInstance):
-                res_query = res_query.outerjoin(column.target_class)
-                column = column.remote_attr
-            if CASE_INSENSITIVE_ORDER_BY_ENABLED and str(column.type) == "VARCHAR":
-                column = func.lower(column)
-            if field[0] == "-":
-                column = desc(column)
-            res_query = res_query.order_by(column)
+        if is_aggregation_request(args):
+            clauses = aggregation_order_by_clauses(
+                model_class, model_serializer, args, order_by_strategies
+            )
+        else:
+            res_query, clauses = order_by_clauses(
+                res_query, model_class, args["order_by"], order_by_strategies
+            )
+        res_query = res_query.order_by(*clauses)
     # limit and pagination have to be done after order_by
     if "limit" in args:
         limit = args["limit"]
@@ -89,6 +85,490 @@ def create_collection_query(parent_query, model_class, model_serializer, args):
     return res_query
 
 
+def order_by_clauses(query, model_class, order_by, order_by_strategies=None):
+    """
+    :param query: SQLAlchemy query of `model_class`
+    :param class model_class: SQLAlchemy model class representing a database resource
+    :param str order_by: the 'order_by' argument, like "name,-id"
+    :param dict order_by_strategies: see `create_collection_query`
+
+    :return: the query, joined with the models of related (or associated) fields, and the
+        ordering expressions of the fields
+    """
+    clauses = []
+    joined = {}
+    for field in order_by.split(","):
+        field_name = field.lstrip("-")
+        if "." in field_name:
+            query, column = join_path(query, model_class, field_name, joined)
+        else:
+            column = getattr(model_class, field_name)
+        # Join with the associated table and define column as the associated property to support sorting
+        if isinstance(column, AssociationProxyInstance):
+            query = query.outerjoin(column.target_class)
+            column = column.remote_attr
+        strategy = (order_by_strategies or {}).get(field_name, default_order)
+        column = strategy(column)
+        if field[0] == "-":
+            column = desc(column)
+        clauses.append(column)
+    return query, clauses
+
+
+def default_order(column):
+    """
+    Ordering strategy used when the field has none: string columns are ordered by their
+    lower case values if `CASE_INSENSITIVE_ORDER_BY_ENABLED`, other columns by their values.
+    """
+    if CASE_INSENSITIVE_ORDER_BY_ENABLED and is_string_column(column):
+        return lower_order(column)
+    return raw_order(column)
+
+
+def raw_order(column):
+    """
+    Order by the column values, as compared by the database. Could be served by a plain
+    index of the column.
+    """
+    return column
+
+
+def lower_order(column):
+    """
+    Order by `lower(column)`. Sorted pages are served by an index only if there is an
+    expression index on `lower(column)`, otherwise every filtered row is sorted.
+    """
+    return func.lower(column)
+
+
+class CollationOrder:
+    """
+    Order by the column values compared with a collation, like `NOCASE` on SQLite or a
+    case-insensitive ICU collation on PostgreSQL. Could be served by an index of the column
+    with the same collation.
+
+    :param str collation: name of the collation
+    """
+
+    def __init__(self, collation):
+        self.collation = collation
+
+    def __call__(self, column):
+        return column.collate(self.collation)
+
+
+class NormalizedColumnOrder:
+    """
+    Order by another column of the same model holding a normalized version of the values (like
+    a lower case copy maintained by the application or by a generated column), which could
+    have a plain index.
+
+    :param str column_name: name of the normalized column
+    """
+
+    def __init__(self, column_name):
+        self.column_name = column_name
+
+    def __call__(self, column):
+        # The entity could be an alias, when ordering by a related model column
+        return getattr(column.parent.entity, self.column_name)
+
+
+def is_string_column(column):
+    column_type = getattr(column, "type", None)
+    return isinstance(column_type, String) and not isinstance(column_type, Enum)
+
+
+def create_filter_query(parent_query, model_class, model_serializer, filters):
+    """
+    Apply the filters of a request (the decoded 'filter' argument, see
+    `create_collection_query`) to the query.
+
+    :param parent_query: SQLAlchemy query (or select statement) of `model_class`
+    :param class model_class: SQLAlchemy model class representing a database resource
+    :param model_serializer: instance of model serializer
+    :param dict filters: filters by column name
+    """
+    res_query = parent_query
+    for criterion in build_filter_criteria(model_class, model_serializer, filters):
+        res_query = res_query.filter(criterion)
+    return res_query
+
+
+def get_filters(args):
+    """
+    :return: the 'filter' argument, decoded unless given as a dict (like on search requests)
+    """
+    filters = args.get("filter", {})
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+    return filters
+
+
+def build_filter_criteria(model_class, serializer, filters):
+    """
+    Build the criteria of the filters, to be joined by AND.
+
+    Filters could follow relationships using dotted paths, like "company.location". Filters
+    sharing a relationship are merged into a single EXISTS subquery (see
+    `Comparator.has` and `Comparator.any`), so no join is needed and the rows are not
+    duplicated by to-many relationships.
+
+    :param class model_class: SQLAlchemy model class of the filtered columns
+    :param serializer: model serializer to load the filter values. Values of related models
+        columns are loaded by a default serializer of the related model (see
+        `get_default_serializer`).
+    :param dict filters: filters by column name (or dotted path)
+
+    :rtype: list
+    """
+    criteria = []
+    related_filters = {}
+    for attr, value in filters.items():
+        if attr == "$or":
+            criteria.append(
+                or_(
+                    and_(*build_filter_criteria(model_class, serializer, {item_attr: item}))
+                    for item_attr, item in value.items()
+                )
+            )
+        elif attr == "$and":
+            criteria.append(and_(*build_filter_criteria(model_class, serializer, value)))
+        elif "." in attr:
+            relationship_name, path = attr.split(".", 1)
+            related_filters.setdefault(relationship_name, {})[path] = value
+        else:
+            field_serializer = serializer and get_field_serializer_or_none(serializer, attr)
+            criteria.append(
+                build_filter_operator(get_column(model_class, attr), value, field_serializer)
+            )
+    for relationship_name, path_filters in related_filters.items():
+        relationship = get_relationship(model_class, relationship_name)
+        related_model = relationship.property.mapper.class_
+        criterion = and_(
+            *build_filter_criteria(
+                related_model, get_default_serializer(related_model), path_filters
+            )
+        )
+        if relationship.property.uselist:
+            criteria.append(relationship.any(criterion))
+        else:
+            criteria.append(relationship.has(criterion))
+    return criteria
+
+
+def build_filter_operator(column, request_filter, serializer):
+    if isinstance(request_filter, dict):
+        op_name = next(iter(request_filter))
+        return get_operator(column, op_name, request_filter.get(op_name), serializer)
+    return get_operator(column, None, request_filter, serializer)
+
+
+def join_path(query, model_class, path, joined):
+    """
+    Outer join the to-one relationships of a dotted path, like "company.location", to order
+    by the column of a related model.
+
+    :param query: SQLAlchemy query (or select statement) of `model_class`
+    :param class model_class: SQLAlchemy model class representing a database resource
+    :param str path: dotted path of a related model column
+    :param dict joined: aliases of the relationships already joined, by path. Updated with the
+        new joins, so relationships shared by many paths are joined once.
+
+    :return: the joined query and the column
+    """
+    names = path.split(".")
+    entity = model_class
+    for index, relationship_name in enumerate(names[:-1]):
+        relationship = get_relationship(entity, relationship_name)
+        if relationship.property.uselist:
+            abort(
+                HTTPStatus.BAD_REQUEST,
+                f"Can not order by to-many relationship {relationship_name}",
+            )
+        key = tuple(names[: index + 1])
+        if key not in joined:
+            target = aliased(relationship.property.mapper.class_)
+            query = query.outerjoin(target, relationship.of_type(target))
+            joined[key] = target
+        entity = joined[key]
+    return query, getattr(entity, names[-1])
+
+
+def get_relationship(entity, name):
+    if name not in inspect(entity).mapper.relationships:
+        abort(HTTPStatus.BAD_REQUEST, f"Unknown relationship {name}")
+    return getattr(entity, name)
+
+
+def get_column(entity, name):
+    if name not in inspect(entity).mapper.all_orm_descriptors:
+        abort(HTTPStatus.BAD_REQUEST, f"Unknown column {name}")
+    return getattr(entity, name)
+
+
+@lru_cache(maxsize=None)
+def get_default_serializer(model_class):
+    """
+    :return: a `ModelSerializer` of the model, shared by the requests filtering its columns
+        through a relationship
+    """
+    return ModelSerializer(model_class)
+
+
+def is_aggregation_request(args):
+    return "group_by" in args or "agg" in args
+
+
+def create_aggregation_query(query, model_class, model_serializer, args):
+    """
+    Replace the query entities by the 'group_by' columns and the 'agg' aggregate functions,
+    grouping the rows by the database:
+
+        ?group_by=company_id&agg=count(id),max(admission)
+
+    Results have the group columns and the aggregates, keyed by their expressions (like
+    "max(admission)"). Aggregates are one of `AGGREGATE_FUNCTIONS` over a serialized column,
+    `count(*)` counts the rows of each group. Only columns dumped by the serializer are allowed.
+
+    :param query: SQLAlchemy query (or select statement) of `model_class`
+    :param class model_class: SQLAlchemy model class representing a database resource
+    :param model_serializer: instance of model serializer
+    :param args: arguments of the Flask http request
+    """
+    group_columns = [
+        get_aggregation_column(model_class, model_serializer, name)
+        for name in split_arg(args, "group_by")
+    ]
+    aggregates = [
+        create_aggregate(model_class, model_serializer, *aggregate)
+        for aggregate in parse_aggregates(args)
+    ]
+    query = select_columns(query, group_columns + aggregates)
+    # Orders of the query members (like relationship order_by) are meaningless for groups
+    return query.order_by(None).group_by(*group_columns)
+
+
+def create_aggregate(model_class, model_serializer, expression, function_name, column_name):
+    """
+    :return: the aggregate function of a parsed 'agg' expression (see `parse_aggregates`),
+        labeled by the expression
+    """
+    if column_name == "*":
+        column = get_primary_key_column(model_class)
+    else:
+        column = get_aggregation_column(model_class, model_serializer, column_name)
+    return AGGREGATE_FUNCTIONS[function_name](column).label(expression)
+
+
+def aggregation_order_by_clauses(model_class, model_serializer, args, order_by_strategies=None):
+    """
+    Ordering expressions of an aggregation request (see `create_aggregation_query`). Only the
+    'group_by' columns and the 'agg' expressions could be ordered by, like
+    ?group_by=location&agg=count(id)&order_by=-count(id),location, since any other column is
+    not a single value of each group.
+
+    :param class model_class: SQLAlchemy model class representing a database resource
+    :param model_serializer: instance of model serializer
+    :param args: arguments of the Flask http request
+    :param dict order_by_strategies: see `create_collection_query`
+    :rtype: list
+    """
+    group_names = split_arg(args, "group_by")
+    aggregates = {aggregate[0]: aggregate for aggregate in parse_aggregates(args)}
+    clauses = []
+    for field in split_arg(args, "order_by"):
+        field_name = field.lstrip("-")
+        if field_name in group_names:
+            column = get_aggregation_column(model_class, model_serializer, field_name)
+            column = (order_by_strategies or {}).get(field_name, default_order)(column)
+        elif field_name in aggregates:
+            column = create_aggregate(model_class, model_serializer, *aggregates[field_name])
+        else:
+            abort(
+                HTTPStatus.BAD_REQUEST,
+                f"Can not order by {field_name}, not grouped nor aggregated",
+            )
+        clauses.append(desc(column) if field[0] == "-" else column)
+    return clauses
+
+
+def is_related_counts_request(args):
+    return bool(args.get("counts"))
+
+
+def create_related_counts(model_class, args, allowed):
+    """
+    Build correlated subqueries counting the related rows of the to-many relationships in
+    'counts', like ?counts=employees,departments, to be added to the collection query
+    columns. Each count is labeled `{name}_count`.
+
+    :param class model_class: SQLAlchemy model class of the collection
+    :param args: arguments of the Flask http request
+    :param allowed: names of the relationships that could be counted
+    :rtype: list
+    """
+    mapper = inspect(model_class)
+    columns = []
+    for name in args["counts"].split(","):
+        prop = mapper.relationships.get(name)
+        if name not in allowed or prop is None or not prop.uselist:
+            abort(HTTPStatus.BAD_REQUEST, f"Invalid related count {name}")
+        statement, parent, _ = select_relationship(getattr(model_class, name), func.count())
+        count = statement.where(parent.id == model_class.id).correlate(model_class)
+        columns.append(count.scalar_subquery().label(f"{name}_count"))
+    return columns
+
+
+def select_relationship(relation_property, *columns):
+    """
+    Select from aliases of the parent and the child models of a relationship, joined by the
+    relationship itself, so its whole criteria (like a custom `primaryjoin` or the secondary
+    table) applies. Both models are aliased, so the statement could be correlated to either
+    of them, even for self-referential relationships.
+
+    :param relation_property: the SQLAlchemy relationship (like `Company.employees`)
+    :param columns: the selected columns, defaults to the parent id
+    :return: the select statement, the parent alias and the child alias
+    """
+    parent = aliased(relation_property.class_)
+    child = aliased(relation_property.prop.mapper.class_)
+    statement = (
+        select(*columns or [parent.id])
+        .select_from(parent)
+        .join(child, getattr(parent, relation_property.key).of_type(child))
+    )
+    return statement, parent, child
+
+
+def is_count_request(args):
+    return args.get("count", "").lower() in ("1", "true")
+
+
+def create_count_query(query, model_class, args):
+    """
+    Build a `SELECT COUNT` statement for the rows of a collection query, as built by
+    `create_collection_query` with the same args.
+
+    :param query: SQLAlchemy query (or select statement) of `model_class`
+    :param class model_class: SQLAlchemy model class representing a database resource
+    :param args: arguments of the Flask http request
+    """
+    if hasattr(query, "statement"):
+        query = query.statement
+    query = query.order_by(None)
+    if "limit" in args or is_aggregation_request(args):
+        return select(func.count()).select_from(query.subquery())
+    return select_columns(query, [func.count(get_primary_key_column(model_class))])
+
+
+def is_facets_request(args):
+    return "facets" in args
+
+
+def create_facet_queries(parent_query, model_class, model_serializer, args):
+    """
+    Build a query for each column in 'facets', returning the distinct values of the column
+    along with their counts on the filtered rows, most frequent values first:
+
+        ?facets=location,name&facet_limit=10&facet_exclude_own=true
+
+    'facet_limit' limits the values of each facet. With 'facet_exclude_own', the top level
+    filter on the facet column itself is ignored by its facet, so clients could list the
+    alternatives of a selected value.
+
+    :param parent_query: SQLAlchemy query (or select statement) of `model_class`
+    :param class model_class: SQLAlchemy model class representing a database resource
+    :param model_serializer: instance of model serializer
+    :param args: arguments of the Flask http request
+
+    :rtype: dict
+    :return: facet queries by column name, returning `(value, count)` rows
+    """
+    filters = get_filters(args)
+    exclude_own = args.get("facet_exclude_own", "").lower() in ("1", "true")
+    limit = args.get("facet_limit")
+    if limit is not None:
+        if not limit.isdigit():
+            abort(HTTPStatus.BAD_REQUEST, f"Invalid facet_limit {limit}")
+        limit = int(limit)
+
+    queries = {}
+    for name in split_arg(args, "facets"):
+        column = get_aggregation_column(model_class, model_serializer, name)
+        facet_filters = {
+            attr: value
+            for attr, value in filters.items()
+            if not (exclude_own and attr == name)
+        }
+        query = create_filter_query(
+            parent_query, model_class, model_serializer, facet_filters
+        )
+        count = func.count(get_primary_key_column(model_class)).label("count")
+        query = select_columns(query, [column.label("value"), count])
+        query = query.order_by(None).group_by(column).order_by(desc(count), column)
+        if limit is not None:
+            query = query.limit(limit)
+        queries[name] = query
+    return queries
+
+
+def select_columns(query, columns):
+    """
+    Replace the entities of a query (or the columns of a select statement), keeping its
+    criteria.
+    """
+    if hasattr(query, "with_entities"):
+        return query.with_entities(*columns)
+    return query.with_only_columns(*columns, maintain_column_froms=True)
+
+
+def parse_aggregates(args):
+    """
+    :return: list of (expression, function name, column name) of the 'agg' request argument
+    """
+    aggregates = []
+    for expression in split_arg(args, "agg"):
+        match = AGGREGATE_PATTERN.match(expression)
+        if match is None or match.group(1) not in AGGREGATE_FUNCTIONS:
+            abort(HTTPStatus.BAD_REQUEST, f"Invalid aggregate {expression}")
+        function_name, column_name = match.groups()
+        if column_name == "*" and function_name != "count":
+            abort(HTTPStatus.BAD_REQUEST, f"Invalid aggregate {expression}")
+        aggregates.append((expression, function_name, column_name))
+    return aggregates
+
+
+def get_aggregation_column(model_class, model_serializer, column_name):
+    field = model_serializer.fields.get(column_name)
+    if (
+        field is None
+        or field.load_only
+        or column_name not in model_serializer.mapper.column_attrs
+    ):
+        abort(HTTPStatus.BAD_REQUEST, f"Invalid aggregation column {column_name}")
+    return getattr(model_class, column_name)
+
+
+def get_primary_key_column(model_class):
+    # Counting a not null column keeps the FROM clause when the query has no criteria
+    return model_class.__mapper__.primary_key[0]
+
+
+def split_arg(args, name):
+    return [value.strip() for value in args.get(name, "").split(",") if value.strip()]
+
+
+AGGREGATE_FUNCTIONS = {
+    "count": func.count,
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+
+AGGREGATE_PATTERN = re.compile(r"^(\w+)\((\w+|\*)\)$")
+
 # Filter operators defined on SQLAlchemy ColumnElement
 SQLA_OPERATORS = {
     "like": "like",
@@ -117,10 +597,26 @@ def parse_value(value, serializer):
     if not serializer:
         return value
     if isinstance(value, list):
-        return [serializer.load(item) for item in value]
+        return parse_values(value, serializer)
     return serializer.load(value)
 
 
+def parse_values(values, serializer):
+    """
+    Load the values of list operators (like "in") in a single pass. Values are not loaded one
+    by one when the field serializer does not change them, and duplicated values are loaded
+    (and bound to the query) once.
+    """
+    try:
+        values = list(dict.fromkeys(values))
+    except TypeError:
+        # Unhashable values (like lists) could not be deduplicated
+        pass
+    if type(serializer) is DefaultFieldSerializer:
+        return values
+    return [serializer.load(item) for item in values]
+
+
 def get_operator(column, op_name, value, serializer):
     """
     :param column:
@@ -154,4 +650,6 @@ def get_field_serializer_or_none(serializer, field_name):
     field = serializer.fields.get(field_name)
     if not field:
         return None
+    # Column type serializers (like datetime) are assigned on the first dump
+    serializer._assign_default_serializer(field, field_name)
     return field.serializer
@@ -1,14 +1,59 @@
-import warnings
+import functools
+from contextlib import ExitStack, contextmanager
 from http import HTTPStatus
+from inspect import isawaitable
+from types import SimpleNamespace
 
-from flask import request, json, jsonify, Response
+from flask import abort, current_app, g, has_app_context, request, json, jsonify, Response
 from flask.views import MethodView
-from sqlalchemy import select
-from sqlalchemy.orm import load_only
-from sqlalchemy.orm.collections import InstrumentedList
-
-from flask_restalchemy.serialization import ModelSerializer
-from .querybuilder import create_collection_query
+from sqlalchemy import (
+    case,
+    delete,
+    exists,
+    func,
+    insert,
+    inspect,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased, scoped_session
+
+from flask_restalchemy.bulkimport import (
+    DEFAULT_IMPORT_BATCH_SIZE,
+    IMPORT_STREAM_ERRORS,
+    MAX_REPORTED_ERRORS,
+    iter_batches,
+    iter_import_rows,
+)
+from flask_restalchemy.changes import (
+    HEARTBEAT_INTERVAL,
+    SubscriptionClosed,
+    create_event_filter,
+    format_event,
+    get_channel,
+)
+from flask_restalchemy.routing import get_session_key
+from flask_restalchemy.serialization import Field, ModelSerializer
+from flask_restalchemy.sync import Watermark
+from .querybuilder import (
+    create_collection_query,
+    create_count_query,
+    create_facet_queries,
+    create_filter_query,
+    create_related_counts,
+    get_filters,
+    is_aggregation_request,
+    is_count_request,
+    is_facets_request,
+    is_related_counts_request,
+    order_by_clauses,
+    parse_aggregates,
+    select_relationship,
+)
 
 
 class BaseResource(MethodView):
@@ -25,12 +70,21 @@ class BaseResource(MethodView):
                 if verb == "ALL":
                     self.dispatch_request = decorator(self.dispatch_request)
                 else:
-                    verb_method_name = verb.lower()
-                    decorated_method = decorator(getattr(self, verb_method_name))
-                    setattr(self, verb_method_name, decorated_method)
+                    verb_method_names = [verb.lower()]
+                    # HEAD requests must pass by the same checks of GET requests
+                    if verb == "GET" and hasattr(self, "head"):
+                        verb_method_names.append("head")
+                    for verb_method_name in verb_method_names:
+                        decorated_method = decorator(getattr(self, verb_method_name))
+                        setattr(self, verb_method_name, decorated_method)
 
     def dispatch_request(self, *args, **kwargs):
-        view_response = super().dispatch_request(*args, **kwargs)
+        return self._make_response(super().dispatch_request(*args, **kwargs))
+
+    def _make_response(self, view_response):
+        if isawaitable(view_response):
+            # Async handlers wrapped by synchronous request decorators
+            view_response = current_app.ensure_sync(_await)(view_response)
         data, code, header = unpack(view_response)
         if isinstance(data, Response):
             return data
@@ -82,6 +136,40 @@ class BaseModelResource(BaseResource):
         function. The method signature should look like this: query_callback(parent_query, resource_model)
 
     :param dict|list request_decorators: a list of decorators
+
+    :param bool read_only_get: if True, GET and HEAD requests run in a read-only transaction
+        (see :func:`read_only_transaction`). When the serializer only dumps plain columns, rows
+        are fetched instead of entities, skipping the ORM identity map and change tracking.
+
+    :param FullTextSearch full_text_search: backend used to search collections by the `q`
+        request argument (see :mod:`flask_restalchemy.fulltext`)
+
+    :param dict order_by_strategies: ordering strategies by field name, to order by
+        expressions served by the database indexes (see :func:`create_collection_query`)
+
+    :param QueryGuardrails guardrails: limits on the page sizes, the duration and the cost of
+        the queries (see :mod:`flask_restalchemy.guardrails`)
+
+    :param SingleFlight single_flight: coalesces identical concurrent GET requests (see
+        :mod:`flask_restalchemy.coalescing`)
+
+    :param IncrementalSync incremental_sync: enables the delta mode of collections, requested
+        with the `since` argument (see :mod:`flask_restalchemy.sync`)
+
+    :param ChangeBroker change_broker: if given, the models created, updated and deleted by the
+        resource are published to the change streams (see :mod:`flask_restalchemy.changes`)
+
+    :param list related_counts: names of the to-many relationships whose number of related
+        rows could be requested with collections by the `counts` argument, like
+        ``?counts=employees``. Counts are computed by correlated subqueries of the collection
+        query and dumped along with each item as `{name}_count`.
+
+    :param ReferenceCache reference_cache: if given, the models written by the resource have
+        their reference snapshots invalidated (see :mod:`flask_restalchemy.reference`)
+
+    :param DumpCache dump_cache: if given, the models are serialized through the cache, and
+        the models written by the resource are discarded from it (see
+        :mod:`flask_restalchemy.memoization`)
     """
 
     def __init__(
@@ -91,10 +179,22 @@ class BaseModelResource(BaseResource):
         session_getter,
         query_modifier=None,
         request_decorators=None,
+        read_only_get=False,
+        full_text_search=None,
+        order_by_strategies=None,
+        guardrails=None,
+        single_flight=None,
+        incremental_sync=None,
+        change_broker=None,
+        related_counts=None,
+        reference_cache=None,
+        dump_cache=None,
     ):
         """Constructor
         """
-
+        if single_flight is not None:
+            # Coalesce before request decorators are applied, so they run for every request
+            self.get = single_flight.wrap(self.get)
         super().__init__(request_decorators)
         self._resource_model = declarative_model
         self._serializer = serializer
@@ -104,46 +204,398 @@ class BaseModelResource(BaseResource):
         ), f"Invalid serializer instance: {serializer}"
         self._session_getter = session_getter
         self._query_modifier = query_modifier
+        self._read_only_get = read_only_get
+        self._full_text_search = full_text_search
+        self._order_by_strategies = order_by_strategies
+        self._guardrails = guardrails
+        self._incremental_sync = incremental_sync
+        self._change_broker = change_broker
+        self._related_counts = related_counts or ()
+        self._reference_cache = reference_cache
+        self._dump_cache = dump_cache
+        self._row_columns = None
+        if read_only_get:
+            self._row_columns = get_row_columns(declarative_model, serializer)
+
+    def dispatch_request(self, *args, search=False, **kwargs):
+        if search:
+            # Searches are collection GET requests with the arguments on the JSON body
+            request.restalchemy_search_args = load_search_args()
+        with ExitStack() as stack:
+            if is_read_request():
+                if self._read_only_get:
+                    stack.enter_context(read_only_transaction(self._db_session))
+                if self._guardrails is not None and self._guardrails.statement_timeout:
+                    session = self._db_session
+                    stack.enter_context(self._guardrails.apply_statement_timeout(session))
+            return self._dispatch(search, *args, **kwargs)
+
+    def _dispatch(self, search, *args, **kwargs):
+        if search:
+            return self._make_response(current_app.ensure_sync(self.get)(*args, **kwargs))
+        return super().dispatch_request(*args, **kwargs)
+
+    def _collection_response(self, query):
+        """
+        Response for the collection of the given query, before the request arguments (filters,
+        ordering, pagination, aggregation or facets) are applied.
+        """
+        args = get_collection_args()
+        if self._guardrails is not None:
+            self._guardrails.check_args(args)
+        if self._incremental_sync is not None and "since" in args:
+            return self._sync_response(query, args)
+        if is_count_request(args):
+            return {"count": self._count(query)}
+        query = self._full_text_query(query)
+        if is_facets_request(args):
+            return create_facets_response(query, self._resource_model, self._serializer)
+        query = self._read_query(self._create_collection_query(query, args))
+        dump = None
+        if is_related_counts_request(args) and not is_aggregation_request(args):
+            counts = create_related_counts(self._resource_model, args, self._related_counts)
+            query = query.add_columns(*counts)
+            dump = functools.partial(dump_counted_item, count_keys=[c.name for c in counts])
+        elif self._uses_dump_cache() and not is_aggregation_request(args):
+            dump = self._cached_dump()
+        self._check_cost(limit_page_query(query, args, self._default_limit))
+        return create_response_from_query(query, self._serializer, self._default_limit, dump)
+
+    def _sync_response(self, query, args):
+        """
+        Response of the delta mode of collections (see :class:`IncrementalSync`).
+        """
+        sync = self._incremental_sync
+        watermark = Watermark.decode(args["since"])
+        if "filter" in args:
+            query = create_filter_query(
+                query, self._resource_model, self._serializer, get_filters(args)
+            )
+        query = sync.changes_query(query, self._resource_model, watermark)
+        limit = args.get("limit", self._default_limit)
+        if limit is not None:
+            if not str(limit).isdigit():
+                abort(HTTPStatus.BAD_REQUEST, f"Invalid limit {limit}")
+            limit = int(limit)
+            query = query.limit(limit + 1)
+        changes = query.all()
+        # One more row (and deletion) than the limit is fetched to know if there are more
+        deleted = sync.deleted_since(
+            self._db_session,
+            self._resource_model,
+            watermark,
+            limit=None if limit is None else limit + 1,
+        )
+        has_more = limit is not None and (len(changes) > limit or len(deleted) > limit)
+        changes = changes[:limit]
+        deleted = deleted[:limit]
+        last_change = changes[-1] if changes else None
+        next_watermark = sync.next_watermark(self._resource_model, watermark, last_change, deleted)
+        return {
+            "changes": [self._dump_item(item) for item in changes],
+            "deleted": [id for cursor, id in deleted],
+            "watermark": next_watermark.encode(),
+            "has_more": has_more,
+        }
+
+    def _count(self, query):
+        """
+        Count the items of the collection of the given query (see `_collection_response`)
+        without fetching them.
+        """
+        args = get_collection_args()
+        query = self._full_text_query(query)
+        query = self._create_collection_query(query, args)
+        count_query = create_count_query(query, self._resource_model, args)
+        self._check_cost(count_query)
+        return self._db_session.execute(count_query).scalar()
+
+    def _check_cost(self, statement):
+        if self._guardrails is not None:
+            self._guardrails.check_cost(self._db_session, statement)
+
+    @property
+    def _default_limit(self):
+        """
+        Number of items of collections requested without `limit` or `page`, and the default
+        page size, or `None` if collections are not limited.
+        """
+        return self._guardrails.default_limit if self._guardrails is not None else None
+
+    def _create_collection_query(self, query, args):
+        return create_collection_query(
+            query,
+            self._resource_model,
+            self._serializer,
+            args,
+            order_by_strategies=self._order_by_strategies,
+        )
+
+    def _full_text_query(self, query, ranked=True):
+        """
+        Restrict the query to the items matching the `q` request argument, ranked by
+        relevance unless `order_by` is requested (see `_is_ranked_search`).
+
+        :param bool ranked: if False, the query is never ordered by relevance
+        """
+        args = get_collection_args()
+        if self._full_text_search is None or not args.get("q"):
+            return query
+        return self._full_text_search.search(
+            query, self._resource_model, args["q"], ranked=ranked and self._is_ranked_search()
+        )
+
+    def _is_ranked_search(self):
+        """
+        :return: True if the collection is ordered by the relevance to the `q` request argument
+        """
+        args = get_collection_args()
+        return self._full_text_search is not None and bool(args.get("q")) and "order_by" not in args
+
+    def _search_rank(self):
+        """
+        :return: the ordering expression by relevance to the `q` request argument (see
+            `_is_ranked_search`)
+        """
+        return self._full_text_search.rank(self._resource_model, get_collection_args()["q"])
+
+    def _exists(self, query):
+        return self._db_session.query(query.exists()).scalar()
+
+    def _read_query(self, query):
+        """
+        On read-only requests, fetch rows with the serialized columns instead of entities when
+        possible.
+        """
+        if (
+            self._row_columns is None
+            or not is_read_request()
+            or is_aggregation_request(get_collection_args())
+        ):
+            return query
+        return query.with_entities(*self._row_columns)
+
+    def _get_for_read(self, id):
+        if self._row_columns is None or not is_read_request():
+            return self._db_session.get(self._resource_model, id)
+        query = self._db_session.query(self._resource_model)
+        return self._read_query(query.filter(self._resource_model.id == id)).one_or_none()
 
     def _save_model(self, model):
-        session = self._session_getter()
+        session = self._db_session
         session.add(model)
         session.commit()
+        self._forget_dump(model.id)
 
     def _save_serialized(self, serialized_data, existing_model=None):
         model = self._serializer.load(
-            serialized_data, existing_model, self._session_getter()
+            serialized_data, existing_model, self._db_session
         )
         self._save_model(model)
         return self._serializer.dump(model)
 
+    def _dump_item(self, item):
+        """
+        Serialize an entity, or a row (see :func:`dump_item`), through the dump cache if any.
+        """
+        if not self._uses_dump_cache():
+            return dump_item(self._serializer, item)
+        return self._cached_dump()(self._serializer, item)
+
+    def _uses_dump_cache(self):
+        # Uncommitted changes of transactional batches must not be cached
+        return self._dump_cache is not None and not is_deferring_commits()
+
+    def _cached_dump(self):
+        """
+        :return: the dump function of the dump cache, keeping apart the models loaded by the
+            session of each shard (see :func:`get_session_key`)
+        """
+        session_key = get_session_key(self._db_session)
+        return functools.partial(self._dump_cache.dump, session_key=session_key)
+
+    def _forget_dump(self, model_id=None):
+        """
+        Discard the cached dumps of the resource model with the given id, or of all of them if
+        `model_id` is `None`, once the change is committed (see :func:`after_commit`).
+        """
+        if self._dump_cache is not None:
+            after_commit(
+                functools.partial(self._dump_cache.invalidate, self._resource_model, model_id)
+            )
+
+    def _dump_deleted(self, model):
+        """
+        Dump a model before it is deleted, to be published (see :meth:`_publish_change`).
+        """
+        if self._change_broker is not None:
+            return self._serializer.dump(model)
+
+    def _publish_change(self, change_type, data):
+        """
+        Publish a committed change of a model to the change streams, and invalidate the
+        reference snapshot of the model (see :func:`after_commit`).
+
+        :param str change_type: "create", "update" or "delete"
+        :param dict data: the dumped model
+        """
+        self._invalidate_reference()
+        if self._change_broker is not None:
+            channel = get_channel(self._resource_model)
+            event = {"type": change_type, "data": data}
+            after_commit(functools.partial(self._change_broker.publish, channel, event))
+
+    def _invalidate_reference(self):
+        if self._reference_cache is not None:
+            after_commit(functools.partial(self._reference_cache.invalidate, self._resource_model))
+
     @property
     def _db_session(self):
         return self._session_getter()
 
 
 class ModelResource(BaseModelResource):
+    """Resource class of a model, providing LIST and CREATE on the collection and GET, UPDATE
+    and DELETE on its items.
+
+    :param bool reference: if True, item GETs and the collection GETs without arguments are
+        served from the snapshot of the `reference_cache` (see
+        :class:`flask_restalchemy.reference.ReferenceCache`)
+
+    :param int import_batch_size: number of rows of the batches of bulk imports, each one
+        committed on its own (see :meth:`_bulk_import`)
+
+    Other parameters are the ones of :class:`BaseModelResource`.
+    """
+
+    def __init__(
+        self, *args, reference=False, import_batch_size=DEFAULT_IMPORT_BATCH_SIZE, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self._reference = reference
+        self._import_batch_size = import_batch_size
+
     def get(self, id=None):
+        if self._serves_reference():
+            return self._reference_response(id)
         if id is not None:
-            model = self._db_session.get(self._resource_model, id)
+            model = self._get_for_read(id)
             if model is None:
                 return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
-            return self._serializer.dump(model)
+            return self._dump_item(model)
         else:
             query = self._db_session.query(self._resource_model)
             if self._query_modifier:
                 query = self._query_modifier(query, self._resource_model)
-            query = create_collection_query(
-                query, self._resource_model, self._serializer, request.args
-            )
-
-            return create_response_from_query(query, self._serializer)
-
-    def post(self):
+            return self._collection_response(query)
+
+    def head(self, id=None):
+        if self._serves_reference():
+            snapshot = self._reference_snapshot()
+            if id is not None:
+                return head_response(snapshot.get(id) is not None)
+            return head_response(True, len(snapshot.items))
+        if id is not None:
+            query = self._db_session.query(self._resource_model.id)
+            return head_response(self._exists(query.filter(self._resource_model.id == id)))
+        query = self._db_session.query(self._resource_model)
+        if self._query_modifier:
+            query = self._query_modifier(query, self._resource_model)
+        return head_response(True, self._count(query))
+
+    def post(self, bulk_import=False):
+        if bulk_import:
+            return self._bulk_import()
         serialized = load_request_json()
         saved = self._save_serialized(serialized)
+        self._publish_change("create", saved)
         return saved, HTTPStatus.CREATED
 
+    def _bulk_import(self):
+        """
+        Bulk import: create the models of the rows of the request body, an NDJSON or CSV
+        stream (optionally gzip encoded, see :func:`iter_import_rows`) parsed incrementally.
+        Rows are loaded by the serializer and inserted in batches of `import_batch_size` rows,
+        each one committed on its own. Invalid rows are skipped, and a batch failing to be
+        committed is rolled back. The response reports each batch::
+
+            {
+                "inserted": 1999,
+                "failed": 1,
+                "batches": [
+                    {"batch": 1, "rows": 1000, "inserted": 999, "errors": [
+                        {"line": 12, "error": "Invalid JSON"}
+                    ]},
+                    {"batch": 2, "rows": 1000, "inserted": 1000, "errors": []}
+                ]
+            }
+
+        If the body stream is invalid (like a corrupt gzip stream), the import stops: the rows
+        of the batch being read are discarded, and the report has the `error` with a 400
+        status. The models created by each committed batch are published to the change
+        streams.
+        """
+        try:
+            rows = iter_import_rows(request.stream, request.mimetype, request.content_encoding)
+        except ValueError as error:
+            return str(error), HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+        report = {"inserted": 0, "failed": 0, "batches": []}
+        reported_errors = 0
+        try:
+            for number, batch in enumerate(iter_batches(rows, self._import_batch_size), 1):
+                batch_report = self._import_batch(batch, MAX_REPORTED_ERRORS - reported_errors)
+                batch_report["batch"] = number
+                reported_errors += len(batch_report["errors"])
+                report["inserted"] += batch_report["inserted"]
+                report["failed"] += batch_report["rows"] - batch_report["inserted"]
+                report["batches"].append(batch_report)
+        except IMPORT_STREAM_ERRORS as error:
+            report["error"] = f"Invalid import stream: {error}"
+            return report, HTTPStatus.BAD_REQUEST
+        return report
+
+    def _import_batch(self, batch, max_errors):
+        """
+        Insert the valid rows of a bulk import batch, in a transaction of its own.
+
+        :param list batch: (line number, row) pairs of the batch
+        :param int max_errors: maximum number of row errors to report
+        :return: the report of the batch
+        """
+        session = self._db_session
+        models = []
+        errors = []
+        for line, row in batch:
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                models.append(self._serializer.load(row, session=session))
+            except Exception as error:
+                # Any error of the serializer, or of the model constructor, invalidates the row
+                if len(errors) < max_errors:
+                    errors.append({"line": line, "error": str(error)})
+        created = []
+        try:
+            session.add_all(models)
+            session.flush()
+            if self._change_broker is not None:
+                # Dumped before the commit expires the models, so they are not loaded again
+                created = [self._serializer.dump(model) for model in models]
+            session.commit()
+        except SQLAlchemyError as error:
+            if is_deferring_commits():
+                # Rolling back the session shared by a transactional batch would discard the
+                # changes of the previous sub-requests, the whole batch fails instead
+                abort(HTTPStatus.BAD_REQUEST, str(getattr(error, "orig", None) or error))
+            session.rollback()
+            errors.append({"error": str(getattr(error, "orig", None) or error)})
+            models = created = []
+        if models:
+            self._invalidate_reference()
+        for data in created:
+            self._publish_change("create", data)
+        return {"rows": len(batch), "inserted": len(models), "errors": errors}
+
     def put(self, id):
         model = self._db_session.get(self._resource_model, id)
         if model is None:
@@ -153,6 +605,7 @@ class ModelResource(BaseModelResource):
         request_data = load_request_json()
         serialized.update(request_data)
         result = self._save_serialized(serialized, existing_model=model)
+        self._publish_change("update", result)
         return result
 
     def delete(self, id):
@@ -160,11 +613,37 @@ class ModelResource(BaseModelResource):
         if model is None:
             return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
         session = self._db_session
+        if self._incremental_sync is not None:
+            self._incremental_sync.record_deletion(session, model)
+        deleted = self._dump_deleted(model)
+        self._forget_dump(model.id)
         session.delete(model)
         session.flush()
         session.commit()
+        self._publish_change("delete", deleted)
         return "", HTTPStatus.NO_CONTENT
 
+    def _serves_reference(self):
+        """
+        Returns if the request is served from the reference snapshot: requests of items or of
+        the whole collection, without collection arguments.
+        """
+        return self._reference and not get_collection_args() and not is_deferring_commits()
+
+    def _reference_snapshot(self):
+        return self._reference_cache.get_snapshot(
+            self._db_session, self._resource_model, self._serializer
+        )
+
+    def _reference_response(self, id):
+        snapshot = self._reference_snapshot()
+        if id is not None:
+            item = snapshot.get(id)
+            if item is None:
+                return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+            return item
+        return snapshot.items[: self._default_limit]
+
 
 class ToManyRelationResource(BaseModelResource):
     """Resource class that receives an SQLAlchemy relationship define the API to provide
@@ -192,6 +671,16 @@ class ToManyRelationResource(BaseModelResource):
         session_getter,
         query_modifier=None,
         request_decorators=None,
+        read_only_get=False,
+        full_text_search=None,
+        order_by_strategies=None,
+        guardrails=None,
+        single_flight=None,
+        incremental_sync=None,
+        change_broker=None,
+        related_counts=None,
+        reference_cache=None,
+        dump_cache=None,
     ):
         """Constructor
         """
@@ -202,48 +691,174 @@ class ToManyRelationResource(BaseModelResource):
             session_getter,
             query_modifier=query_modifier,
             request_decorators=request_decorators,
+            read_only_get=read_only_get,
+            full_text_search=full_text_search,
+            order_by_strategies=order_by_strategies,
+            guardrails=guardrails,
+            single_flight=single_flight,
+            incremental_sync=incremental_sync,
+            change_broker=change_broker,
+            related_counts=related_counts,
+            reference_cache=reference_cache,
+            dump_cache=dump_cache,
         )
         self._relation_property = relation_property
         self._related_model = relation_property.class_
 
-    def get(self, relation_id, id=None):
+    def get(self, relation_id=None, id=None):
+        if relation_id is None:
+            return self._parents_response()
         if id:
-            requested_obj = self._query_related_obj(relation_id, id)
+            query = self._relation_query(
+                self._db_session.query(self._resource_model), relation_id
+            )
+            query = query.filter(self._resource_model.id == id)
+            requested_obj = self._read_query(query).one_or_none()
             if not requested_obj:
                 return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
-            return self._serializer.dump(requested_obj), HTTPStatus.OK
+            return self._dump_item(requested_obj), HTTPStatus.OK
         else:
-            session = self._db_session
-            # load_only avoids loading all columns when we only need to check existence
-            related_obj = session.get(
-                self._related_model,
-                relation_id,
-                options=[load_only(self._related_model.id)],
+            query = self._relation_query(
+                self._db_session.query(self._resource_model), relation_id
             )
-            if related_obj is None:
-                return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+            if self._query_modifier:
+                query = self._query_modifier(query, self._resource_model)
+            return self._relation_collection_response(relation_id, query)
 
-            # TODO: Is there a more efficient way than using getattr?
-            relation_list_or_query = getattr(related_obj, self._relation_property.key)
-            if isinstance(relation_list_or_query, InstrumentedList) or not hasattr(
-                relation_list_or_query, "paginate"
-            ):
-                warnings.warn(
-                    "Warning: relationship does not support pagination nor filter."
-                    'Use flask-sqlalchemy relationship with lazy="dynamic".'
-                )
-                collection = [
-                    self._serializer.dump(item) for item in relation_list_or_query
-                ]
-            else:
-                query = relation_list_or_query
-                if self._query_modifier:
-                    query = self._query_modifier(query, self._resource_model)
-                query = create_collection_query(
-                    query, self._resource_model, self._serializer, request.args
-                )
-                collection = create_response_from_query(query, self._serializer)
-            return collection
+    def head(self, relation_id=None, id=None):
+        if relation_id is None:
+            return self.get()
+        query = self._relation_query(
+            self._db_session.query(self._resource_model), relation_id
+        )
+        if id:
+            return head_response(self._exists(query.filter(self._resource_model.id == id)))
+        if self._query_modifier:
+            query = self._query_modifier(query, self._resource_model)
+        return self._relation_head_response(relation_id, self._count(query))
+
+    def _relation_head_response(self, relation_id, count):
+        if not count and not self._related_exists(relation_id):
+            return head_response(False)
+        return head_response(True, count)
+
+    def _relation_query(self, query, relation_id, relation_property=None):
+        """
+        Restrict the query to the children of the parent identified by `relation_id` using the
+        relationship criteria, so filters and pagination are done by the database regardless of
+        the relationship loader strategy. The parent is not loaded: an EXISTS subquery joining
+        the parent to the child through the relationship (see :func:`select_relationship`) is
+        merged into the query instead, so it also guards the parent existence.
+
+        :param query: query (or select statement) of the child model
+        :param relation_id: id of the related (parent) model
+        :param relation_property: defaults to the resource relationship
+        """
+        relation_property = relation_property or self._relation_property
+        prop = relation_property.prop
+        statement, parent, child = select_relationship(relation_property)
+        relation_criterion = statement.where(
+            parent.id == relation_id, child.id == prop.mapper.class_.id
+        ).exists()
+        query = query.filter(relation_criterion)
+        # Searches are ranked first, the relationship order is applied after the rank (see
+        # `_full_text_query`)
+        if prop.order_by and not self._is_ranked_search():
+            query = query.order_by(*prop.order_by)
+        return query
+
+    def _full_text_query(self, query, ranked=True):
+        query = super()._full_text_query(query, ranked)
+        if ranked and self._is_ranked_search():
+            query = query.order_by(*self._relation_order_by() or ())
+        return query
+
+    def _relation_order_by(self):
+        """
+        :return: the `order_by` of the resource relationship
+        """
+        return self._relation_property.prop.order_by
+
+    def _relation_collection_response(self, relation_id, query):
+        collection = self._collection_response(query)
+        # An empty collection might come from the parent EXISTS guard, so only then the parent
+        # existence must be checked
+        if is_empty_collection(collection) and not self._related_exists(relation_id):
+            return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+        return collection
+
+    def _parents_response(self):
+        """
+        Multi-parent mode: the children of the parents given by the `relation_ids` argument,
+        like ``?relation_ids=1,2,3``, fetched by a single query and grouped by parent id::
+
+            {"1": [{...}, {...}], "2": [], "3": [{...}]}
+
+        Filters, ordering and full-text search apply as usual, while `limit` applies to the
+        children of each parent (using a `row_number()` window). Parents not found get empty
+        lists.
+        """
+        args = get_collection_args()
+        relation_ids = get_relation_ids(args)
+        unsupported = [name for name in PARENTS_UNSUPPORTED_ARGS if name in args]
+        if unsupported or is_count_request(args) or is_aggregation_request(args):
+            abort(HTTPStatus.BAD_REQUEST, "Unsupported arguments on multi-parent requests")
+        if self._guardrails is not None:
+            self._guardrails.check_args(args)
+        limit = args.get("limit", self._default_limit)
+        if limit is not None and not str(limit).isdigit():
+            abort(HTTPStatus.BAD_REQUEST, f"Invalid limit {limit}")
+
+        model = self._resource_model
+        parent = aliased(self._related_model)
+        parent_column = parent.id
+        query = (
+            self._db_session.query(model)
+            .select_from(parent)
+            .join(getattr(parent, self._relation_property.key))
+            .filter(parent_column.in_(relation_ids))
+        )
+        if self._query_modifier:
+            query = self._query_modifier(query, model)
+        # The rank goes into the window ordering, along with the other ordering clauses
+        query = self._full_text_query(query, ranked=False)
+        if "filter" in args:
+            query = create_filter_query(query, model, self._serializer, get_filters(args))
+        order_by = [self._search_rank()] if self._is_ranked_search() else []
+        order_by.extend(self._relation_property.prop.order_by or ())
+        if "order_by" in args:
+            query, clauses = order_by_clauses(
+                query, model, args["order_by"], self._order_by_strategies
+            )
+            order_by.extend(clauses)
+        # The primary key makes the order of each parent children deterministic
+        order_by.append(model.id)
+
+        parent_id = parent_column.label("restalchemy_parent_id")
+        if limit is None:
+            query = query.add_columns(parent_id).order_by(parent_column, *order_by)
+        else:
+            row_number = func.row_number().over(partition_by=parent_column, order_by=order_by)
+            subquery = query.add_columns(parent_id, row_number.label("row_number")).subquery()
+            query = (
+                self._db_session.query(aliased(model, subquery), subquery.c.restalchemy_parent_id)
+                .filter(subquery.c.row_number <= int(limit))
+                .order_by(subquery.c.restalchemy_parent_id, subquery.c.row_number)
+            )
+        self._check_cost(query)
+        children = {str(relation_id): [] for relation_id in relation_ids}
+        for child, relation_id in query:
+            children[str(relation_id)].append(self._dump_item(child))
+        return children
+
+    def _related_exists(self, relation_id):
+        related_id = self._related_model.id
+        return (
+            self._db_session.execute(
+                select(related_id).where(related_id == relation_id)
+            ).first()
+            is not None
+        )
 
     def post(self, relation_id):
         session = self._db_session
@@ -266,6 +881,7 @@ class ToManyRelationResource(BaseModelResource):
         collection.append(model)
         self._save_model(model)
         saved = self._serializer.dump(model)
+        self._publish_change("create" if status_code == HTTPStatus.CREATED else "update", saved)
         return saved, status_code
 
     def put(self, relation_id, id):
@@ -276,6 +892,7 @@ class ToManyRelationResource(BaseModelResource):
         serialized = self._serializer.dump(requested_obj)
         serialized.update(request_data)
         saved = self._save_serialized(serialized, requested_obj)
+        self._publish_change("update", saved)
         return saved
 
     def delete(self, relation_id, id):
@@ -286,8 +903,13 @@ class ToManyRelationResource(BaseModelResource):
         related_obj = session.get(self._related_model, relation_id)
         collection = getattr(related_obj, self._relation_property.key)
         collection.remove(requested_obj)
+        if self._incremental_sync is not None:
+            self._incremental_sync.record_deletion(session, requested_obj)
+        deleted = self._dump_deleted(requested_obj)
+        self._forget_dump(requested_obj.id)
         session.delete(requested_obj)
         session.commit()
+        self._publish_change("delete", deleted)
         return "", HTTPStatus.NO_CONTENT
 
     def _query_related_obj(self, relation_id, id):
@@ -299,20 +921,178 @@ class ToManyRelationResource(BaseModelResource):
         :return: model with 'id' that has a related model with 'related_id'
         """
 
-        # This checks if there is a parent with the related child on its relation property
-        related = self._db_session.execute(
-            select(self._related_model)
-            .options(load_only(self._related_model.id))
+        return (
+            self._relation_query(self._db_session.query(self._resource_model), relation_id)
+            .filter(self._resource_model.id == id)
+            .one_or_none()
+        )
+
+
+class NestedRelationResource(ToManyRelationResource):
+    """Relation resource reached through a chain of relationships, like
+    ``/company/<int:relation_id_0>/employees/<int:relation_id>/contacts`` for
+    ``[Company.employees, Employee.contacts]``. The ids of the ancestors of the parent are
+    given by the `relation_id_{index}` URL variables.
+
+    The whole path is validated by a single EXISTS subquery joining the ancestors down to the
+    parent, merged into the queries of the children like the parent guard of
+    :class:`ToManyRelationResource`, so no hop is loaded.
+
+    :param list relation_path: the chain of SQLAlchemy relationships, each one from the
+        target model of the previous one. The last one is the relationship of the resource.
+
+    Other parameters are the ones of :class:`ToManyRelationResource`.
+    """
+
+    def __init__(self, relation_path, *args, **kwargs):
+        super().__init__(relation_path[-1], *args, **kwargs)
+        self._ancestor_path = relation_path[:-1]
+
+    def dispatch_request(self, *args, **kwargs):
+        request.restalchemy_ancestor_ids = [
+            kwargs.pop(f"relation_id_{index}") for index in range(len(self._ancestor_path))
+        ]
+        return super().dispatch_request(*args, **kwargs)
+
+    def post(self, relation_id):
+        if not self._related_exists(relation_id):
+            return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+        return super().post(relation_id)
+
+    def _relation_query(self, query, relation_id, relation_property=None):
+        query = super()._relation_query(query, relation_id, relation_property)
+        if relation_property is None or relation_property is self._relation_property:
+            query = query.filter(self._path_exists(relation_id))
+        return query
+
+    def _path_exists(self, relation_id):
+        """
+        :return: EXISTS guard of the path from the ancestors down to the parent identified by
+            `relation_id`
+        """
+        ancestor_ids = request.restalchemy_ancestor_ids
+        entities = [aliased(self._ancestor_path[0].class_)]
+        entities.extend(aliased(prop.prop.mapper.class_) for prop in self._ancestor_path)
+        statement = select(entities[0].id)
+        for index, prop in enumerate(self._ancestor_path):
+            target = entities[index + 1]
+            statement = statement.join(target, getattr(entities[index], prop.key).of_type(target))
+        ids = [*ancestor_ids, relation_id]
+        return statement.where(*[entity.id == id for entity, id in zip(entities, ids)]).exists()
+
+    def _related_exists(self, relation_id):
+        return self._db_session.execute(select(self._path_exists(relation_id))).scalar()
+
+
+class ToManyRelationLinksResource(ToManyRelationResource):
+    """Resource class that links and unlinks existing children of a to-many relationship in
+    bulk. The request body must be a JSON list with the children ids:
+
+        a) POST -> attach the given children, skipping links that already exist
+        b) DELETE -> detach the given children
+        c) PUT -> replace the current links by the given children
+
+    Links are changed with set-based INSERT/DELETE statements on the association table (or
+    UPDATE statements on the child foreign key for one-to-many relationships) executed in a
+    single transaction. Since the ORM is bypassed, relationship cascades are not applied.
+
+    Accepts the same parameters as :class:`ToManyRelationResource`.
+    """
+
+    def post(self, relation_id):
+        return self._change_links(relation_id, attach=True)
+
+    def put(self, relation_id):
+        return self._change_links(relation_id, attach=True, replace=True)
+
+    def delete(self, relation_id):
+        return self._change_links(relation_id, attach=False)
+
+    def _change_links(self, relation_id, attach, replace=False):
+        ids = load_request_json()
+        if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+            return INVALID_LINKS_ERROR, HTTPStatus.BAD_REQUEST
+        ids = list(dict.fromkeys(ids))
+
+        session = self._db_session
+        if not self._related_exists(relation_id):
+            return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+        if attach and ids:
+            found = session.execute(
+                select(func.count())
+                .select_from(self._resource_model)
+                .where(self._resource_model.id.in_(ids))
+            ).scalar()
+            if found != len(ids):
+                return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
+
+        table, parent_column, child_column = self._link_columns()
+        if replace:
+            unlinked = session.execute(
+                self._unlink_statement(table, parent_column, child_column, relation_id)
+                .where(child_column.not_in(ids))
+            ).rowcount
+        elif not attach:
+            unlinked = session.execute(
+                self._unlink_statement(table, parent_column, child_column, relation_id)
+                .where(child_column.in_(ids))
+            ).rowcount
+        else:
+            unlinked = 0
+        linked = 0
+        if attach and ids:
+            statement = self._link_statement(table, parent_column, child_column, relation_id, ids)
+            linked = session.execute(statement).rowcount
+        session.commit()
+        # Links of one-to-many relationships are foreign keys of the children
+        self._invalidate_reference()
+        self._forget_dump()
+        return {"linked": linked, "unlinked": unlinked}
+
+    def _link_columns(self):
+        """
+        :return: the table holding the links, the column referencing the parent and the column
+            identifying the child.
+        """
+        prop = self._relation_property.prop
+        if prop.secondary is not None:
+            ((_, parent_column),) = prop.synchronize_pairs
+            ((_, child_column),) = prop.secondary_synchronize_pairs
+            return prop.secondary, parent_column, child_column
+        ((_, foreign_key_column),) = prop.local_remote_pairs
+        table = foreign_key_column.table
+        (child_column,) = table.primary_key.columns
+        return table, foreign_key_column, child_column
+
+    def _link_statement(self, table, parent_column, child_column, relation_id, ids):
+        if self._relation_property.prop.secondary is not None:
+            child_id = self._resource_model.id
+            already_linked = exists().where(
+                parent_column == relation_id, child_column == child_id
+            )
+            return insert(table).from_select(
+                [parent_column.name, child_column.name],
+                select(literal(relation_id), child_id).where(
+                    child_id.in_(ids), ~already_linked
+                ),
+            )
+        return (
+            update(table)
             .where(
-                self._related_model.id == relation_id,
-                self._relation_property.any(id=id),
+                child_column.in_(ids),
+                or_(parent_column.is_(None), parent_column != relation_id),
             )
-        ).scalar_one_or_none()
-
-        if related is None:
-            return None
+            .values({parent_column.name: relation_id})
+        )
 
-        return self._db_session.get(self._resource_model, id)
+    def _unlink_statement(self, table, parent_column, child_column, relation_id):
+        if self._relation_property.prop.secondary is not None:
+            return delete(table).where(parent_column == relation_id)
+        return (
+            update(table)
+            .where(parent_column == relation_id)
+            .values({parent_column.name: None})
+        )
 
 
 class CollectionPropertyResource(ToManyRelationResource):
@@ -325,6 +1105,15 @@ class CollectionPropertyResource(ToManyRelationResource):
         session_getter,
         query_modifier=None,
         request_decorators=None,
+        read_only_get=False,
+        full_text_search=None,
+        order_by_strategies=None,
+        guardrails=None,
+        single_flight=None,
+        change_broker=None,
+        related_counts=None,
+        reference_cache=None,
+        dump_cache=None,
     ):
         super(ToManyRelationResource, self).__init__(
             declarative_model,
@@ -332,42 +1121,154 @@ class CollectionPropertyResource(ToManyRelationResource):
             session_getter,
             query_modifier=query_modifier,
             request_decorators=request_decorators,
+            read_only_get=read_only_get,
+            full_text_search=full_text_search,
+            order_by_strategies=order_by_strategies,
+            guardrails=guardrails,
+            single_flight=single_flight,
+            change_broker=change_broker,
+            related_counts=related_counts,
+            reference_cache=reference_cache,
+            dump_cache=dump_cache,
         )
         self._related_model = related_model
         self._property_name = property_name
 
+    def _relation_order_by(self):
+        prop = inspect(self._related_model).relationships.get(self._property_name)
+        return prop.order_by if prop is not None else None
+
     def get(self, relation_id, id=None):
-        session = self._db_session
-        related_obj = session.get(self._related_model, relation_id)
-        if related_obj is None:
+        query, related_obj = self._property_query(relation_id)
+        if query is None:
             return NOT_FOUND_ERROR, HTTPStatus.NOT_FOUND
-        relation_list_or_query = getattr(related_obj, self._property_name)
-        if isinstance(relation_list_or_query, InstrumentedList) or not hasattr(
-            relation_list_or_query, "paginate"
-        ):
-            warnings.warn(
-                "Warning: property "
-                + self._property_name
-                + " does not support pagination nor filter."
-                " Use flask-sqlalchemy and make your property return a query object"
+        if related_obj is not None:
+            return self._collection_response(query)
+        return self._relation_collection_response(relation_id, query)
+
+    def head(self, relation_id, id=None):
+        query, related_obj = self._property_query(relation_id)
+        if query is None:
+            return head_response(False)
+        if related_obj is not None:
+            return head_response(True, self._count(query))
+        return self._relation_head_response(relation_id, self._count(query))
+
+    def _property_query(self, relation_id):
+        """
+        :return: the query of the property items and the parent, if it had to be loaded. The
+            query is `None` if the parent was not found.
+        """
+        related_obj = None
+        if self._property_name in inspect(self._related_model).relationships:
+            relation_property = getattr(self._related_model, self._property_name)
+            query = self._relation_query(
+                self._db_session.query(self._resource_model), relation_id, relation_property
             )
-            collection = [
-                self._serializer.dump(item) for item in relation_list_or_query
-            ]
         else:
-            query = relation_list_or_query
-            if self._query_modifier:
-                query = self._query_modifier(query, self._related_model)
-            query = create_collection_query(
-                query, self._resource_model, self._serializer, request.args
+            # Plain python properties may depend on any attribute of the parent
+            related_obj = self._db_session.get(self._related_model, relation_id)
+            if related_obj is None:
+                return None, None
+            relation_list_or_query = getattr(related_obj, self._property_name)
+            if hasattr(relation_list_or_query, "paginate"):
+                query = relation_list_or_query
+            else:
+                query = self._list_query(
+                    self._db_session.query(self._resource_model), relation_list_or_query
+                )
+        if self._query_modifier:
+            query = self._query_modifier(query, self._related_model)
+        return query, related_obj
+
+    def _list_query(self, query, items):
+        """
+        Restrict the query to the items of a property that returns a plain list, so filters
+        and pagination could be done by the database. The list order is kept unless `order_by`
+        is requested.
+
+        :param query: query (or select statement) of the resource model
+        :param list items: the property items
+        """
+        ids = [item.id for item in items]
+        model_id = self._resource_model.id
+        query = query.filter(model_id.in_(ids))
+        if ids and "order_by" not in get_collection_args():
+            query = query.order_by(
+                case({item_id: index for index, item_id in enumerate(ids)}, value=model_id)
             )
-            collection = create_response_from_query(query, self._serializer)
-        return collection
+        return query
 
     def post(self, relation_id):
         return "POST not allowed for property resources", HTTPStatus.METHOD_NOT_ALLOWED
 
 
+class ChangeStreamResource(BaseResource):
+    """Resource streaming the changes of a model as Server-Sent Events: every model created,
+    updated or deleted by the resources publishing to the broker is sent as an event named by
+    the change type, with the dumped model as JSON data::
+
+        event: update
+        data: {"id": 1, "name": "Terrans"}
+
+    The `filter` request argument restricts the events to the models matching it, evaluated on
+    the dumped data (see :func:`flask_restalchemy.changes.create_event_filter`). Comments are
+    sent while idle to keep connections open.
+
+    :param class declarative_model: the SQLAlchemy declarative class
+
+    :param ModelSerializer serializer: serializer of the model, used to validate the filters
+
+    :param ChangeBroker broker: broker where the changes are published
+
+    :param dict|list request_decorators: a list of decorators
+    """
+
+    # Seconds between the comments sent while idle
+    heartbeat = HEARTBEAT_INTERVAL
+
+    def __init__(self, declarative_model, serializer, broker, request_decorators=None):
+        super().__init__(request_decorators)
+        self._resource_model = declarative_model
+        self._serializer = serializer
+        self._broker = broker
+
+    def get(self):
+        fields = self._serializer.fields
+        field_names = [name for name, field in fields.items() if not field.load_only]
+        try:
+            matches = create_event_filter(get_filters(request.args), field_names)
+        except ValueError as error:
+            abort(HTTPStatus.BAD_REQUEST, f"Invalid event filter: {error}")
+        # Subscribe before responding, so no change is missed once the client is connected
+        subscription = self._broker.subscribe(get_channel(self._resource_model))
+        heartbeat = self.heartbeat
+
+        def stream():
+            try:
+                # Sent right away, so the response starts before the first change
+                yield ": connected\n\n"
+                while True:
+                    event = subscription.get(timeout=heartbeat)
+                    if event is None:
+                        yield ": keepalive\n\n"
+                    elif matches(event["data"]):
+                        yield format_event(event)
+            except SubscriptionClosed:
+                return
+            finally:
+                subscription.close()
+
+        response = Response(
+            stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # Responses closed before the stream starts do not run its `finally`
+        response.call_on_close(subscription.close)
+        return response
+
+
 def load_request_json():
     """
     Returns request data as dict.
@@ -380,6 +1281,101 @@ def load_request_json():
         return request.form.to_dict()
 
 
+def load_search_args():
+    """
+    Returns the collection arguments of a search request, given as a JSON object on the
+    request body. The 'filter' is an object, instead of an encoded string, so large filters
+    do not hit URL length limits. Other arguments are the same of the query string:
+
+        {"filter": {"id": {"in": [1, 2, 3]}}, "order_by": "-name", "page": 1}
+
+    :rtype: dict
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("filter", {}), dict):
+        abort(HTTPStatus.BAD_REQUEST, INVALID_SEARCH_ERROR)
+    args = {}
+    for name, value in body.items():
+        if name != "filter":
+            value = ",".join(map(str, value)) if isinstance(value, list) else str(value)
+        args[name] = value
+    return args
+
+
+def get_collection_args():
+    """
+    Returns the arguments of collection requests: the JSON body of search requests (see
+    :func:`load_search_args`) or the query string.
+    """
+    search_args = getattr(request, "restalchemy_search_args", None)
+    return request.args if search_args is None else search_args
+
+
+def after_commit(callback):
+    """
+    Run a side effect of a committed change, like publishing it or invalidating a cache. While
+    the commits are deferred by a transactional batch (see
+    :func:`flask_restalchemy.batch.deferred_commits`), the callback is queued instead, to run
+    only once the batch is committed.
+    """
+    if is_deferring_commits():
+        g.restalchemy_after_commit.append(callback)
+    else:
+        callback()
+
+
+def is_deferring_commits():
+    """
+    Returns if the commits of the resources are deferred by a transactional batch.
+    """
+    return has_app_context() and "restalchemy_after_commit" in g
+
+
+def is_read_request():
+    """
+    Returns if the current request only reads data: GET and HEAD requests, and searches.
+    """
+    return (
+        request.method in READ_METHODS
+        or getattr(request, "restalchemy_search_args", None) is not None
+    )
+
+
+def get_relation_ids(args):
+    """
+    :return: the parent ids of the `relation_ids` argument of multi-parent requests (see
+        `ToManyRelationResource`). Missing or invalid ids abort the request with a 400 error.
+    """
+    values = [value for value in str(args.get("relation_ids", "")).split(",") if value]
+    if not values or not all(value.isdigit() for value in values):
+        abort(HTTPStatus.BAD_REQUEST, INVALID_RELATION_IDS_ERROR)
+    if len(values) > MAX_RELATION_IDS:
+        abort(HTTPStatus.BAD_REQUEST, f"Requests are limited to {MAX_RELATION_IDS} relation ids")
+    return list(dict.fromkeys(int(value) for value in values))
+
+
+def get_page_args(args, default_per_page=None):
+    """
+    :param int default_per_page: the page size when not requested, defaults to
+        `DEFAULT_PER_PAGE`
+
+    :return: the page number and the page size requested, by default the first page with 20
+        items. Invalid values abort the request with a 404 error (like Flask-SQLAlchemy).
+    """
+    try:
+        page = int(args.get("page", 1))
+        per_page = int(args.get("per_page", default_per_page or DEFAULT_PER_PAGE))
+    except (TypeError, ValueError):
+        abort(HTTPStatus.NOT_FOUND)
+    if page < 1 or per_page < 0:
+        abort(HTTPStatus.NOT_FOUND)
+    return page, per_page
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
 def unpack(value):
     """
     Return a three tuple of data, code, and headers
@@ -405,18 +1401,221 @@ def unpack(value):
     return value, HTTPStatus.OK, {}
 
 
-def create_response_from_query(query, serializer):
-    if "page" in request.args:
-        data = query.paginate()
+def create_response_from_query(query, serializer, default_limit=None, dump=None):
+    """
+    :param int default_limit: if given, the number of items returned when neither `limit` nor
+        `page` is requested, and the default page size
+
+    :param callable dump: serializes each item, given the serializer and the item. Defaults to
+        `dump_item` (or `dump_aggregation_row` on aggregation requests).
+    """
+    args = get_collection_args()
+    if dump is None:
+        dump = dump_aggregation_row if is_aggregation_request(args) else dump_item
+    if "page" in args:
+        page, per_page = get_page_args(args, default_limit)
+        data = query.paginate(page=page, per_page=per_page)
         return {
             "page": data.page,
             "per_page": data.per_page,
             "count": data.total,
-            "results": [serializer.dump(item) for item in data.items],
+            "results": [dump(serializer, item) for item in data.items],
+        }
+    else:
+        data = limit_page_query(query, args, default_limit).all()
+        return [dump(serializer, item) for item in data]
+
+
+def limit_page_query(query, args, default_limit=None):
+    """
+    Limit a collection query to the items of the requested page, or to `default_limit` items
+    if neither `limit` nor `page` is requested.
+    """
+    if "page" in args:
+        page, per_page = get_page_args(args, default_limit)
+        return query.limit(per_page).offset((page - 1) * per_page)
+    if default_limit is not None and "limit" not in args:
+        return query.limit(default_limit)
+    return query
+
+
+def create_facets_response(query, model_class, serializer):
+    """
+    Returns the facets of the query requested by the 'facets' argument (see
+    :func:`create_facet_queries`), like ``{"facets": {"location": [{"value": "Korhal",
+    "count": 2}]}}``.
+    """
+    facet_queries = create_facet_queries(
+        query, model_class, serializer, get_collection_args()
+    )
+    return {
+        "facets": {
+            name: dump_facet(serializer, name, facet_query.all())
+            for name, facet_query in facet_queries.items()
         }
+    }
+
+
+def dump_facet(serializer, name, rows):
+    return [
+        {"value": dump_field(serializer, name, value), "count": count}
+        for value, count in rows
+    ]
+
+
+def is_empty_collection(collection):
+    """
+    :param list|dict collection: a collection response, either a list, a page, facets, a
+        count or a delta
+    """
+    if isinstance(collection, list):
+        return not collection
+    if "changes" in collection:
+        # Deletions are not restricted to the collection
+        return not collection["changes"]
+    if "facets" in collection:
+        return not any(collection["facets"].values())
+    if "results" in collection:
+        return not collection["results"]
+    return not collection["count"]
+
+
+def head_response(found, count=None):
+    """
+    Response of HEAD requests. Collections have the count of their items on the
+    `TOTAL_COUNT_HEADER` header.
+
+    :param bool found: if False, a 404 response is returned
+    :param int count: count of collection items
+    """
+    if not found:
+        return "", HTTPStatus.NOT_FOUND
+    headers = {} if count is None else {TOTAL_COUNT_HEADER: str(count)}
+    return "", HTTPStatus.OK, headers
+
+
+def dump_item(serializer, item):
+    """
+    Serialize an entity, or a row fetched by read-only requests (see :func:`get_row_columns`).
+    """
+    if isinstance(item, Row):
+        # Attribute access to rows might clash with tuple methods (like `count`)
+        item = SimpleNamespace(**item._mapping)
+    return serializer.dump(item)
+
+
+def dump_counted_item(serializer, row, count_keys):
+    """
+    Serialize a row of a collection query with related counts (see `create_related_counts`):
+    the entity (or its columns, on read-only requests) followed by the counts.
+
+    :param list count_keys: labels of the count columns
+    """
+    mapping = row._mapping
+    values = row[: -len(count_keys)]
+    if len(values) == 1 and inspect(values[0], raiseerr=False) is not None:
+        data = serializer.dump(values[0])
     else:
-        data = query.all()
-        return [serializer.dump(item) for item in data]
+        fields = row._fields[: -len(count_keys)]
+        data = serializer.dump(SimpleNamespace(**{key: mapping[key] for key in fields}))
+    data.update((key, mapping[key]) for key in count_keys)
+    return data
+
+
+def dump_aggregation_row(serializer, row):
+    """
+    Serialize a row of an aggregation query (see :func:`create_aggregation_query`). Group
+    columns, and the min/max of a column, are dumped by the column field.
+    """
+    field_names = {
+        expression: column_name
+        for expression, function_name, column_name in parse_aggregates(get_collection_args())
+        if function_name in ("min", "max")
+    }
+    return {
+        key: dump_field(serializer, field_names.get(key, key), value)
+        for key, value in row._mapping.items()
+    }
+
+
+def dump_field(serializer, field_name, value):
+    """
+    Serialize a column value with the serializer field, if any.
+    """
+    field = serializer.fields.get(field_name)
+    if field is None:
+        return value
+    # Column type serializers (like datetime) are assigned on the first dump
+    serializer._assign_default_serializer(field, field_name)
+    return field.dump(value)
+
+
+def get_row_columns(model, serializer):
+    """
+    Returns the model attributes to fetch as rows instead of entities, or `None` if the
+    serializer needs entities (nested fields or attributes that are not mapped columns).
+
+    :param class model: the SQLAlchemy declarative class
+    :param ModelSerializer serializer:
+    """
+    columns = serializer.mapper.columns
+    field_names = [name for name, field in serializer.fields.items() if not field.load_only]
+    if not all(
+        type(serializer.fields[name]) is Field and name in columns for name in field_names
+    ):
+        return None
+    return [getattr(model, name) for name in field_names]
+
+
+@contextmanager
+def read_only_transaction(session):
+    """
+    Run the block with autoflush disabled, inside a transaction that is started as read-only
+    when the backend supports it (PostgreSQL, MySQL and SQLite) and rolled back at the end.
+    If the session is already in a transaction, only autoflush is disabled.
+
+    :param Session|scoped_session session:
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    if session.in_transaction():
+        with session.no_autoflush:
+            yield
+        return
+    connection = session.connection()
+    begin, reset = READ_ONLY_STATEMENTS.get(connection.dialect.name, (None, None))
+    if begin:
+        connection.exec_driver_sql(begin)
+    try:
+        with session.no_autoflush:
+            yield
+    finally:
+        if reset:
+            connection.exec_driver_sql(reset)
+        session.rollback()
+
+
+READ_METHODS = ("GET", "HEAD")
+
+DEFAULT_PER_PAGE = 20
+
+# Maximum number of parents of multi-parent requests
+MAX_RELATION_IDS = 1000
+
+# Collection arguments not supported by multi-parent requests
+PARENTS_UNSUPPORTED_ARGS = ("page", "per_page", "facets", "since")
+
+# Statements to start a read-only transaction and to reset the connection afterwards
+READ_ONLY_STATEMENTS = {
+    "postgresql": ("SET TRANSACTION READ ONLY", None),
+    "mysql": ("SET TRANSACTION READ ONLY", None),
+    "mariadb": ("SET TRANSACTION READ ONLY", None),
+    "sqlite": ("PRAGMA query_only = ON", "PRAGMA query_only = OFF"),
+}
 
+TOTAL_COUNT_HEADER = "X-Total-Count"
 
 NOT_FOUND_ERROR = "Resource not found in the database!"
+INVALID_LINKS_ERROR = "Request body must be a JSON list of ids!"
+INVALID_RELATION_IDS_ERROR = "relation_ids must be a comma separated list of ids!"
+INVALID_SEARCH_ERROR = "Request body must be a JSON object with the collection arguments!"
@@ -0,0 +1,199 @@
+import threading
+from collections import namedtuple
+from http import HTTPStatus
+
+from flask import abort, g, request
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+
+class Shard(namedtuple("Shard", "url schema", defaults=(None,))):
+    """
+    Location of the data of a tenant.
+
+    :param str url: database URL of the node holding the tenant data. Engines are created once
+        per URL, so tenants on the same node share the connection pool.
+
+    :param str schema: schema of the tenant. Tables without an explicit schema are translated
+        to it (see SQLAlchemy ``schema_translate_map``). If `None`, the default schema is used.
+    """
+
+    __slots__ = ()
+
+
+class ShardRouter:
+    """
+    Routes the DB session of each request to the database shard of its tenant.
+
+    :param callable resolver: called inside the request context, returns the shard key of the
+        request or `None` to use the default session. See :class:`HeaderShardResolver`,
+        :class:`UrlShardResolver` and :class:`RequestAttributeShardResolver`.
+
+    :param dict|callable shards: maps a shard key to a :class:`Shard` (or a database URL). A
+        callable is useful to add tenants without restarting the application. Requests for an
+        unknown shard key get a 404 response.
+
+    :param dict engine_options: keyword arguments for ``sqlalchemy.create_engine``
+    """
+
+    def __init__(self, resolver, shards, engine_options=None):
+        self._resolver = resolver
+        self._shards = shards
+        self._engine_options = engine_options or {}
+        self._engines = {}
+        self._engines_lock = threading.Lock()
+
+    def init_app(self, blueprint):
+        if hasattr(self._resolver, "init_app"):
+            self._resolver.init_app(blueprint)
+        blueprint.teardown_request(close_request_sessions)
+
+    def get_session(self, query_cls):
+        """
+        :return: the session for the shard of the current request, or `None` if the request
+            has no shard key
+        """
+        shard = self.get_shard()
+        if shard is None:
+            return None
+        return get_request_session(shard, lambda: self.get_engine(shard), query_cls)
+
+    def get_shard(self):
+        """
+        :return: the :class:`Shard` of the current request, or `None` if the request has no
+            shard key
+        """
+        shard_key = self._resolver()
+        if shard_key is None:
+            return None
+        shard = self._get_shard(shard_key)
+        if shard is None:
+            abort(HTTPStatus.NOT_FOUND)
+        return shard
+
+    def get_engine(self, shard):
+        """
+        Returns the engine for the given shard. Engines are created on the first use of a
+        database URL and reused afterwards.
+
+        :param Shard shard:
+        """
+        engine = self._engines.get(shard.url)
+        if engine is None:
+            with self._engines_lock:
+                engine = self._engines.get(shard.url)
+                if engine is None:
+                    engine = create_engine(shard.url, **self._engine_options)
+                    self._engines[shard.url] = engine
+        if shard.schema is not None:
+            # Shares the connection pool of the node engine
+            engine = engine.execution_options(schema_translate_map={None: shard.schema})
+        return engine
+
+    def dispose(self):
+        """Dispose the connection pools of all engines created by this router."""
+        with self._engines_lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+    def _get_shard(self, shard_key):
+        if callable(self._shards):
+            shard = self._shards(shard_key)
+        else:
+            shard = self._shards.get(shard_key)
+        if isinstance(shard, str):
+            shard = Shard(shard)
+        return shard
+
+
+class HeaderShardResolver:
+    """
+    Resolve the shard key from a request header.
+
+    :param str header_name:
+    """
+
+    def __init__(self, header_name):
+        self._header_name = header_name
+
+    def __call__(self):
+        return request.headers.get(self._header_name)
+
+
+class RequestAttributeShardResolver:
+    """
+    Resolve the shard key from an attribute set on the request (or on ``flask.g``) by an
+    authentication layer, for instance.
+
+    :param str attribute_name:
+    """
+
+    def __init__(self, attribute_name):
+        self._attribute_name = attribute_name
+
+    def __call__(self):
+        value = getattr(request, self._attribute_name, None)
+        if value is None:
+            value = g.get(self._attribute_name)
+        return value
+
+
+class UrlShardResolver:
+    """
+    Resolve the shard key from a URL segment, like a blueprint ``url_prefix="/<tenant>"``. The
+    value is removed from the view arguments, so resources are not aware of it.
+
+    :param str url_value_name: name of the URL variable
+    """
+
+    def __init__(self, url_value_name):
+        self._url_value_name = url_value_name
+
+    def init_app(self, blueprint):
+        blueprint.url_value_preprocessor(self._pop_url_value)
+
+    def _pop_url_value(self, endpoint, values):
+        if values and self._url_value_name in values:
+            g.restalchemy_shard_url_value = values.pop(self._url_value_name)
+
+    def __call__(self):
+        return g.get("restalchemy_shard_url_value")
+
+
+def get_request_session(key, engine_getter, query_cls):
+    """
+    Returns a session bound to another engine, created once per request and closed on its
+    teardown (see :func:`close_request_sessions`).
+
+    :param key: hashable identifying the session in the request
+    :param callable engine_getter: returns the engine to bind a new session
+    :param query_cls: class used by `Session.query`
+    """
+    sessions = g.setdefault("restalchemy_request_sessions", {})
+    session = sessions.get(key)
+    if session is None:
+        session = Session(bind=engine_getter(), query_cls=query_cls, info={SESSION_KEY: key})
+        sessions[key] = session
+    return session
+
+
+def get_session_key(session):
+    """
+    :return: the key of a session created by :func:`get_request_session` (like the
+        :class:`Shard` of the tenant), or `None` for other sessions. Caches of serialized models
+        keep the rows loaded by sessions of different keys apart.
+    """
+    return session.info.get(SESSION_KEY)
+
+
+def close_request_sessions(exc=None):
+    if "restalchemy_batch_session" in g:
+        # Shared by the sub-requests of a batch, closed along with the batch request
+        return
+    for session in g.pop("restalchemy_request_sessions", {}).values():
+        session.close()
+
+
+# Key of the `Session.info` holding the session key, see `get_session_key`
+SESSION_KEY = "restalchemy_session_key"
@@ -0,0 +1,195 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from http import HTTPStatus
+
+from flask import abort
+from sqlalchemy import Column, Integer, String, Table, inspect, or_, select
+
+
+class IncrementalSync:
+    """
+    Delta mode of model collections, requested with the `since` argument: only the rows
+    inserted or updated after the watermark are returned, along with the ids of the rows
+    deleted since then (if `tombstones` are recorded) and the new watermark:
+
+        GET /company?since=<watermark>
+
+        {"changes": [...], "deleted": [4, 7], "watermark": "...", "has_more": false}
+
+    Clients start with an empty `since` to fetch every row, then pass the returned watermark on
+    the next sync. Changes are ordered by `column` and the primary key, which together are the
+    watermark of the changes. Changes and deletions are limited by the `limit` argument (or the
+    resource guardrails default limit), `has_more` tells if another request is needed to catch
+    up. The `filter` argument is supported, but rows that stop matching it are not reported.
+
+    The column value is set when a row is written, but the row is only seen by other
+    transactions on commit: a transaction committing after a sync with a value older than the
+    watermark would be skipped. With `settle_time`, rows changed in the last `settle_time` are
+    held back until a later sync, so transactions committing within `settle_time` are not
+    skipped.
+
+    :param str column: name of the model column updated on every insert and update, holding
+        an increasing value: an update timestamp (like ``onupdate=func.now()``) or a version
+        taken from a sequence. Rows with the same value are ordered by the primary key.
+
+    :param TombstoneLog tombstones: if given, deletions done by the resource are recorded and
+        returned to clients
+
+    :param timedelta settle_time: how long changes are held back, for timestamp columns
+
+    :param callable clock: returns the current value of `column`, used with `settle_time`.
+        Defaults to `datetime.now`, use `datetime.utcnow` (or an aware clock) to match the
+        timestamps written by the application.
+    """
+
+    def __init__(self, column, tombstones=None, settle_time=None, clock=datetime.now):
+        self.column = column
+        self.tombstones = tombstones
+        self.settle_time = settle_time
+        self.clock = clock
+
+    def changes_query(self, query, model_class, watermark):
+        """
+        Restrict the query to the rows changed after the watermark (and settled, see
+        `settle_time`), in the order of changes.
+
+        :param query: SQLAlchemy query of `model_class`
+        :param class model_class: SQLAlchemy model class representing a database resource
+        :param Watermark watermark:
+        """
+        column = getattr(model_class, self.column)
+        primary_key = inspect(model_class).primary_key[0]
+        if watermark.value is not None:
+            value = self._load_value(model_class, watermark.value)
+            # A range on the column, so an index of (column, primary key) could be used. Rows
+            # with the watermark value are broken by the primary key.
+            query = query.filter(column >= value, or_(column > value, primary_key > watermark.id))
+        if self.settle_time is not None:
+            query = query.filter(column <= self.clock() - self.settle_time)
+        return query.order_by(None).order_by(column, primary_key)
+
+    def next_watermark(self, model_class, watermark, last_row, deleted):
+        """
+        :param Watermark watermark: the watermark of the request
+        :param last_row: the last changed row returned, if any
+        :param list deleted: (cursor, id) of the deletions returned
+        :rtype: Watermark
+        """
+        value, id = watermark.value, watermark.id
+        if last_row is not None:
+            value = self._dump_value(getattr(last_row, self.column))
+            id = getattr(last_row, inspect(model_class).primary_key[0].key)
+        cursor = deleted[-1][0] if deleted else watermark.deleted
+        return Watermark(value, id, cursor)
+
+    def record_deletion(self, session, model):
+        """
+        Record the deletion of the model in the tombstones, if any. Called by
+        `ModelResource.delete` in the transaction of the delete.
+        """
+        if self.tombstones is not None:
+            self.tombstones.record(session, model)
+
+    def deleted_since(self, session, model_class, watermark, limit=None):
+        """
+        :param int limit: maximum number of deletions returned
+        :return: list of (cursor, id) of the models deleted after the watermark
+        """
+        if self.tombstones is None:
+            return []
+        return self.tombstones.deleted_since(session, model_class, watermark.deleted, limit)
+
+    def _load_value(self, model_class, value):
+        python_type = getattr(model_class, self.column).type.python_type
+        if issubclass(python_type, (datetime, date)):
+            try:
+                return python_type.fromisoformat(value)
+            except (TypeError, ValueError):
+                abort(HTTPStatus.BAD_REQUEST, INVALID_WATERMARK_ERROR)
+        return value
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+
+class Watermark:
+    """
+    Position of a client in the changes of a collection: the `column` value and the primary
+    key of the last changed row seen, and the cursor of the last deletion seen. Sent to clients
+    as an opaque token.
+    """
+
+    def __init__(self, value=None, id=None, deleted=0):
+        self.value = value
+        self.id = id
+        self.deleted = deleted
+
+    @classmethod
+    def decode(cls, token):
+        """
+        Decode a token created by :meth:`encode`, an empty token is the start of the changes.
+        Invalid tokens abort the request with a 400 error.
+        """
+        if not token:
+            return cls()
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        except (ValueError, binascii.Error):
+            abort(HTTPStatus.BAD_REQUEST, INVALID_WATERMARK_ERROR)
+        if not isinstance(data, list) or len(data) != 3 or not isinstance(data[2], int):
+            abort(HTTPStatus.BAD_REQUEST, INVALID_WATERMARK_ERROR)
+        return cls(*data)
+
+    def encode(self):
+        data = json.dumps([self.value, self.id, self.deleted]).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+class TombstoneLog:
+    """
+    Records the deleted models in a database table, with an increasing cursor, so deletions are
+    committed along with the delete.
+
+    :param MetaData metadata: metadata where the table is defined, the table is created along
+        with the model tables (like by ``db.create_all()``)
+
+    :param str table_name:
+    """
+
+    def __init__(self, metadata, table_name="restalchemy_tombstone"):
+        self.table = Table(
+            table_name,
+            metadata,
+            Column("cursor", Integer, primary_key=True),
+            Column("model", String(255), nullable=False, index=True),
+            Column("model_id", String(255), nullable=False),
+        )
+
+    def record(self, session, model):
+        mapper = inspect(model).mapper
+        model_id = mapper.primary_key_from_instance(model)[0]
+        session.execute(
+            self.table.insert().values(model=mapper.class_.__name__, model_id=str(model_id))
+        )
+
+    def deleted_since(self, session, model_class, cursor, limit=None):
+        """
+        :param int limit: maximum number of deletions returned
+        :return: list of (cursor, id) of the models deleted after the cursor
+        """
+        id_type = inspect(model_class).primary_key[0].type.python_type
+        rows = session.execute(
+            select(self.table.c.cursor, self.table.c.model_id)
+            .where(self.table.c.model == model_class.__name__, self.table.c.cursor > cursor)
+            .order_by(self.table.c.cursor)
+            .limit(limit)
+        )
+        return [(cursor, id_type(model_id)) for cursor, model_id in rows]
+
+
+INVALID_WATERMARK_ERROR = "Invalid since watermark!"
@@ -19,6 +19,14 @@ class Company(Base):
     name = Column(String)
     location = Column(String)
     employees = relationship("Employee", lazy="dynamic")
+    # Relationship with a custom criteria, besides the foreign key
+    reachable_employees = relationship(
+        "Employee",
+        primaryjoin="and_(Company.id == Employee.company_id, Employee.email.isnot(None))",
+        viewonly=True,
+    )
+    # Relationship ordered by the database
+    employees_by_name = relationship("Employee", order_by="Employee.firstname", viewonly=True)
 
 
 class Department(Base):
@@ -94,6 +102,15 @@ class Employee(Base):
         )
 
 
+class Note(Base):
+
+    __tablename__ = "Note"
+
+    id = Column(Integer, primary_key=True)
+    text = Column(String)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+
+
 employee_department = Table(
     "employee_department",
     Base.metadata,
@@ -77,6 +77,22 @@ def test_get_collection(client, data_regression):
     data_regression.check(serialized)
 
 
+def test_head_and_count(client):
+    resp = client.head("/employee/1")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.data == b""
+    assert client.head("/employee/10239").status_code == HTTPStatus.NOT_FOUND
+
+    resp = client.head("/employee")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["X-Total-Count"] == "2"
+
+    resp = client.get('/employee?count=true&filter={"firstname": "Jim"}')
+    assert resp.get_json() == {"count": 1}
+    resp = client.get("/employee?count=true&group_by=company_id")
+    assert resp.get_json() == {"count": 1}
+
+
 def test_post(client):
     contacts = [
         {"type_id": 1, "value": "0000-0000"},
@@ -234,3 +250,42 @@ def test_http_verbs(flask_app, client, methods):
     expect(client.post("/ping"), "POST")
     expect(client.delete("/ping/1"), "DELETE")
     expect(client.put("/ping/1"), "PUT")
+
+
+def test_related_counts(flask_app, client, db_session):
+    db_session.add(Company(id=6, name="Zerg"))
+    db_session.add(Contact(value="jim@raynor.co", employee_id=1))
+    db_session.commit()
+    api = Api(flask_app)
+    api.add_model(Company, view_name="counted_company", related_counts=["employees"])
+    api.add_model(
+        Employee,
+        view_name="counted_employee",
+        related_counts=["contacts", "departments"],
+        read_only_get=True,
+    )
+
+    resp = client.get("/counted_company?counts=employees&order_by=id")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json() == [
+        {"id": 5, "name": "Terrans", "location": None, "employees_count": 2},
+        {"id": 6, "name": "Zerg", "location": None, "employees_count": 0},
+    ]
+    resp = client.get("/counted_company?counts=employees&page=1&per_page=1")
+    assert resp.get_json()["count"] == 2
+    assert resp.get_json()["results"][0]["employees_count"] == 2
+
+    # Rows fetched by read-only requests
+    resp = client.get("/counted_employee?counts=contacts,departments&order_by=id")
+    employees = resp.get_json()
+    counts = [(e["firstname"], e["contacts_count"], e["departments_count"]) for e in employees]
+    assert counts == [("Jim", 1, 0), ("Sarah", 0, 0)]
+
+    # Only allowed to-many relationships are counted
+    invalid_urls = [
+        "/counted_company?counts=unknown",
+        "/counted_employee?counts=company",
+        "/company?counts=employees",
+    ]
+    for url in invalid_urls:
+        assert client.get(url).status_code == HTTPStatus.BAD_REQUEST
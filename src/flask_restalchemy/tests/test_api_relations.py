@@ -1,17 +1,19 @@
 from http import HTTPStatus
 
 import pytest
-from flask import json
-from sqlalchemy import select
+from flask import Blueprint, json
+from sqlalchemy import event, select
 
 from flask_restalchemy import Api
 from flask_restalchemy.serialization import Field, ModelSerializer, NestedModelField
 from flask_restalchemy.tests.sample_model import (
     Address,
     Company,
+    Contact,
     Department,
     Employee,
     db,
+    employee_department,
 )
 
 
@@ -47,11 +49,11 @@ def sample_api(flask_app):
     api = Api(flask_app)
     api.add_model(Company)
     api.add_model(Employee)
-    api.add_relation(Company.employees, serializer_class=EmployeeSerializer)
+    api.add_relation(Company.employees, serializer_class=EmployeeSerializer, multi_parent=True)
     api.add_property(
         Employee, Employee, "colleagues", serializer_class=EmployeeSerializer
     )
-    api.add_relation(Employee.departments)
+    api.add_relation(Employee.departments, multi_parent=True)
     return api
 
 
@@ -171,15 +173,65 @@ def test_property_pagination(client):
     assert len(response_data.get("results")) == 10
 
 
-def test_instrumented_list_triggers_warning(flask_app, client, db_session):
-    # Employee.contacts has no lazy="dynamic", so accessing it yields an InstrumentedList
-    # and the resource should warn that pagination/filter are unavailable.
+def test_non_dynamic_relation_pagination(flask_app, client, db_session):
+    # Employee.contacts has no lazy="dynamic", the query is built from the relationship
     api = Api(flask_app)
     api.add_relation(Employee.contacts)
+    api.add_property(
+        Contact, Employee, "contacts", url_rule="/employee/<int:relation_id>/p_contacts"
+    )
+    for i in range(10):
+        db_session.add(Contact(value=f"contact {i}", employee_id=9))
+    db_session.add(Contact(value="other", employee_id=3))
+    db_session.commit()
 
-    with pytest.warns(UserWarning, match="does not support pagination"):
-        resp = client.get("/employee/9/contacts")
-    assert resp.status_code == HTTPStatus.OK
+    for url in ["/employee/9/contacts", "/employee/9/p_contacts"]:
+        resp = client.get(url)
+        assert resp.status_code == HTTPStatus.OK
+        assert len(resp.get_json()) == 10
+
+        resp = client.get(f"{url}?order_by=-value&limit=3")
+        assert [c["value"] for c in resp.get_json()] == [
+            "contact 9",
+            "contact 8",
+            "contact 7",
+        ]
+
+        resp = client.get(
+            "{}?filter={}".format(url, json.dumps({"value": {"in": ["contact 1", "other"]}}))
+        )
+        assert [c["value"] for c in resp.get_json()] == ["contact 1"]
+
+        resp = client.get(f"{url}?page=2&per_page=4")
+        data = resp.get_json()
+        assert data["count"] == 10
+        assert [c["value"] for c in data["results"]] == [f"contact {i}" for i in range(4, 8)]
+
+    assert client.get("/employee/999/contacts").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_plain_list_property_pagination(flask_app, client, mocker):
+    mocker.patch.object(
+        Employee,
+        "departments_list",
+        property(lambda self: list(reversed(self.departments.all()))),
+        create=True,
+    )
+    api = Api(flask_app)
+    api.add_property(Department, Employee, "departments_list")
+
+    resp = client.get("/employee/9/departments_list")
+    assert [d["name"] for d in resp.get_json()] == ["Heroes", "Marines"]
+
+    resp = client.get("/employee/9/departments_list?order_by=-name&limit=1")
+    assert [d["name"] for d in resp.get_json()] == ["Marines"]
+
+    resp = client.get(
+        "/employee/9/departments_list?filter={}".format(json.dumps({"name": "Marines"}))
+    )
+    assert [d["name"] for d in resp.get_json()] == ["Marines"]
+
+    resp = client.get("/employee/3/departments_list")
     assert resp.get_json() == []
 
 
@@ -200,3 +252,250 @@ def test_delete_on_relation_with_secondary(client):
 
     resp = client.delete("/employee/9/departments/" + str(dep.id))
     assert resp.status_code == HTTPStatus.NO_CONTENT
+
+
+def test_bulk_links_many_to_many(flask_app, client):
+    api = Api(flask_app)
+    api.add_relation_links(Employee.departments)
+    db.session.add_all([Department(id=10 + i, name=f"Dept {i}") for i in range(5)])
+    db.session.commit()
+
+    def linked_departments(employee_id):
+        return sorted(
+            db.session.execute(
+                select(employee_department.c.department_id).where(
+                    employee_department.c.employee_id == employee_id
+                )
+            ).scalars()
+        )
+
+    resp = client.post("/employee/3/departments/links", data=json.dumps([10, 11, 12]))
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json() == {"linked": 3, "unlinked": 0}
+    assert linked_departments(3) == [10, 11, 12]
+
+    # Existing links are skipped
+    resp = client.post("/employee/3/departments/links", data=json.dumps([11, 12, 13]))
+    assert resp.get_json() == {"linked": 1, "unlinked": 0}
+    assert linked_departments(3) == [10, 11, 12, 13]
+
+    resp = client.delete("/employee/3/departments/links", data=json.dumps([10, 13]))
+    assert resp.get_json() == {"linked": 0, "unlinked": 2}
+    assert linked_departments(3) == [11, 12]
+
+    resp = client.put("/employee/3/departments/links", data=json.dumps([12, 14]))
+    assert resp.get_json() == {"linked": 1, "unlinked": 1}
+    assert linked_departments(3) == [12, 14]
+
+    # Other employees links are untouched
+    assert linked_departments(9) == [1, 2]
+
+
+def test_bulk_links_one_to_many(flask_app, client):
+    api = Api(flask_app)
+    api.add_relation_links(Company.employees)
+
+    resp = client.post("/company/1/employees/links", data=json.dumps([3, 9]))
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json() == {"linked": 2, "unlinked": 0}
+    assert [e.id for e in db.session.get(Company, 1).employees] == [3, 9]
+
+    resp = client.delete("/company/1/employees/links", data=json.dumps([9]))
+    assert resp.get_json() == {"linked": 0, "unlinked": 1}
+    assert db.session.get(Employee, 9).company_id is None
+
+    resp = client.put("/company/3/employees/links", data=json.dumps([9]))
+    assert resp.get_json() == {"linked": 1, "unlinked": 0}
+    assert [e.id for e in db.session.get(Company, 3).employees] == [9]
+
+
+def test_bulk_links_errors(flask_app, client):
+    api = Api(flask_app)
+    api.add_relation_links(Employee.departments)
+
+    resp = client.post("/employee/999/departments/links", data=json.dumps([1]))
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+
+    resp = client.post("/employee/3/departments/links", data=json.dumps([1, 999]))
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+    assert db.session.get(Employee, 3).departments.count() == 0
+
+    resp = client.post("/employee/3/departments/links", data=json.dumps({"id": 1}))
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+    resp = client.post("/employee/3/departments/links", data=json.dumps([True]))
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert db.session.get(Employee, 3).departments.count() == 0
+
+
+@pytest.fixture
+def count_queries(db_session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_relation_collection_single_query(flask_app, client, count_queries):
+    api = Api(flask_app)
+    api.add_relation(Employee.contacts)
+    api.add_property(
+        Department, Employee, "departments", url_rule="/employee/<int:relation_id>/p_departments"
+    )
+
+    for url, expected_length in [
+        ("/company/3/employees", 2),
+        ("/employee/9/departments", 2),
+        ("/employee/9/p_departments", 2),
+    ]:
+        count_queries.clear()
+        resp = client.get(url)
+        assert resp.status_code == HTTPStatus.OK
+        assert len(resp.get_json()) == expected_length
+        assert len(count_queries) == 1
+
+    count_queries.clear()
+    resp = client.get("/company/3/employees?page=1")
+    assert resp.get_json()["count"] == 2
+    assert len(count_queries) == 2
+
+    # An empty collection needs to check the parent existence
+    count_queries.clear()
+    resp = client.get("/employee/9/contacts")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json() == []
+    assert len(count_queries) == 2
+
+    assert client.get("/employee/999/contacts").status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/employee/999/p_departments").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_relation_primaryjoin(flask_app, client, db_session):
+    db_session.get(Employee, 3).email = "kerrigan@zerg.net"
+    db_session.commit()
+    # A blueprint, since the Company.employees endpoints have the same names
+    blueprint = Blueprint("primaryjoin", __name__, url_prefix="/pj")
+    api = Api(blueprint)
+    api.add_model(Company, related_counts=["reachable_employees"])
+    api.add_relation(Company.reachable_employees, multi_parent=True)
+    flask_app.register_blueprint(blueprint)
+
+    resp = client.get("/pj/company/3/reachable_employees")
+    assert [e["id"] for e in resp.get_json()] == [3]
+    assert client.get("/pj/company/3/reachable_employees/3").status_code == HTTPStatus.OK
+    assert client.get("/pj/company/3/reachable_employees/9").status_code == HTTPStatus.NOT_FOUND
+    assert client.head("/pj/company/3/reachable_employees/9").status_code == HTTPStatus.NOT_FOUND
+
+    resp = client.get("/pj/company/reachable_employees?relation_ids=1,3")
+    assert {key: [e["id"] for e in value] for key, value in resp.get_json().items()} == {
+        "1": [],
+        "3": [3],
+    }
+    resp = client.get("/pj/company?counts=reachable_employees&order_by=id")
+    assert [c["reachable_employees_count"] for c in resp.get_json()] == [0, 1]
+
+
+def test_head_and_count(client, count_queries):
+    resp = client.head("/company/3/employees")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["X-Total-Count"] == "2"
+    assert resp.data == b""
+    assert len(count_queries) == 1
+    assert count_queries[0].startswith("SELECT count(")
+
+    resp = client.head('/company/3/employees?filter={"firstname": "Jim"}')
+    assert resp.headers["X-Total-Count"] == "1"
+    assert client.head("/company/3/employees/9").status_code == HTTPStatus.OK
+    assert client.head("/company/1/employees/9").status_code == HTTPStatus.NOT_FOUND
+    assert client.head("/company/1/employees").headers["X-Total-Count"] == "0"
+    assert client.head("/company/999/employees").status_code == HTTPStatus.NOT_FOUND
+
+    resp = client.get("/employee/9/departments?count=true")
+    assert resp.get_json() == {"count": 2}
+    assert client.get("/employee/999/departments?count=1").status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/employee/9/colleagues?count=true&limit=1").get_json() == {"count": 1}
+    assert client.head("/employee/9/colleagues").headers["X-Total-Count"] == "2"
+    assert client.head("/employee/999/colleagues").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_multi_parent_relation(client, db_session, count_queries):
+    db_session.add(Employee(id=10, firstname="Tassadar", company_id=1))
+    db_session.commit()
+    count_queries.clear()
+    resp = client.get("/company/employees?relation_ids=3,1,999&order_by=firstname")
+    assert resp.status_code == HTTPStatus.OK
+    data = resp.get_json()
+    assert {parent: [e["firstname"] for e in employees] for parent, employees in data.items()} == {
+        "3": ["Jim", "Sarah"],
+        "1": ["Tassadar"],
+        "999": [],
+    }
+    assert "password" not in data["3"][0]
+    assert len(count_queries) == 1
+
+    # Limits apply to each parent
+    resp = client.get("/company/employees?relation_ids=1,3&order_by=-firstname&limit=1")
+    data = resp.get_json()
+    assert [e["firstname"] for e in data["3"] + data["1"]] == ["Sarah", "Tassadar"]
+
+    resp = client.get(
+        "/company/employees",
+        query_string={"relation_ids": "1,3", "filter": json.dumps({"lastname": "Raynor"})},
+    )
+    assert [e["id"] for e in resp.get_json()["3"]] == [9]
+    assert resp.get_json()["1"] == []
+
+    # Many-to-many relationship
+    resp = client.get("/employee/departments?relation_ids=9,3&order_by=name&limit=5")
+    data = resp.get_json()
+    assert [d["name"] for d in data["9"]] == ["Heroes", "Marines"]
+    assert data["3"] == []
+
+    invalid_query_strings = [
+        "",
+        "?relation_ids=1,a",
+        "?relation_ids=1&page=1",
+        "?relation_ids=1&count=1",
+    ]
+    for query_string in invalid_query_strings:
+        resp = client.get(f"/company/employees{query_string}")
+        assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_nested_relation(flask_app, client, db_session, count_queries):
+    db_session.add(Contact(id=1, value="jim@raynor.co", employee_id=9))
+    db_session.commit()
+    api = Api(flask_app)
+    api.add_relation([Company.employees, Employee.contacts])
+    api.add_relation([Company.employees, Employee.departments], read_only_get=True)
+
+    count_queries.clear()
+    resp = client.get("/company/3/employees/9/contacts")
+    assert resp.status_code == HTTPStatus.OK
+    assert [contact["value"] for contact in resp.get_json()] == ["jim@raynor.co"]
+    assert len(count_queries) == 1
+    assert client.get("/company/3/employees/9/contacts/1").get_json()["id"] == 1
+
+    # The whole path is validated
+    assert client.get("/company/1/employees/9/contacts").status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/company/1/employees/9/contacts/1").status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/company/3/employees/3/contacts").get_json() == []
+    resp = client.get("/company/3/employees/9/departments?order_by=name")
+    assert [department["name"] for department in resp.get_json()] == ["Heroes", "Marines"]
+    assert client.head("/company/1/employees/9/departments").status_code == HTTPStatus.NOT_FOUND
+
+    resp = client.post("/company/1/employees/9/contacts", json={"value": "jim@protoss.co"})
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+    resp = client.post("/company/3/employees/9/contacts", json={"value": "jim@korhal.co"})
+    assert resp.status_code == HTTPStatus.CREATED
+    resp = client.put("/company/1/employees/9/contacts/1", json={"value": "raynor@korhal.co"})
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+    assert client.delete("/company/1/employees/9/contacts/1").status_code == HTTPStatus.NOT_FOUND
+    assert client.delete("/company/3/employees/9/contacts/1").status_code == HTTPStatus.NO_CONTENT
+    resp = client.get("/company/3/employees/9/contacts")
+    assert [contact["value"] for contact in resp.get_json()] == ["jim@korhal.co"]
@@ -0,0 +1,266 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from flask_restalchemy import Api
+from flask_restalchemy.decorators.request_hooks import before_request
+from flask_restalchemy.guardrails import Estimate, QueryGuardrails
+from flask_restalchemy.memoization import DumpCache
+from flask_restalchemy.tests.employer_serializer import EmployeeSerializer
+from flask_restalchemy.tests.sample_model import (
+    Company,
+    Contact,
+    Department,
+    Employee,
+    db,
+)
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("asgiref")
+asyncio_ext = pytest.importorskip("sqlalchemy.ext.asyncio")
+
+
+def async_session_factory(engine):
+    return sessionmaker(engine, class_=asyncio_ext.AsyncSession)
+
+
+@pytest.fixture()
+def db_file(tmp_path):
+    db_file = tmp_path / "async.sqlite"
+    engine = create_engine(f"sqlite:///{db_file}")
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        terrans = Company(id=3, name="Terrans", location="Korhal")
+        raynor = Employee(id=9, firstname="Jim", lastname="Raynor", company=terrans)
+        kerrigan = Employee(id=3, firstname="Sarah", lastname="Kerrigan", company=terrans)
+        raynor.departments.append(Department(id=1, name="Marines"))
+        raynor.departments.append(Department(id=2, name="Heroes"))
+        session.add_all([Company(id=1, name="Protoss"), terrans, raynor, kerrigan])
+        session.add(Contact(value="jim@raynor.co", employee_id=9))
+        session.commit()
+    engine.dispose()
+    return db_file
+
+
+@pytest.fixture()
+def sync_session(db_file):
+    engine = create_engine(f"sqlite:///{db_file}")
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture()
+def async_client(db_file):
+    app = Flask("flask_restalchemy_async")
+    engine = asyncio_ext.create_async_engine(f"sqlite+aiosqlite:///{db_file}", poolclass=NullPool)
+    api = Api(app, async_session_factory=async_session_factory(engine))
+    api.add_model(Company, asynchronous=True, related_counts=["employees"])
+    api.add_model(Employee, serializer_class=EmployeeSerializer, asynchronous=True)
+    api.add_relation(Company.employees, serializer_class=EmployeeSerializer, asynchronous=True)
+    api.add_relation(Employee.departments, asynchronous=True)
+    api.add_relation(Employee.contacts, asynchronous=True)
+    api.add_property(
+        Employee,
+        Employee,
+        "colleagues",
+        serializer_class=EmployeeSerializer,
+        asynchronous=True,
+    )
+    return app.test_client()
+
+
+def test_get(async_client):
+    resp = async_client.get("/employee/9")
+    assert resp.status_code == HTTPStatus.OK
+    data = resp.get_json()
+    assert data["firstname"] == "Jim"
+    assert data["company_name"] == "Terrans"
+    assert "password" not in data
+
+    assert async_client.get("/employee/999").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_get_collection(async_client):
+    resp = async_client.get("/company?order_by=-name")
+    assert resp.status_code == HTTPStatus.OK
+    assert [c["name"] for c in resp.get_json()] == ["Terrans", "Protoss"]
+
+    resp = async_client.get(
+        "/employee?filter={}".format(json.dumps({"firstname": {"startswith": "S"}}))
+    )
+    assert [e["lastname"] for e in resp.get_json()] == ["Kerrigan"]
+
+
+def test_pagination(async_client):
+    resp = async_client.get("/employee?order_by=id&page=2&per_page=1")
+    assert resp.status_code == HTTPStatus.OK
+    data = resp.get_json()
+    assert data["page"] == 2
+    assert data["per_page"] == 1
+    assert data["count"] == 2
+    assert [e["id"] for e in data["results"]] == [9]
+
+    assert async_client.get("/employee?page=0").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_aggregation(async_client):
+    resp = async_client.get("/company/3/employees?group_by=company_id&agg=count(*),min(id)")
+    assert resp.get_json() == [{"company_id": 3, "count(*)": 2, "min(id)": 3}]
+
+    resp = async_client.get("/employee?agg=max(admission)&page=1")
+    data = resp.get_json()
+    assert data["count"] == 1
+    assert data["results"] == [{"max(admission)": "2000-01-01T00:00:00"}]
+
+
+def test_facets(async_client):
+    resp = async_client.get("/company?facets=location&facet_limit=1")
+    assert resp.get_json() == {"facets": {"location": [{"value": None, "count": 1}]}}
+
+    resp = async_client.get('/employee/9/departments?facets=name&filter={"id": 2}')
+    assert resp.get_json() == {"facets": {"name": [{"value": "Heroes", "count": 1}]}}
+
+
+def test_head_and_count(async_client):
+    assert async_client.head("/company/3").status_code == HTTPStatus.OK
+    assert async_client.head("/company/999").status_code == HTTPStatus.NOT_FOUND
+    assert async_client.head("/company/3/employees").headers["X-Total-Count"] == "2"
+    assert async_client.head("/employee/9/colleagues").headers["X-Total-Count"] == "2"
+
+    resp = async_client.get('/employee/9/departments?count=true&filter={"id": 1}')
+    assert resp.get_json() == {"count": 1}
+    assert async_client.get("/employee/999/contacts?count=true").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_related_counts(async_client):
+    resp = async_client.get("/company?counts=employees&order_by=id")
+    assert resp.status_code == HTTPStatus.OK
+    assert [(c["name"], c["employees_count"]) for c in resp.get_json()] == [
+        ("Protoss", 0),
+        ("Terrans", 2),
+    ]
+
+
+def test_post_put_delete(async_client, sync_session):
+    resp = async_client.post("/company", data={"name": "Zerg", "location": "Char"})
+    assert resp.status_code == HTTPStatus.CREATED
+    company_id = resp.get_json()["id"]
+
+    resp = async_client.put(f"/company/{company_id}", data={"location": "Zerus"})
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json()["location"] == "Zerus"
+    assert sync_session.get(Company, company_id).location == "Zerus"
+
+    resp = async_client.delete(f"/company/{company_id}")
+    assert resp.status_code == HTTPStatus.NO_CONTENT
+    sync_session.expire_all()
+    assert sync_session.get(Company, company_id) is None
+
+    assert async_client.put("/company/999", data={}).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_relation(async_client, sync_session):
+    resp = async_client.get("/company/3/employees?order_by=firstname")
+    assert resp.status_code == HTTPStatus.OK
+    assert [e["firstname"] for e in resp.get_json()] == ["Jim", "Sarah"]
+
+    resp = async_client.get("/company/3/employees/3")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json()["firstname"] == "Sarah"
+    assert async_client.get("/company/1/employees/3").status_code == HTTPStatus.NOT_FOUND
+
+    resp = async_client.get("/employee/9/departments?page=1&per_page=1")
+    assert resp.get_json()["count"] == 2
+
+    resp = async_client.get("/employee/9/contacts")
+    assert [c["value"] for c in resp.get_json()] == ["jim@raynor.co"]
+    assert async_client.get("/employee/3/contacts").get_json() == []
+    assert async_client.get("/employee/999/contacts").status_code == HTTPStatus.NOT_FOUND
+
+    resp = async_client.post("/company/1/employees", data={"firstname": "Zeratul"})
+    assert resp.status_code == HTTPStatus.CREATED
+    zeratul = sync_session.execute(
+        select(Employee).where(Employee.firstname == "Zeratul")
+    ).scalar_one()
+    assert zeratul.company_id == 1
+
+    resp = async_client.delete(f"/company/1/employees/{zeratul.id}")
+    assert resp.status_code == HTTPStatus.NO_CONTENT
+
+
+def test_property(async_client):
+    resp = async_client.get("/employee/9/colleagues?order_by=id")
+    assert resp.status_code == HTTPStatus.OK
+    assert [e["id"] for e in resp.get_json()] == [3, 9]
+
+    resp = async_client.get("/employee/9/colleagues?page=1&per_page=1&order_by=-id")
+    data = resp.get_json()
+    assert data["count"] == 2
+    assert [e["id"] for e in data["results"]] == [9]
+
+    assert async_client.get("/employee/999/colleagues").status_code == HTTPStatus.NOT_FOUND
+    resp = async_client.post("/employee/9/colleagues")
+    assert resp.status_code == HTTPStatus.METHOD_NOT_ALLOWED
+
+
+def test_request_decorators(db_file):
+    app = Flask("flask_restalchemy_async")
+    engine = asyncio_ext.create_async_engine(f"sqlite+aiosqlite:///{db_file}", poolclass=NullPool)
+    calls = []
+    api = Api(app, async_session_factory=async_session_factory(engine))
+    api.add_model(
+        Company,
+        request_decorators={"GET": before_request(lambda *args, **kwargs: calls.append(kwargs))},
+        asynchronous=True,
+    )
+
+    resp = app.test_client().get("/company/3")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json()["name"] == "Terrans"
+    assert calls == [{"id": 3}]
+
+
+def test_guardrails(db_file):
+    app = Flask("flask_restalchemy_async")
+    engine = asyncio_ext.create_async_engine(f"sqlite+aiosqlite:///{db_file}", poolclass=NullPool)
+
+    def estimator(connection, statement):
+        return Estimate(cost=1.0, rows=statement._limit or 1000)
+
+    guardrails = QueryGuardrails(max_limit=1, max_rows=100, estimator=estimator)
+    api = Api(app, async_session_factory=async_session_factory(engine), guardrails=guardrails)
+    api.add_model(Company, asynchronous=True)
+    client = app.test_client()
+
+    resp = client.get("/company?order_by=id")
+    assert [c["id"] for c in resp.get_json()] == [1]
+    resp = client.get("/company?page=2&order_by=id")
+    assert resp.get_json()["per_page"] == 1
+    assert [c["id"] for c in resp.get_json()["results"]] == [3]
+    assert client.get("/company?limit=2").status_code == HTTPStatus.BAD_REQUEST
+    assert client.get("/company?count=true").status_code == HTTPStatus.BAD_REQUEST
+
+    with pytest.raises(AssertionError, match="statement_timeout is not supported"):
+        api.add_model(Employee, asynchronous=True, guardrails=QueryGuardrails(statement_timeout=1))
+
+
+def test_dump_cache(db_file):
+    app = Flask("flask_restalchemy_async")
+    engine = asyncio_ext.create_async_engine(f"sqlite+aiosqlite:///{db_file}", poolclass=NullPool)
+    cache = DumpCache(max_age=60)
+    api = Api(app, async_session_factory=async_session_factory(engine), dump_cache=cache)
+    api.add_model(Company, asynchronous=True)
+    client = app.test_client()
+
+    resp = client.get("/company?order_by=id")
+    assert [c["name"] for c in resp.get_json()] == ["Protoss", "Terrans"]
+    assert client.get("/company/3").get_json()["name"] == "Terrans"
+    assert cache.stats()["hits"] == 1
+    client.put("/company/3", json={"location": "Mar Sara"})
+    assert client.get("/company/3").get_json()["location"] == "Mar Sara"
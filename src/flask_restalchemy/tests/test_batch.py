@@ -0,0 +1,188 @@
+from http import HTTPStatus
+
+import pytest
+from flask import Blueprint, request
+from sqlalchemy import select
+
+from flask_restalchemy import Api
+from flask_restalchemy.changes import InProcessBroker, get_channel
+from flask_restalchemy.coalescing import SingleFlight
+from flask_restalchemy.decorators.request_hooks import before_request
+from flask_restalchemy.memoization import DumpCache
+from flask_restalchemy.tests.sample_model import Company, Employee
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    db_session.add(Company(id=1, name="Protoss", location="Aiur"))
+    db_session.commit()
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app, calls):
+    decorator = before_request(
+        lambda *args, **kwargs: calls.append(
+            (request.headers.get("X-User"), request.method, request.path)
+        )
+    )
+    api = Api(flask_app, request_decorators=decorator)
+    api.add_model(Company)
+    api.add_model(Employee)
+    api.add_relation(Company.employees)
+    api.add_batch(max_requests=6)
+    return api
+
+
+def post_batch(client, requests, **kwargs):
+    return client.post("/batch", json={"requests": requests, **kwargs}, headers={"X-User": "jim"})
+
+
+def committed_rows(db_session, model_class, *columns):
+    # Anything left uncommitted by the batch is discarded
+    db_session.rollback()
+    return db_session.execute(select(*columns).order_by(model_class.id)).all()
+
+
+def test_batch(client, calls, db_session):
+    resp = post_batch(
+        client,
+        [
+            {"method": "POST", "path": "/company", "body": {"name": "Terrans"}},
+            {"method": "put", "path": "/company/1", "body": {"location": "Shakuras"}},
+            {"method": "POST", "path": "/company/2/employees", "body": {"firstname": "Jim"}},
+            {"method": "GET", "path": "/company?order_by=-id&count=true"},
+            {"method": "DELETE", "path": "/company/99"},
+            {"method": "HEAD", "path": "/company/1"},
+        ],
+    )
+    assert resp.status_code == HTTPStatus.OK
+    responses = resp.get_json()
+    assert [response["status"] for response in responses] == [201, 200, 201, 200, 404, 200]
+    assert responses[0]["body"] == {"id": 2, "name": "Terrans", "location": None}
+    assert responses[1]["body"]["location"] == "Shakuras"
+    assert responses[3]["body"] == {"count": 2}
+    assert responses[4]["headers"]["Content-Type"] == "text/html; charset=utf-8"
+    # Decorators run for each sub-request, with the batch headers
+    assert set(calls) == {
+        ("jim", "POST", "/batch"),
+        ("jim", "POST", "/company"),
+        ("jim", "PUT", "/company/1"),
+        ("jim", "POST", "/company/2/employees"),
+        ("jim", "GET", "/company"),
+        ("jim", "DELETE", "/company/99"),
+        ("jim", "HEAD", "/company/1"),
+    }
+
+    # Changes of successful sub-requests are committed
+    assert committed_rows(db_session, Company, Company.id, Company.name, Company.location) == [
+        (1, "Protoss", "Shakuras"),
+        (2, "Terrans", None),
+    ]
+    assert committed_rows(db_session, Employee, Employee.id, Employee.company_id) == [(1, 2)]
+
+
+def test_batch_transaction(client, db_session):
+    requests = [
+        {"method": "POST", "path": "/company", "body": {"name": "Terrans"}},
+        # Sees the changes of the previous sub-requests
+        {"method": "GET", "path": "/company/2"},
+        {"method": "PUT", "path": "/company/1", "body": {"location": "Shakuras"}},
+    ]
+    resp = post_batch(client, requests, transaction=True)
+    assert resp.status_code == HTTPStatus.OK
+    assert [response["status"] for response in resp.get_json()] == [201, 200, 200]
+    assert len(client.get("/company").get_json()) == 2
+
+    requests[0]["body"]["name"] = "Zerg"
+    requests[1]["path"] = "/company/99"
+    resp = post_batch(client, requests, transaction=True)
+    assert resp.status_code == HTTPStatus.FAILED_DEPENDENCY
+    assert [response["status"] for response in resp.get_json()] == [201, 404, 424]
+    # Every change is rolled back
+    assert committed_rows(db_session, Company, Company.id, Company.name, Company.location) == [
+        (1, "Protoss", "Shakuras"),
+        (2, "Terrans", None),
+    ]
+
+
+def test_batch_transaction_side_effects(flask_app, client, db_session):
+    broker = InProcessBroker()
+    cache = DumpCache(max_age=60)
+    blueprint = Blueprint("cached", __name__, url_prefix="/cached")
+    api = Api(blueprint, change_broker=broker, dump_cache=cache)
+    api.add_model(Company)
+    api.add_batch()
+    flask_app.register_blueprint(blueprint)
+    subscription = broker.subscribe(get_channel(Company))
+    assert client.get("/cached/company/1").get_json()["location"] == "Aiur"
+
+    requests = [
+        {"method": "PUT", "path": "/cached/company/1", "body": {"location": "Shakuras"}},
+        {"method": "GET", "path": "/cached/company/1"},
+        {"method": "POST", "path": "/cached/company", "body": {"name": "Zerg"}},
+        {"method": "GET", "path": "/cached/company/99"},
+    ]
+    resp = client.post("/cached/batch", json={"requests": requests, "transaction": True})
+    assert resp.status_code == HTTPStatus.FAILED_DEPENDENCY
+    assert resp.get_json()[1]["body"]["location"] == "Shakuras"
+    # Rolled back changes are neither published nor cached
+    assert subscription.get(timeout=0) is None
+    assert client.get("/cached/company/1").get_json()["location"] == "Aiur"
+    assert committed_rows(db_session, Company, Company.id, Company.location) == [(1, "Aiur")]
+
+    resp = client.post("/cached/batch", json={"requests": requests[:3], "transaction": True})
+    assert resp.status_code == HTTPStatus.OK
+    events = [subscription.get(timeout=0) for _ in range(2)]
+    assert [(event["type"], event["data"]["id"]) for event in events] == [
+        ("update", 1),
+        ("create", 2),
+    ]
+    assert subscription.get(timeout=0) is None
+    assert client.get("/cached/company/1").get_json()["location"] == "Shakuras"
+    assert committed_rows(db_session, Company, Company.id, Company.location) == [
+        (1, "Shakuras"),
+        (2, None),
+    ]
+
+
+def test_batch_transaction_single_flight(flask_app, client, mocker):
+    single_flight = SingleFlight(lambda: None)
+    blueprint = Blueprint("coalesced", __name__, url_prefix="/coalesced")
+    api = Api(blueprint, single_flight=single_flight)
+    api.add_model(Company)
+    api.add_batch()
+    flask_app.register_blueprint(blueprint)
+    do = mocker.spy(single_flight, "do")
+
+    requests = [
+        {"method": "PUT", "path": "/coalesced/company/1", "body": {"location": "Shakuras"}},
+        {"method": "GET", "path": "/coalesced/company/1"},
+    ]
+    resp = client.post("/coalesced/batch", json={"requests": requests, "transaction": True})
+    assert resp.get_json()[1]["body"]["location"] == "Shakuras"
+    # Uncommitted changes are not shared with coalesced requests
+    assert do.call_count == 0
+
+    resp = client.post("/coalesced/batch", json={"requests": requests[1:]})
+    assert resp.get_json()[0]["body"]["location"] == "Shakuras"
+    assert do.call_count == 1
+
+
+def test_invalid_batch(client):
+    invalid_bodies = [
+        [],
+        {"requests": {}},
+        {"requests": [{"method": "PATCH", "path": "/company"}]},
+        {"requests": [{"method": "GET", "path": "company"}]},
+        {"requests": [{"method": "GET", "path": "/batch"}]},
+        {"requests": [{"method": "GET", "path": "/company"}] * 7},
+    ]
+    for body in invalid_bodies:
+        assert client.post("/batch", json=body).status_code == HTTPStatus.BAD_REQUEST
+    resp = client.post("/batch", data="{invalid", content_type="application/json")
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
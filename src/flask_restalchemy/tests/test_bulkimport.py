@@ -0,0 +1,111 @@
+import gzip
+import json
+from http import HTTPStatus
+
+import pytest
+
+from flask_restalchemy import Api
+from flask_restalchemy.changes import InProcessBroker, get_channel
+from flask_restalchemy.tests.sample_model import Company
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    db_session.add(Company(id=1, name="Protoss", location="Aiur"))
+    db_session.commit()
+
+
+@pytest.fixture
+def broker():
+    return InProcessBroker()
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app, broker):
+    api = Api(flask_app, change_broker=broker)
+    api.add_model(Company, bulk_import=True, import_batch_size=2)
+    return api
+
+
+def post_import(client, data, content_type, **headers):
+    return client.post("/company/import", data=data, content_type=content_type, headers=headers)
+
+
+def company_names(client):
+    return [company["name"] for company in client.get("/company?order_by=id").get_json()]
+
+
+def test_import_ndjson(client):
+    lines = [
+        json.dumps({"name": "Terrans", "location": "Korhal"}),
+        "",
+        "{invalid",
+        json.dumps({"name": "Zerg", "location": "Char"}),
+        json.dumps(["Xel'Naga"]),
+        json.dumps({"name": "Tal'darim"}),
+    ]
+    resp = post_import(client, "\n".join(lines), "application/x-ndjson")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json() == {
+        "inserted": 3,
+        "failed": 2,
+        "batches": [
+            {
+                "batch": 1,
+                "rows": 2,
+                "inserted": 1,
+                "errors": [{"line": 3, "error": "Invalid JSON"}],
+            },
+            {
+                "batch": 2,
+                "rows": 2,
+                "inserted": 1,
+                "errors": [{"line": 5, "error": "Rows must be JSON objects"}],
+            },
+            {"batch": 3, "rows": 1, "inserted": 1, "errors": []},
+        ],
+    }
+    assert company_names(client) == ["Protoss", "Terrans", "Zerg", "Tal'darim"]
+
+
+def test_import_gzip_csv(client):
+    body = gzip.compress(b"name,location\nTerrans,Korhal\nZerg,\nXel'Naga,Ulnar,Void\n")
+    resp = post_import(client, body, "text/csv", **{"Content-Encoding": "gzip"})
+    report = resp.get_json()
+    assert (report["inserted"], report["failed"]) == (2, 1)
+    assert report["batches"][1]["errors"] == [{"line": 4, "error": "More values than fields"}]
+    companies = client.get("/company?order_by=id").get_json()
+    assert companies[2] == {"id": 3, "name": "Zerg", "location": None}
+
+
+def test_import_failed_batch(client, broker):
+    subscription = broker.subscribe(get_channel(Company))
+    lines = [json.dumps({"name": "Terrans"}), json.dumps({"id": 1, "name": "Protoss"})]
+    lines.append(json.dumps({"name": "Zerg"}))
+    report = post_import(client, "\n".join(lines), "application/x-ndjson").get_json()
+    # The whole batch is rolled back
+    assert (report["inserted"], report["failed"]) == (1, 2)
+    assert "UNIQUE constraint failed" in report["batches"][0]["errors"][0]["error"]
+    assert company_names(client) == ["Protoss", "Zerg"]
+    # Only the models of committed batches are published
+    event = subscription.get(timeout=0)
+    assert (event["type"], event["data"]["name"]) == ("create", "Zerg")
+    assert subscription.get(timeout=0) is None
+
+
+def test_invalid_import(client):
+    body = json.dumps({"name": "Terrans"}).encode("utf-8")
+    resp = post_import(client, body, "application/json")
+    assert resp.status_code == HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+    resp = post_import(client, body, "application/x-ndjson", **{"Content-Encoding": "br"})
+    assert resp.status_code == HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+
+    lines = [json.dumps({"name": name}) for name in ("Terrans", "Zerg", "Tal'darim")]
+    body = gzip.compress("\n".join(lines).encode("utf-8"))[:-10]
+    resp = post_import(client, body, "application/x-ndjson", **{"Content-Encoding": "gzip"})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    report = resp.get_json()
+    assert report["error"].startswith("Invalid import stream")
+    # Committed batches are kept
+    assert report["inserted"] == 2
+    assert company_names(client) == ["Protoss", "Terrans", "Zerg"]
@@ -0,0 +1,159 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from flask_restalchemy import Api
+from flask_restalchemy.changes import (
+    ChangeBroker,
+    InProcessBroker,
+    SubscriptionClosed,
+    create_event_filter,
+)
+from flask_restalchemy.resources.resources import ChangeStreamResource
+from flask_restalchemy.tests.sample_model import Company, Employee
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    db_session.add(Company(id=1, name="Protoss", location="Aiur"))
+    db_session.commit()
+
+
+@pytest.fixture
+def broker():
+    return InProcessBroker()
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app, broker):
+    api = Api(flask_app, change_broker=broker)
+    api.add_model(Company, change_stream=True)
+    api.add_model(Employee, change_stream=True)
+    api.add_relation(Company.employees)
+    return api
+
+
+class EventStream:
+    def __init__(self, client, url, **query_string):
+        self.response = client.get(url, query_string=query_string, buffered=False)
+        self._chunks = self.response.iter_encoded()
+        assert next(self._chunks) == b": connected\n\n"
+
+    def next(self):
+        """
+        :return: (event type, data) of the next event, or None for comments
+        """
+        chunk = next(self._chunks).decode("utf-8")
+        if chunk.startswith(":"):
+            return None
+        event_line, data_line, *_ = chunk.split("\n")
+        return event_line[len("event: ") :], json.loads(data_line[len("data: ") :])
+
+    def close(self):
+        self.response.close()
+
+
+def test_change_stream(client):
+    stream = EventStream(client, "/company/events")
+    assert stream.response.status_code == HTTPStatus.OK
+    assert stream.response.mimetype == "text/event-stream"
+    assert stream.response.headers["Cache-Control"] == "no-cache"
+
+    client.post("/company", data={"name": "Terrans", "location": "Korhal"})
+    client.put("/company/2", data={"location": "Mar Sara"})
+    client.delete("/company/2")
+    assert stream.next() == ("create", {"id": 2, "name": "Terrans", "location": "Korhal"})
+    assert stream.next() == ("update", {"id": 2, "name": "Terrans", "location": "Mar Sara"})
+    assert stream.next() == ("delete", {"id": 2, "name": "Terrans", "location": "Mar Sara"})
+    stream.close()
+
+
+def test_relation_changes(client):
+    stream = EventStream(client, "/employee/events")
+    client.post("/company/1/employees", data={"firstname": "Tassadar"})
+    client.put("/company/1/employees/1", data={"lastname": "Templar"})
+    client.delete("/company/1/employees/1")
+    events = [stream.next() for _ in range(3)]
+    assert [(change_type, data["firstname"]) for change_type, data in events] == [
+        ("create", "Tassadar"),
+        ("update", "Tassadar"),
+        ("delete", "Tassadar"),
+    ]
+    assert events[1][1]["lastname"] == "Templar"
+    stream.close()
+
+
+def test_filtered_change_stream(client):
+    filters = {"$or": {"location": "Korhal", "name": {"startswith": "Z"}}}
+    stream = EventStream(client, "/company/events", filter=json.dumps(filters))
+    client.post("/company", data={"name": "Protoss", "location": "Shakuras"})
+    client.post("/company", data={"name": "Terrans", "location": "Korhal"})
+    client.post("/company", data={"name": "Zerg", "location": "Char"})
+    assert stream.next()[1]["name"] == "Terrans"
+    assert stream.next()[1]["name"] == "Zerg"
+    stream.close()
+
+    invalid_filters = [
+        '{"unknown": 1}',
+        '{"name": {"match": "Zerg"}}',
+        '{"name": {"like": 5}}',
+        "[1]",
+        "{invalid",
+    ]
+    for invalid_filter in invalid_filters:
+        resp = client.get("/company/events", query_string={"filter": invalid_filter})
+        assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_keepalive(client, monkeypatch):
+    monkeypatch.setattr(ChangeStreamResource, "heartbeat", 0.01)
+    stream = EventStream(client, "/company/events")
+    assert stream.next() is None
+    stream.close()
+
+
+def test_event_filter():
+    field_names = ["id", "name", "location"]
+    matches = create_event_filter(
+        {
+            "id": {"between": [1, 10]},
+            "name": {"ilike": "t%S"},
+            "location": {"ne": None},
+        },
+        field_names,
+    )
+    assert matches({"id": 3, "name": "Terrans", "location": "Korhal"})
+    assert not matches({"id": 3, "name": "Terrans", "location": None})
+    assert not matches({"id": 11, "name": "Terrans", "location": "Korhal"})
+    assert not matches({"id": 3, "name": "Zerg", "location": "Char"})
+
+    # Like SQL, wildcards match newlines regardless of the case sensitivity
+    for op_name in ("like", "ilike"):
+        matches = create_event_filter({"location": {op_name: "Kor%"}}, field_names)
+        assert matches({"id": 3, "name": "Terrans", "location": "Kor\nhal"})
+
+    matches = create_event_filter({"id": {"gt": 1}, "name": {"in": ["Zerg"]}}, field_names)
+    assert matches({"id": 2, "name": "Zerg"})
+    assert not matches({"id": None, "name": "Zerg"})
+    assert not matches({"id": "2", "name": "Zerg"})
+
+
+def test_unread_stream_is_closed(client, broker):
+    client.get("/company/events", buffered=False).close()
+    assert broker._subscriptions == {}
+
+
+def test_slow_subscriber_is_closed():
+    broker = InProcessBroker(max_pending=2)
+    subscription = broker.subscribe("Company")
+    for i in range(3):
+        broker.publish("Company", {"type": "create", "data": {"id": i}})
+    with pytest.raises(SubscriptionClosed):
+        subscription.get(timeout=0)
+    assert broker._subscriptions == {}
+
+
+def test_abstract_broker():
+    with pytest.raises(TypeError):
+        ChangeBroker()
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+from flask import Flask, request
+from werkzeug.datastructures import MultiDict
+
+from flask_restalchemy import Api
+from flask_restalchemy.coalescing import SingleFlight, normalize_args
+from flask_restalchemy.decorators.request_hooks import before_request
+from flask_restalchemy.tests.sample_model import Company, Employee, db
+
+
+@pytest.fixture()
+def flask_app(tmp_path):
+    # Requests run on several threads, each with its own connection
+    app = Flask("flask_restalchemy_coalescing")
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'coalescing.sqlite'}"
+    db.init_app(app)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    terrans = Company(id=3, name="Terrans", location="Korhal")
+    db_session.add_all([Company(id=1, name="Protoss", location="Aiur"), terrans])
+    db_session.add(Employee(id=1, firstname="Jim", company=terrans))
+    db_session.commit()
+
+
+class BlockingQueries:
+    """
+    Query modifier blocking the queries until released, so requests overlap.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.released = threading.Event()
+
+    def __call__(self, query, model):
+        self.calls += 1
+        assert self.released.wait(timeout=10)
+        return query
+
+
+@pytest.fixture
+def blocking_queries():
+    return BlockingQueries()
+
+
+@pytest.fixture
+def decorated_calls():
+    return []
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app, db_session, blocking_queries, decorated_calls):
+    api = Api(flask_app, single_flight=SingleFlight(lambda: request.headers.get("X-User")))
+    decorator = before_request(lambda *args, **kwargs: decorated_calls.append(kwargs))
+    api.add_model(Company, query_modifier=blocking_queries, request_decorators={"GET": decorator})
+    api.add_relation(Company.employees, query_modifier=blocking_queries)
+    return api
+
+
+def get_concurrently(flask_app, blocking_queries, requests):
+    """
+    Send the (url, headers) requests concurrently, releasing the queries once all of them are
+    in progress.
+    """
+
+    def get(url, headers):
+        resp = flask_app.test_client().get(url, headers=headers)
+        return resp.status_code, resp.get_json()
+
+    with ThreadPoolExecutor(len(requests)) as executor:
+        futures = [executor.submit(get, url, headers) for url, headers in requests]
+        # Give time for the requests to start waiting for the blocked ones
+        time.sleep(0.3)
+        blocking_queries.released.set()
+        return [future.result() for future in futures]
+
+
+def test_identical_requests_are_coalesced(flask_app, blocking_queries, decorated_calls):
+    filters = [
+        '{"name": {"startswith": "T"}, "location": "Korhal"}',
+        '{"location": "Korhal", "name": {"startswith": "T"}}',
+    ]
+    headers = {"X-User": "jim"}
+    requests = [(f"/company?filter={filters[i % 2]}&order_by=id", headers) for i in range(6)]
+    responses = get_concurrently(flask_app, blocking_queries, requests)
+
+    expected = [{"id": 3, "name": "Terrans", "location": "Korhal"}]
+    assert responses == [(HTTPStatus.OK, expected)] * 6
+    assert blocking_queries.calls == 1
+    # Request decorators run for every request
+    assert len(decorated_calls) == 6
+
+    # Results are not kept once the computation finishes
+    flask_app.test_client().get("/company", headers=headers)
+    assert blocking_queries.calls == 2
+
+
+def test_different_requests_are_not_coalesced(flask_app, blocking_queries):
+    requests = [
+        ("/company?order_by=id", {"X-User": "jim"}),
+        ("/company?order_by=id", {"X-User": "sarah"}),
+        ("/company?order_by=-id", {"X-User": "jim"}),
+        ("/company/3/employees", {"X-User": "jim"}),
+        ("/company/1/employees", {"X-User": "jim"}),
+        ("/company/1/employees", {"X-User": "jim"}),
+    ]
+    responses = get_concurrently(flask_app, blocking_queries, requests)
+    assert [[item["id"] for item in data] for _, data in responses] == [
+        [1, 3],
+        [1, 3],
+        [3, 1],
+        [1],
+        [],
+        [],
+    ]
+    assert blocking_queries.calls == 5
+
+
+def test_errors_are_shared():
+    single_flight = SingleFlight(lambda: None)
+    started = threading.Event()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("Failed")
+
+    def call():
+        with pytest.raises(ValueError, match="Failed"):
+            single_flight.do("key", fail)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    call()
+    leader.join()
+    assert calls == [1]
+    assert single_flight._calls == {}
+
+
+def test_normalize_args():
+    assert normalize_args(MultiDict([("b", "1"), ("a", "2"), ("a", "3")])) == normalize_args(
+        {"a": ["2", "3"], "b": "1"}
+    )
+    assert normalize_args({"filter": '{"b": 1,  "a": 2}'}) == normalize_args(
+        {"filter": {"a": 2, "b": 1}}
+    )
+    assert normalize_args({"filter": "{invalid"}) == json.dumps({"filter": "{invalid"})
@@ -48,6 +48,19 @@ def test_resource_decorators(client, flask_app):
     assert client.get("/company/2", headers={"auth": True}).status_code == HTTPStatus.OK
 
 
+def test_get_decorators_apply_to_head_and_search(client, flask_app):
+    api = Api(flask_app)
+    api.add_model(Company, request_decorators={"GET": [auth_required]})
+
+    assert client.head("/company").status_code == HTTPStatus.FORBIDDEN
+    assert client.head("/company/2").status_code == HTTPStatus.FORBIDDEN
+    assert client.head("/company", headers={"auth": True}).status_code == HTTPStatus.OK
+    assert client.post("/company/search", json={}).status_code == HTTPStatus.FORBIDDEN
+    resp = client.post("/company/search", json={}, headers={"auth": True})
+    assert resp.status_code == HTTPStatus.OK
+    assert client.post("/company", data={"name": "Terran"}).status_code == HTTPStatus.CREATED
+
+
 def test_api_decorators(client, flask_app):
     api = Api(flask_app, request_decorators=[auth_required])
     api.add_model(Company)
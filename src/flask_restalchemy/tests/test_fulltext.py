@@ -0,0 +1,120 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from flask import Blueprint
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from flask_restalchemy import Api
+from flask_restalchemy.fulltext import PostgresFullTextSearch, SQLiteFullTextSearch
+from flask_restalchemy.tests.sample_model import Company, Employee, db
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    db_session.add_all(
+        [
+            Company(id=1, name="Terran Dominion", location="Korhal"),
+            Company(id=2, name="Terran Confederacy", location="Tarsonis"),
+            Company(id=3, name="Zerg Swarm", location="Char"),
+            Company(id=4, name="Raynor Raiders", location="Mar Sara and Korhal"),
+        ]
+    )
+    db_session.add(Employee(id=1, firstname="Jim", lastname="Raynor", company_id=4))
+    db_session.add(Employee(id=2, firstname="Matt", lastname="Horner", company_id=4))
+    db_session.commit()
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app, db_session):
+    company_search = SQLiteFullTextSearch(["name", "location"])
+    employee_search = SQLiteFullTextSearch(["firstname", "lastname"])
+    with db.engine.begin() as connection:
+        company_search.create_index(connection, Company)
+        employee_search.create_index(connection, Employee)
+
+    api = Api(flask_app)
+    api.add_model(Company, full_text_search=company_search)
+    api.add_relation(Company.employees, full_text_search=employee_search)
+    return api
+
+
+def get_ids(client, url):
+    resp = client.get(url)
+    assert resp.status_code == HTTPStatus.OK
+    return [item["id"] for item in resp.get_json()]
+
+
+def test_search(client):
+    # Matches on shorter texts rank first
+    assert get_ids(client, "/company?q=korhal") == [1, 4]
+    assert sorted(get_ids(client, "/company?q=terran")) == [1, 2]
+    assert sorted(get_ids(client, "/company?q=terr*")) == [1, 2]
+    assert get_ids(client, "/company?q=terran korhal") == [1]
+    assert get_ids(client, "/company?q=protoss") == []
+
+    # Query syntax characters are searched as text
+    assert get_ids(client, '/company?q="zerg" -swarm:') == [3]
+    assert get_ids(client, "/company?q=zerg OR terran") == []
+
+    assert get_ids(client, "/company?q=korhal&order_by=-id") == [4, 1]
+    filters = json.dumps({"name": {"startswith": "Terran"}})
+    assert get_ids(client, f"/company?q=korhal&filter={filters}") == [1]
+
+    resp = client.get("/company?q=terran&page=1&per_page=1")
+    assert resp.get_json()["count"] == 2
+    assert client.head("/company?q=terran").headers["X-Total-Count"] == "2"
+    assert client.get("/company?q=terran&count=true").get_json() == {"count": 2}
+    resp = client.get("/company?q=korhal&facets=name")
+    assert len(resp.get_json()["facets"]["name"]) == 2
+
+    assert get_ids(client, "/company/4/employees?q=raynor") == [1]
+    assert get_ids(client, "/company/1/employees?q=raynor") == []
+
+
+def test_search_ordered_relation(flask_app, client, db_session):
+    db_session.add(Employee(id=3, firstname="Ann", lastname="Raynor Mengsk Mengsk", company_id=4))
+    db_session.commit()
+    # A blueprint, since the Company.employees endpoints have the same names
+    blueprint = Blueprint("ordered", __name__, url_prefix="/ordered")
+    api = Api(blueprint)
+    employee_search = SQLiteFullTextSearch(["firstname", "lastname"])
+    api.add_relation(Company.employees_by_name, full_text_search=employee_search, multi_parent=True)
+    flask_app.register_blueprint(blueprint)
+
+    assert get_ids(client, "/ordered/company/4/employees_by_name") == [3, 1, 2]
+    # The relevance rank comes before the relationship order
+    assert get_ids(client, "/ordered/company/4/employees_by_name?q=raynor") == [1, 3]
+    assert get_ids(client, "/ordered/company/4/employees_by_name?q=raynor&order_by=-id") == [3, 1]
+
+    url = "/ordered/company/employees_by_name?relation_ids=4&q=raynor"
+    for limit in ("", "&limit=2"):
+        resp = client.get(url + limit)
+        assert [e["id"] for e in resp.get_json()["4"]] == [1, 3]
+
+
+def test_index_kept_in_sync(client):
+    resp = client.post("/company", data={"name": "Protoss Conclave", "location": "Aiur"})
+    company_id = resp.get_json()["id"]
+    assert get_ids(client, "/company?q=aiur") == [company_id]
+
+    client.put(f"/company/{company_id}", data={"location": "Shakuras"})
+    assert get_ids(client, "/company?q=aiur") == []
+    assert get_ids(client, "/company?q=shakuras") == [company_id]
+
+    client.delete(f"/company/{company_id}")
+    assert get_ids(client, "/company?q=shakuras") == []
+
+
+def test_postgres_search():
+    search = PostgresFullTextSearch(["name", "location"], config="simple")
+    statement = search.search(select(Company), Company, "terran korhal", ranked=True)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "to_tsvector" in sql
+    assert "concat_ws" in sql
+    assert "@@ websearch_to_tsquery" in sql
+    assert "ORDER BY ts_rank(" in sql
+
+    with pytest.raises(ValueError, match="Unknown searchable column password"):
+        PostgresFullTextSearch(["password"]).search(select(Company), Company, "x", False)
@@ -0,0 +1,131 @@
+from http import HTTPStatus
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+from flask_restalchemy import Api
+from flask_restalchemy.guardrails import Estimate, QueryGuardrails, explain_estimate
+from flask_restalchemy.tests.sample_model import Company, Employee, db
+
+
+def slow_condition(rows):
+    """Condition counting the given number of rows, taking about 0.5s per million on SQLite."""
+    return text(
+        f"(WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c LIMIT {rows}) "
+        "SELECT count(*) FROM c) > 0"
+    )
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    terrans = Company(id=3, name="Terrans", location="Korhal")
+    db_session.add_all([Company(id=i, name=f"Company {i}") for i in (1, 2, 4, 5)])
+    db_session.add_all(
+        [Employee(id=i, firstname=f"Marine {i}", company=terrans) for i in range(1, 6)]
+    )
+    db_session.commit()
+
+
+def get_ids(client, url):
+    resp = client.get(url)
+    assert resp.status_code == HTTPStatus.OK
+    data = resp.get_json()
+    if isinstance(data, dict):
+        data = data["results"]
+    return [item["id"] for item in data]
+
+
+def test_limits(flask_app, client):
+    api = Api(flask_app, guardrails=QueryGuardrails(default_limit=2, max_limit=3))
+    api.add_model(Company)
+    api.add_relation(Company.employees)
+    api.add_model(Employee, guardrails=QueryGuardrails())
+
+    assert get_ids(client, "/company?order_by=id") == [1, 2]
+    assert get_ids(client, "/company?order_by=id&limit=3") == [1, 2, 3]
+    assert get_ids(client, "/company/3/employees?order_by=-id") == [5, 4]
+    assert len(get_ids(client, "/employee")) == 5
+
+    resp = client.get("/company?order_by=id&page=2")
+    assert resp.get_json()["per_page"] == 2
+    assert resp.get_json()["count"] == 5
+    assert [c["id"] for c in resp.get_json()["results"]] == [3, 4]
+
+    # Counts are not limited
+    assert client.get("/company?count=true").get_json() == {"count": 5}
+    assert client.head("/company").headers["X-Total-Count"] == "5"
+
+    urls = ["/company?limit=4", "/company?page=1&per_page=4", "/company/3/employees?limit=5"]
+    for url in urls:
+        resp = client.get(url)
+        assert resp.status_code == HTTPStatus.BAD_REQUEST
+        assert "must not exceed 3" in resp.get_data(as_text=True)
+    resp = client.post("/company/search", json={"filter": {}, "limit": 10})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_statement_timeout(flask_app, client):
+    api = Api(flask_app, guardrails=QueryGuardrails(statement_timeout=0.05))
+    api.add_model(Company, query_modifier=lambda query, model: query.filter(slow_condition(10**8)))
+    api.add_model(Employee)
+
+    resp = client.get("/company")
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert "exceeded the timeout of 0.05s" in resp.get_data(as_text=True)
+    assert client.head("/company").status_code == HTTPStatus.BAD_REQUEST
+
+    # The timeout is removed at the end of the request
+    db.session.remove()
+    assert db.session.execute(select(Company.id).filter(slow_condition(10**6)).limit(1)).all()
+    assert len(get_ids(client, "/employee")) == 5
+
+    # Writes are not limited
+    resp = client.post("/company", data={"name": "Zerg"})
+    assert resp.status_code == HTTPStatus.CREATED
+
+
+def test_cost_rejection(flask_app, client):
+    estimated = []
+
+    def estimator(connection, statement):
+        estimated.append(statement)
+        # Pretend the table has a thousand rows
+        rows = statement._limit or 1000
+        return Estimate(cost=rows * 10.0, rows=rows)
+
+    api = Api(flask_app)
+    api.add_model(Company, guardrails=QueryGuardrails(max_rows=100, estimator=estimator))
+    api.add_relation(
+        Company.employees, guardrails=QueryGuardrails(max_cost=500, estimator=estimator)
+    )
+
+    resp = client.get("/company")
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert "estimated rows 1000 exceed 100" in resp.get_data(as_text=True)
+    assert client.get("/company?count=true").status_code == HTTPStatus.BAD_REQUEST
+
+    assert len(get_ids(client, "/company?limit=100")) == 5
+    # The estimated query is the requested page
+    assert len(get_ids(client, "/company?page=1&per_page=3")) == 3
+    assert estimated[-1]._limit == 3
+
+    resp = client.get("/company/3/employees")
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert "estimated cost 10000.0 exceeds 500" in resp.get_data(as_text=True)
+    assert len(get_ids(client, "/company/3/employees?page=1")) == 5
+
+
+def test_explain_estimate(mocker):
+    connection = mocker.Mock()
+    connection.dialect = postgresql.psycopg2.dialect()
+    result = connection.exec_driver_sql.return_value
+    result.scalar.return_value = [{"Plan": {"Total Cost": 12.5, "Plan Rows": 3}}]
+
+    statement = select(Company).where(Company.name == "Terrans")
+    assert explain_estimate(connection, statement) == Estimate(12.5, 3)
+    sql, params = connection.exec_driver_sql.call_args[0]
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert params == {"name_1": "Terrans"}
+
+    assert explain_estimate(db.session.connection(), statement) is None
@@ -0,0 +1,113 @@
+from datetime import datetime
+from http import HTTPStatus
+
+import time
+
+import pytest
+from sqlalchemy import update
+
+from flask_restalchemy import Api
+from flask_restalchemy.memoization import DumpCache
+from flask_restalchemy.serialization import ModelSerializer
+from flask_restalchemy.tests.sample_model import Company, Employee, Note
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    db_session.add_all(
+        [
+            Company(id=1, name="Protoss", location="Aiur"),
+            Company(id=2, name="Terrans", location="Korhal"),
+            Employee(id=1, firstname="Jim", company_id=2),
+            Note(id=1, text="Build pylons", updated_at=datetime(2020, 1, 1)),
+            Note(id=2, text="Gather minerals", updated_at=datetime(2020, 1, 2)),
+        ]
+    )
+    db_session.commit()
+
+
+@pytest.fixture
+def cache():
+    return DumpCache(max_age=60)
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app, cache):
+    api = Api(flask_app, dump_cache=cache)
+    api.add_model(Company)
+    api.add_model(Note)
+    api.add_relation(Company.employees)
+    api.add_relation_links(Company.employees)
+    return api
+
+
+def test_dump_cache(client, cache):
+    assert len(client.get("/company").get_json()) == 2
+    assert cache.stats() == {"hits": 0, "misses": 2, "hit_rate": 0.0, "size": 2}
+    assert client.get("/company/1").get_json()["name"] == "Protoss"
+    resp = client.get("/company", query_string={"page": 1, "filter": '{"name": "Terrans"}'})
+    assert resp.get_json()["results"][0]["name"] == "Terrans"
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_rate": 0.5, "size": 2}
+
+    # Aggregations and counts are not cached
+    client.get("/company", query_string={"group_by": "location", "aggregate": "count"})
+    client.get("/company", query_string={"count": "true"})
+    assert cache.stats()["hits"] == 2
+
+
+def test_dump_cache_invalidation(client):
+    client.get("/company")
+    client.put("/company/1", json={"location": "Shakuras"})
+    assert client.get("/company/1").get_json()["location"] == "Shakuras"
+
+    assert client.get("/company/2/employees/1").get_json()["company_id"] == 2
+    client.put("/company/1/employees/links", json=[1])
+    assert client.get("/company/1/employees/1").get_json()["company_id"] == 1
+    client.put("/company/1/employees/1", json={"lastname": "Raynor"})
+    assert client.get("/company/1/employees/1").get_json()["lastname"] == "Raynor"
+    client.delete("/company/1/employees/1")
+    assert client.get("/company/1/employees/1").status_code == HTTPStatus.NOT_FOUND
+
+    client.delete("/company/2")
+    assert [company["id"] for company in client.get("/company").get_json()] == [1]
+
+
+def test_dump_cache_version(client, cache, db_session):
+    assert client.get("/note/1").get_json()["text"] == "Build pylons"
+    # Written without the Api, but the version changes
+    db_session.execute(
+        update(Note).where(Note.id == 1).values(text="Build cannons", updated_at=datetime.now())
+    )
+    db_session.commit()
+    assert client.get("/note/1").get_json()["text"] == "Build cannons"
+    assert cache.stats()["hits"] == 0
+    client.get("/note/1")
+    assert cache.stats()["hits"] == 1
+
+
+def test_dump_cache_max_age(client, cache, db_session, mocker):
+    assert client.get("/company/1").get_json()["location"] == "Aiur"
+    # Written without the Api, models without a version are stale until they expire
+    db_session.execute(update(Company).where(Company.id == 1).values(location="Shakuras"))
+    db_session.commit()
+    assert client.get("/company/1").get_json()["location"] == "Aiur"
+    mocker.patch.object(time, "monotonic", return_value=time.monotonic() + 61)
+    assert client.get("/company/1").get_json()["location"] == "Shakuras"
+
+    # Without max_age, only models with a version are cached
+    cache = DumpCache()
+    cache.dump(ModelSerializer(Company), db_session.get(Company, 1))
+    cache.dump(ModelSerializer(Note), db_session.get(Note, 1))
+    assert cache.stats()["size"] == 1
+
+
+def test_dump_cache_eviction(db_session):
+    cache = DumpCache(max_size=1, max_age=60)
+    serializer = ModelSerializer(Company)
+    protoss, terrans = db_session.get(Company, 1), db_session.get(Company, 2)
+    cache.dump(serializer, protoss)
+    cache.dump(serializer, terrans)
+    assert cache.stats()["size"] == 1
+    cache.dump(serializer, terrans)
+    cache.dump(serializer, protoss)
+    assert cache.stats()["hits"] == 1
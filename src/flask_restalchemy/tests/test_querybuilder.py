@@ -1,11 +1,23 @@
 import json
+from datetime import datetime
 from http import HTTPStatus
 
 import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Query
+from serialchemy.field import DefaultFieldSerializer
+from serialchemy.serializer import Serializer
 
 from flask_restalchemy import Api
+from flask_restalchemy.resources.querybuilder import (
+    CollationOrder,
+    NormalizedColumnOrder,
+    create_collection_query,
+    parse_values,
+    raw_order,
+)
 from flask_restalchemy.tests.employer_serializer import EmployeeSerializer
-from flask_restalchemy.tests.sample_model import Company, Employee, Address
+from flask_restalchemy.tests.sample_model import Company, ContactType, Employee, Address
 
 
 @pytest.fixture(autouse=True)
@@ -39,6 +51,51 @@ def test_order(client):
     assert data_list[1]["name"] == "vanessa"
 
 
+def test_order_by_strategies(flask_app, client):
+    api = Api(flask_app)
+    strategies = {
+        "raw": {"name": raw_order},
+        "nocase": {"name": CollationOrder("NOCASE")},
+        # Any column of the model could hold the normalized values
+        "normalized": {"name": NormalizedColumnOrder("location")},
+    }
+    for view_name, order_by_strategies in strategies.items():
+        api.add_model(Company, view_name=view_name, order_by_strategies=order_by_strategies)
+
+    def get_names(url):
+        return [company["name"] for company in client.get(url).get_json()]
+
+    names = get_names("/raw?order_by=name")
+    assert names == sorted(names)
+    assert names[-3:] == ["Von", "abe", "vanessa"]
+    assert get_names("/nocase?order_by=name") == get_names("/company?order_by=name")
+    assert get_names("/nocase?order_by=-name")[:2] == ["Von", "vanessa"]
+
+    companies = client.get("/normalized?order_by=name").get_json()
+    assert [c["location"] for c in companies] == sorted(location for _, location in CLIENTS)
+
+
+def test_order_by_expressions():
+    def order_by_sql(model_class, order_by, strategies=None):
+        args = {"order_by": order_by}
+        statement = select(model_class)
+        statement = create_collection_query(statement, model_class, None, args, strategies)
+        return str(statement).split("ORDER BY ")[1]
+
+    # Parameterized string types are ordered case-insensitively too
+    assert (
+        order_by_sql(ContactType, "label,-id")
+        == 'lower("ContactType".label), "ContactType".id DESC'
+    )
+    assert order_by_sql(ContactType, "-label", {"label": raw_order}) == '"ContactType".label DESC'
+    assert (
+        order_by_sql(Company, "name", {"name": CollationOrder("NOCASE")})
+        == '"Company".name COLLATE "NOCASE"'
+    )
+    strategies = {"company.name": NormalizedColumnOrder("location")}
+    assert order_by_sql(Employee, "company.name", strategies) == "\"Company_1\".location"
+
+
 def test_order_by_relation(client, db_session):
     company = Company(name="Headquarters", location="Metropolis")
     db_session.add(company)
@@ -189,6 +246,260 @@ def test_relations_pagination(client):
     assert len(data_list.get("results")) == 5
 
 
+def test_related_columns(client, db_session, mocker):
+    terrans = Company(name="Terrans", location="Korhal")
+    zerg = Company(name="Zerg", location="Char")
+    db_session.add_all(
+        [
+            Employee(
+                firstname="Jim",
+                lastname="Raynor",
+                company=terrans,
+                address=Address(city="Mar Sara"),
+            ),
+            Employee(firstname="Matt", lastname="Horner", company=terrans),
+            Employee(
+                firstname="Sarah",
+                lastname="Kerrigan",
+                company=zerg,
+                address=Address(city="Tarsonis"),
+            ),
+        ]
+    )
+    db_session.commit()
+
+    def get_names(url):
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        return [item["firstname"] for item in response.get_json()]
+
+    filters = json.dumps({"company.location": "Korhal", "company.name": {"startswith": "Ter"}})
+    assert get_names(f"/employee?filter={filters}&order_by=firstname") == ["Jim", "Matt"]
+    filters = json.dumps({"$or": {"company.name": "Zerg", "address.city": "Mar Sara"}})
+    assert get_names(f"/employee?filter={filters}&order_by=-firstname") == ["Sarah", "Jim"]
+    filters = json.dumps({"city": {"in": ["Mar Sara", "Tarsonis"]}})
+    assert get_names(f"/employee?filter={filters}&order_by=firstname") == ["Jim", "Sarah"]
+
+    # Employees without company come first, relationships are joined once
+    spy = mocker.spy(Query, "outerjoin")
+    names = get_names("/employee?order_by=company.location,-company.name,firstname")
+    assert names == ["John", "Sarah", "Jim", "Matt"]
+    assert spy.call_count == 1
+
+    # To-many relationships are filtered with EXISTS, without duplicating rows
+    filters = json.dumps({"employees.lastname": "Raynor", "employees.firstname": "Jim"})
+    response = client.get(f"/company?filter={filters}")
+    assert [c["name"] for c in response.get_json()] == ["Terrans"]
+    filters = json.dumps({"employees.lastname": "Raynor", "employees.firstname": "Matt"})
+    assert client.get(f"/company?filter={filters}").get_json() == []
+
+    filters = json.dumps({"employees.company.location": "Char"})
+    response = client.get(f"/company?filter={filters}&count=true")
+    assert response.get_json() == {"count": 1}
+
+    # Values of related columns are loaded by the related model serializer
+    filters = json.dumps({"employees.admission": "2000-01-01T00:00:00"})
+    response = client.get(f"/company?filter={filters}&order_by=name")
+    assert [c["name"] for c in response.get_json()] == ["Terrans", "Zerg"]
+    filters = json.dumps({"employees.admission": {"ge": "2000-01-01T00:00:00"}})
+    response = client.get(f"/company?filter={filters}&order_by=name")
+    assert [c["name"] for c in response.get_json()] == ["Terrans", "Zerg"]
+    filters = json.dumps({"employees.admission": {"gt": "2000-01-01T00:00:00"}})
+    assert client.get(f"/company?filter={filters}").get_json() == []
+
+    response = client.get('/employee?filter={"company.bogus": 1}')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert "Unknown column bogus" in response.get_data(as_text=True)
+    response = client.get('/employee?filter={"bogus": 1}')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    response = client.get('/employee?filter={"firstname.name": "Jim"}')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert "Unknown relationship firstname" in response.get_data(as_text=True)
+    response = client.get('/company?filter={"nope.x": 1}')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert "Unknown relationship nope" in response.get_data(as_text=True)
+    response = client.get("/company?order_by=employees.firstname")
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert "Can not order by to-many relationship employees" in response.get_data(as_text=True)
+
+
+def test_search(client, db_session):
+    company_ids = [c.id for c in db_session.query(Company).order_by(Company.id)]
+    ids = list(range(-20000, 0)) + company_ids[:3] + company_ids[:3]
+
+    body = {"filter": {"id": {"in": ids}}, "order_by": "-id"}
+    response = client.post("/company/search", json=body)
+    assert response.status_code == HTTPStatus.OK
+    assert [c["id"] for c in response.get_json()] == company_ids[2::-1]
+
+    body = {"filter": {"name": {"startswith": "L"}}, "order_by": "name", "page": 1, "per_page": 2}
+    data = client.post("/company/search", json=body).get_json()
+    assert data["count"] == 4
+    assert [c["name"] for c in data["results"]] == ["Lakia", "Laverna"]
+
+    body = {"filter": {"name": {"startswith": "L"}}, "count": True}
+    assert client.post("/company/search", json=body).get_json() == {"count": 4}
+
+    company_id = company_ids[0]
+    client.post(f"/company/{company_id}/employees", data={"firstname": "Jim"})
+    client.post(f"/company/{company_id}/employees", data={"firstname": "Matt"})
+    body = {"filter": {"firstname": {"in": ["Matt", "Tychus"]}}}
+    response = client.post(f"/company/{company_id}/employees/search", json=body)
+    assert [e["firstname"] for e in response.get_json()] == ["Matt"]
+    response = client.post("/company/999/employees/search", json={})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    admissions = ["2000-01-01T00:00:00", "2010-07-27T00:00:00"]
+    body = {"filter": {"admission": {"in": admissions}}, "order_by": "firstname"}
+    response = client.post("/employee/search", json=body)
+    assert [e["firstname"] for e in response.get_json()] == ["Jim", "John", "Matt"]
+
+    assert client.post("/company", json={"name": "Search"}).status_code == HTTPStatus.CREATED
+    for invalid_body in [[1, 2], {"filter": "name"}]:
+        response = client.post("/company/search", json=invalid_body)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_parse_values():
+    class UpperSerializer(Serializer):
+        def dump(self, value):
+            return value
+
+        def load(self, serialized, session=None):
+            loaded.append(serialized)
+            return serialized.upper()
+
+    loaded = []
+    assert parse_values(["a", "b", "a"], UpperSerializer()) == ["A", "B"]
+    assert loaded == ["a", "b"]
+    values = list(range(1000))
+    assert parse_values(values + values, DefaultFieldSerializer()) == values
+
+
+def test_aggregation(client, db_session):
+    terrans = Company(name="Terrans", location="Korhal")
+    zerg = Company(name="Zerg", location="Korhal")
+    db_session.add_all(
+        [
+            Employee(firstname="Jim", lastname="Raynor", company=terrans),
+            Employee(firstname="John", lastname="Raynor", company=terrans),
+            Employee(
+                firstname="Sarah",
+                lastname="Kerrigan",
+                company=zerg,
+                admission=datetime(2010, 7, 27),
+            ),
+        ]
+    )
+    db_session.commit()
+
+    response = client.get("/company?agg=count(*)")
+    assert response.get_json() == [{"count(*)": 24}]
+
+    response = client.get(
+        "/company?group_by=location&agg=count(id),min(name)&order_by=location"
+        + '&filter={"name": {"in": ["Terrans", "Zerg", "Tyson"]}}'
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.get_json() == [
+        {"location": "Korhal", "count(id)": 2, "min(name)": "Terrans"},
+        {"location": "syncretise", "count(id)": 1, "min(name)": "Tyson"},
+    ]
+
+    # Group columns and min/max values are dumped by the serializer fields
+    response = client.get(
+        "/employee?group_by=company_id&agg=count(*),max(admission)&order_by=-company_id"
+        + '&filter={"company_id": {"isnot": null}}'
+    )
+    assert response.get_json() == [
+        {"company_id": zerg.id, "count(*)": 1, "max(admission)": "2010-07-27T00:00:00"},
+        {"company_id": terrans.id, "count(*)": 2, "max(admission)": "2000-01-01T00:00:00"},
+    ]
+
+    # Aggregates could be ordered by too
+    response = client.get(
+        "/company?group_by=location&agg=count(id)&order_by=-count(id),location"
+        + '&filter={"name": {"in": ["Terrans", "Zerg", "Tyson"]}}'
+    )
+    assert response.get_json() == [
+        {"location": "Korhal", "count(id)": 2},
+        {"location": "syncretise", "count(id)": 1},
+    ]
+
+    response = client.get(
+        f"/company/{terrans.id}/employees?group_by=lastname&agg=count(*)&page=1"
+    )
+    data = response.get_json()
+    assert data["count"] == 1
+    assert data["results"] == [{"lastname": "Raynor", "count(*)": 2}]
+
+    response = client.get("/company/999/employees?group_by=lastname")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    for invalid_args in [
+        "agg=median(id)",
+        "agg=sum(*)",
+        "agg=count(unknown)",
+        "agg=max(password)",
+        "group_by=password",
+        "group_by=lastname&agg=count(id)&order_by=firstname",
+        "group_by=lastname&order_by=company.name",
+        "agg=count(id)&order_by=-max(id)",
+    ]:
+        response = client.get(f"/employee?{invalid_args}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST, invalid_args
+
+
+def test_facets(client, db_session):
+    terrans = Company(name="Terrans", location="Korhal")
+    db_session.add_all(
+        [
+            Company(name="Zerg", location="Char"),
+            Company(name="Dominion", location="Korhal"),
+            Employee(firstname="Jim", lastname="Raynor", company=terrans),
+            Employee(firstname="John", lastname="Raynor", company=terrans),
+            Employee(firstname="Sarah", lastname="Kerrigan", company=terrans),
+        ]
+    )
+    db_session.commit()
+
+    names = {"name": {"in": ["Terrans", "Zerg", "Dominion"]}}
+    response = client.get(
+        f"/company?facets=location,name&facet_limit=2&filter={json.dumps(names)}"
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.get_json() == {
+        "facets": {
+            "location": [{"value": "Korhal", "count": 2}, {"value": "Char", "count": 1}],
+            "name": [{"value": "Dominion", "count": 1}, {"value": "Terrans", "count": 1}],
+        }
+    }
+
+    # The facet own filter is ignored, so the alternatives are listed
+    filters = json.dumps({"location": "Char", **names})
+    response = client.get(
+        f"/company?facets=location&facet_exclude_own=true&filter={filters}"
+    )
+    facet = response.get_json()["facets"]["location"]
+    assert facet == [{"value": "Korhal", "count": 2}, {"value": "Char", "count": 1}]
+    response = client.get('/company?facets=location&filter={"location": "Char"}')
+    assert response.get_json()["facets"]["location"] == [{"value": "Char", "count": 1}]
+
+    response = client.get(f"/company/{terrans.id}/employees?facets=lastname,company_id")
+    assert response.get_json() == {
+        "facets": {
+            "lastname": [{"value": "Raynor", "count": 2}, {"value": "Kerrigan", "count": 1}],
+            "company_id": [{"value": terrans.id, "count": 3}],
+        }
+    }
+    response = client.get("/company/999/employees?facets=lastname")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    for invalid_args in ["facets=password", "facets=name&facet_limit=-1"]:
+        response = client.get(f"/employee?{invalid_args}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST, invalid_args
+
+
 CLIENTS = [
     ("Tyson", "syncretise"),
     ("Shandi", "pace"),
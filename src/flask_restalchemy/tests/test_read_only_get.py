@@ -0,0 +1,112 @@
+from http import HTTPStatus
+
+import pytest
+from sqlalchemy import event, text
+
+from flask_restalchemy import Api
+from flask_restalchemy.resources.resources import get_row_columns
+from flask_restalchemy.serialization import ModelSerializer
+from flask_restalchemy.tests.employer_serializer import EmployeeSerializer
+from flask_restalchemy.tests.sample_model import Address, Company, Employee, db
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    terrans = Company(id=3, name="Terrans", location="Korhal")
+    address = Address(id=1, city="Mar Sara")
+    db_session.add(Company(id=1, name="Protoss", location="Aiur"))
+    db_session.add(Employee(id=9, firstname="Jim", company=terrans, address=address))
+    db_session.add(Employee(id=3, firstname="Sarah", company=terrans))
+    db_session.commit()
+    db_session.expunge_all()
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app):
+    api = Api(flask_app)
+    api.add_model(Company, read_only_get=True)
+    api.add_model(Employee, serializer_class=EmployeeSerializer, read_only_get=True)
+    api.add_relation(Company.employees, read_only_get=True)
+    api.add_property(Employee, Employee, "colleagues", read_only_get=True)
+    return api
+
+
+@pytest.fixture
+def statements(db_session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def loaded_entities():
+    loaded = []
+
+    def on_load(target, context):
+        loaded.append(target)
+
+    event.listen(Company, "load", on_load)
+    event.listen(Employee, "load", on_load)
+    yield loaded
+    event.remove(Company, "load", on_load)
+    event.remove(Employee, "load", on_load)
+
+
+def test_rows_for_column_serializers(client, db_session, statements, loaded_entities):
+    resp = client.get("/company?order_by=name")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json() == [
+        {"id": 1, "name": "Protoss", "location": "Aiur"},
+        {"id": 3, "name": "Terrans", "location": "Korhal"},
+    ]
+    assert client.get("/company/3").get_json()["name"] == "Terrans"
+    assert client.get("/company/999").status_code == HTTPStatus.NOT_FOUND
+
+    resp = client.get("/company/3/employees?order_by=id&page=1")
+    data = resp.get_json()
+    assert data["count"] == 2
+    assert [e["firstname"] for e in data["results"]] == ["Sarah", "Jim"]
+    assert data["results"][0]["admission"] == "2000-01-01T00:00:00"
+
+    # Rows were fetched, no entity was loaded by the ORM
+    assert loaded_entities == []
+
+    resp = client.get("/employee/9/colleagues?order_by=-id")
+    assert [e["id"] for e in resp.get_json()] == [9, 3]
+
+    assert "PRAGMA query_only = ON" in statements
+    assert db_session.execute(text("PRAGMA query_only")).scalar() == 0
+
+
+def test_entities_for_nested_serializers(client, db_session, loaded_entities):
+    resp = client.get("/employee/9")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json()["address"]["city"] == "Mar Sara"
+    assert resp.get_json()["company_name"] == "Terrans"
+    assert len(loaded_entities) > 0
+
+    resp = client.get("/employee?order_by=id")
+    assert [e["firstname"] for e in resp.get_json()] == ["Sarah", "Jim"]
+
+
+def test_writes_still_allowed(client, db_session):
+    resp = client.post("/company", data={"name": "Zerg"})
+    assert resp.status_code == HTTPStatus.CREATED
+    resp = client.put("/company/1", data={"location": "Shakuras"})
+    assert resp.status_code == HTTPStatus.OK
+    assert client.get("/company/1").get_json()["location"] == "Shakuras"
+    assert db_session.get(Company, 1).location == "Shakuras"
+
+
+def test_get_row_columns():
+    assert get_row_columns(Company, ModelSerializer(Company)) == [
+        Company.id,
+        Company.name,
+        Company.location,
+    ]
+    assert get_row_columns(Employee, EmployeeSerializer(Employee)) is None
@@ -0,0 +1,107 @@
+import time
+from http import HTTPStatus
+
+import pytest
+from flask import Flask
+
+from flask_restalchemy import Api
+from flask_restalchemy.tests.sample_model import Company, Employee, db
+
+
+@pytest.fixture()
+def flask_app(tmp_path):
+    app = Flask("flask_restalchemy_replica")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'primary.sqlite'}"
+    app.config["SQLALCHEMY_BINDS"] = {"replica": f"sqlite:///{tmp_path / 'replica.sqlite'}"}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines["replica"])
+        # Data differs between databases, so the responses tell which one was used
+        db.session.add(Company(id=1, name="Primary Corp"))
+        db.session.add(Employee(id=1, firstname="Jim", company_id=1))
+        db.session.commit()
+        with db.engines["replica"].begin() as connection:
+            connection.execute(Company.__table__.insert(), [{"id": 1, "name": "Replica Corp"}])
+            connection.execute(
+                Employee.__table__.insert(), [{"id": 1, "firstname": "Jim", "company_id": 1}]
+            )
+        yield app
+        db.session.remove()
+    # Flask-SQLAlchemy registers a metadata for each bind of the shared `db`
+    db.metadatas.pop("replica", None)
+
+
+def create_api(flask_app, **kwargs):
+    api = Api(flask_app, read_replica_bind="replica", **kwargs)
+    api.add_model(Company)
+    api.add_relation(Company.employees)
+    api.add_property(Employee, Employee, "colleagues")
+    return api
+
+
+def test_reads_use_replica(flask_app):
+    create_api(flask_app)
+    client = flask_app.test_client()
+
+    assert client.get("/company/1").get_json()["name"] == "Replica Corp"
+    assert [c["name"] for c in client.get("/company").get_json()] == ["Replica Corp"]
+    assert client.head("/company/1").status_code == HTTPStatus.OK
+    assert [e["id"] for e in client.get("/company/1/employees").get_json()] == [1]
+    assert [e["id"] for e in client.get("/employee/1/colleagues").get_json()] == [1]
+
+    resp = client.put("/company/1", data={"location": "Korhal"})
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json()["name"] == "Primary Corp"
+    assert "restalchemy_last_write" not in resp.headers.get("Set-Cookie", "")
+
+    # Without read-your-writes, reads keep going to the replica
+    assert client.get("/company/1").get_json()["name"] == "Replica Corp"
+
+
+def test_read_your_writes(flask_app, mocker):
+    create_api(flask_app, read_your_writes=5)
+    client = flask_app.test_client()
+    assert client.get("/company/1").get_json()["name"] == "Replica Corp"
+
+    resp = client.post("/company", data={"name": "New Corp"})
+    assert resp.status_code == HTTPStatus.CREATED
+    assert "restalchemy_last_write" in resp.headers["Set-Cookie"]
+
+    resp = client.get("/company/1")
+    assert resp.get_json()["name"] == "Primary Corp"
+    # Reads inside the window do not extend it
+    assert "Set-Cookie" not in resp.headers
+    assert len(client.get("/company").get_json()) == 2
+
+    # Other clients still read from the replica
+    assert flask_app.test_client().get("/company/1").get_json()["name"] == "Replica Corp"
+
+    # Failed writes do not open the window
+    other_client = flask_app.test_client()
+    assert other_client.put("/company/999", data={}).status_code == HTTPStatus.NOT_FOUND
+    assert other_client.get("/company/1").get_json()["name"] == "Replica Corp"
+
+    # After the window, reads go back to the replica
+    mocker.patch.object(time, "time", return_value=time.time() + 10)
+    assert client.get("/company/1").get_json()["name"] == "Replica Corp"
+
+
+def test_read_your_writes_batch(flask_app):
+    api = create_api(flask_app, read_your_writes=5)
+    api.add_batch()
+    client = flask_app.test_client()
+
+    requests = [{"method": "POST", "path": "/company", "body": {"name": "New Corp"}}]
+    resp = client.post("/batch", json={"requests": requests})
+    assert resp.status_code == HTTPStatus.OK
+    # The batch response is marked, not the sub-response
+    assert "restalchemy_last_write" in resp.headers["Set-Cookie"]
+    assert "Set-Cookie" not in resp.get_json()[0]["headers"]
+    assert client.get("/company/1").get_json()["name"] == "Primary Corp"
+
+
+def test_no_replica_outside_requests(flask_app):
+    api = create_api(flask_app)
+    assert api.get_db_session() is db.session
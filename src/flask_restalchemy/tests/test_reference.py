@@ -0,0 +1,123 @@
+from http import HTTPStatus
+
+import pytest
+from sqlalchemy import event
+
+from flask_restalchemy import Api
+from flask_restalchemy.reference import ReferenceCache, ReferenceField, ReferenceSnapshot
+from flask_restalchemy.serialization import ModelSerializer
+from flask_restalchemy.tests.sample_model import Contact, ContactType, db
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    db_session.add_all([ContactType(id=1, label="email"), ContactType(id=2, label="phone")])
+    db_session.add_all(
+        [
+            Contact(id=1, type_id=1, value="jim@raynor.co"),
+            Contact(id=2, type_id=2, value="555-0101"),
+            Contact(id=3, type_id=1, value="sarah@kerrigan.co"),
+        ]
+    )
+    db_session.commit()
+
+
+@pytest.fixture
+def cache():
+    return ReferenceCache()
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app, cache):
+    class ContactSerializer(ModelSerializer):
+        type = ReferenceField(ContactType, cache)
+
+    api = Api(flask_app, reference_cache=cache)
+    api.add_model(ContactType, reference=True)
+    api.add_model(Contact, serializer_class=ContactSerializer)
+    return api
+
+
+@pytest.fixture
+def count_queries(db_session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_reference_model(client, count_queries):
+    assert client.get("/contacttype").get_json() == [
+        {"id": 1, "label": "email"},
+        {"id": 2, "label": "phone"},
+    ]
+    assert len(count_queries) == 1
+    assert client.get("/contacttype/2").get_json() == {"id": 2, "label": "phone"}
+    assert client.get("/contacttype/3").status_code == HTTPStatus.NOT_FOUND
+    resp = client.head("/contacttype")
+    assert resp.headers["X-Total-Count"] == "2"
+    assert client.head("/contacttype/3").status_code == HTTPStatus.NOT_FOUND
+    # Served from the snapshot
+    assert len(count_queries) == 1
+
+    # Requests with collection arguments query the database
+    resp = client.get("/contacttype", query_string={"order_by": "-label"})
+    assert [contact_type["label"] for contact_type in resp.get_json()] == ["phone", "email"]
+    assert len(count_queries) == 2
+
+
+def test_reference_invalidation(client):
+    client.get("/contacttype")
+    client.post("/contacttype", json={"label": "fax"})
+    assert len(client.get("/contacttype").get_json()) == 3
+    client.put("/contacttype/3", json={"label": "pager"})
+    assert client.get("/contacttype/3").get_json()["label"] == "pager"
+    client.delete("/contacttype/3")
+    assert client.get("/contacttype/3").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_reference_loaded_while_written(db_session, monkeypatch):
+    cache = ReferenceCache()
+    serializer = ModelSerializer(ContactType)
+    load = ReferenceSnapshot.load
+
+    def load_while_written(*args):
+        snapshot = load(*args)
+        cache.invalidate(ContactType)
+        return snapshot
+
+    monkeypatch.setattr(ReferenceSnapshot, "load", load_while_written)
+    snapshot = cache.get_snapshot(db_session, ContactType, serializer)
+    # Discarded, since it might miss the write
+    monkeypatch.setattr(ReferenceSnapshot, "load", load)
+    assert cache.get_snapshot(db_session, ContactType, serializer) is not snapshot
+    snapshot = cache.get_snapshot(db_session, ContactType, serializer)
+    assert cache.get_snapshot(db_session, ContactType, serializer) is snapshot
+    assert snapshot.version == 1
+
+
+def test_reference_field(client, count_queries):
+    resp = client.get("/contact")
+    assert [contact["type"] for contact in resp.get_json()] == [
+        {"id": 1, "label": "email"},
+        {"id": 2, "label": "phone"},
+        {"id": 1, "label": "email"},
+    ]
+    count = len(count_queries)
+    client.get("/contact")
+    # The snapshot is kept, only the contacts and their types are loaded again
+    assert len(count_queries) == 2 * count - 1
+    client.put("/contacttype/1", json={"label": "e-mail"})
+    assert client.get("/contact/1").get_json()["type"] == {"id": 1, "label": "e-mail"}
+
+
+def test_reference_max_age(client, db_session):
+    cache = ReferenceCache(max_age=0)
+    serializer = ModelSerializer(ContactType)
+    snapshot = cache.get_snapshot(db_session, ContactType, serializer)
+    assert snapshot.get(1) == {"id": 1, "label": "email"}
+    assert cache.get_snapshot(db_session, ContactType, serializer) is not snapshot
@@ -0,0 +1,156 @@
+from http import HTTPStatus
+
+import pytest
+from flask import Blueprint, g
+from sqlalchemy import create_engine
+
+from flask_restalchemy import Api
+from flask_restalchemy.memoization import DumpCache
+from flask_restalchemy.reference import ReferenceCache
+from flask_restalchemy.routing import (
+    HeaderShardResolver,
+    RequestAttributeShardResolver,
+    Shard,
+    ShardRouter,
+    UrlShardResolver,
+)
+from flask_restalchemy.tests.sample_model import Company, Employee, db
+
+
+@pytest.fixture()
+def shards(tmp_path):
+    shards = {}
+    for name in ["zerg", "protoss"]:
+        url = f"sqlite:///{tmp_path / name}.sqlite"
+        engine = create_engine(url)
+        db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(Company.__table__.insert(), [{"id": 1, "name": f"{name} corp"}])
+            connection.execute(
+                Employee.__table__.insert(), [{"id": 1, "firstname": name, "company_id": 1}]
+            )
+        engine.dispose()
+        shards[name] = url
+    return shards
+
+
+def create_api(blueprint, router):
+    api = Api(blueprint, shard_router=router)
+    api.add_model(Company)
+    api.add_relation(Company.employees)
+    return api
+
+
+def test_header_resolver(flask_app, db_session, shards):
+    router = ShardRouter(HeaderShardResolver("X-Tenant"), shards)
+    create_api(flask_app, router)
+    client = flask_app.test_client()
+
+    resp = client.get("/company/1", headers={"X-Tenant": "zerg"})
+    assert resp.get_json()["name"] == "zerg corp"
+    resp = client.get("/company/1/employees", headers={"X-Tenant": "protoss"})
+    assert [e["firstname"] for e in resp.get_json()] == ["protoss"]
+
+    resp = client.post("/company", data={"name": "Overmind"}, headers={"X-Tenant": "zerg"})
+    assert resp.status_code == HTTPStatus.CREATED
+    resp = client.get("/company", headers={"X-Tenant": "zerg"})
+    assert [c["name"] for c in resp.get_json()] == ["zerg corp", "Overmind"]
+    resp = client.get("/company", headers={"X-Tenant": "protoss"})
+    assert [c["name"] for c in resp.get_json()] == ["protoss corp"]
+
+    # Unknown tenants are not found, requests without a tenant use the default session
+    resp = client.get("/company/1", headers={"X-Tenant": "terran"})
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/company").get_json() == []
+
+    # Engines are reused across requests and tenants on the same node
+    assert len(router._engines) == 2
+    router.dispose()
+
+
+def test_url_resolver(flask_app, db_session, shards):
+    blueprint = Blueprint("tenants", __name__, url_prefix="/<tenant>")
+    router = ShardRouter(UrlShardResolver("tenant"), lambda key: shards.get(key))
+    create_api(blueprint, router)
+    flask_app.register_blueprint(blueprint)
+    client = flask_app.test_client()
+
+    assert client.get("/zerg/company/1").get_json()["name"] == "zerg corp"
+    assert client.get("/protoss/company/1").get_json()["name"] == "protoss corp"
+    assert client.get("/terran/company/1").status_code == HTTPStatus.NOT_FOUND
+    router.dispose()
+
+
+def test_batch_shard(flask_app, db_session, shards):
+    blueprint = Blueprint("tenants", __name__, url_prefix="/<tenant>")
+    router = ShardRouter(UrlShardResolver("tenant"), shards)
+    create_api(blueprint, router).add_batch()
+    flask_app.register_blueprint(blueprint)
+    client = flask_app.test_client()
+
+    requests = [
+        {"method": "GET", "path": "/zerg/company/1"},
+        {"method": "GET", "path": "/protoss/company/1"},
+    ]
+    resp = client.post("/zerg/batch", json={"requests": requests})
+    responses = resp.get_json()
+    assert responses[0]["body"]["name"] == "zerg corp"
+    # Sub-requests can not reach the data of other tenants
+    assert responses[1]["status"] == HTTPStatus.BAD_REQUEST
+
+    requests = [
+        {"method": "PUT", "path": "/zerg/company/1", "body": {"name": "Overmind"}},
+        {"method": "PUT", "path": "/protoss/company/1", "body": {"name": "Overmind"}},
+    ]
+    resp = client.post("/zerg/batch", json={"requests": requests, "transaction": True})
+    assert resp.status_code == HTTPStatus.FAILED_DEPENDENCY
+    assert [r["status"] for r in resp.get_json()] == [HTTPStatus.OK, HTTPStatus.BAD_REQUEST]
+    assert client.get("/zerg/company/1").get_json()["name"] == "zerg corp"
+    assert client.get("/protoss/company/1").get_json()["name"] == "protoss corp"
+    router.dispose()
+
+
+def test_request_attribute_resolver(flask_app, db_session, shards):
+    @flask_app.before_request
+    def authenticate():
+        g.tenant = "protoss"
+
+    router = ShardRouter(RequestAttributeShardResolver("tenant"), shards)
+    create_api(flask_app, router)
+
+    resp = flask_app.test_client().get("/company/1")
+    assert resp.get_json()["name"] == "protoss corp"
+    router.dispose()
+
+
+def test_shard_caches(flask_app, db_session, shards):
+    router = ShardRouter(HeaderShardResolver("X-Tenant"), shards)
+    api = Api(
+        flask_app,
+        shard_router=router,
+        reference_cache=ReferenceCache(),
+        dump_cache=DumpCache(max_age=60),
+    )
+    api.add_model(Company, reference=True)
+    api.add_model(Employee)
+    client = flask_app.test_client()
+
+    # Tenants do not share the cached rows
+    for tenant in ["zerg", "protoss", "zerg"]:
+        headers = {"X-Tenant": tenant}
+        assert client.get("/company/1", headers=headers).get_json()["name"] == f"{tenant} corp"
+        resp = client.get("/company", headers=headers)
+        assert [c["name"] for c in resp.get_json()] == [f"{tenant} corp"]
+        resp = client.get("/employee/1", headers=headers)
+        assert resp.get_json()["firstname"] == tenant
+    router.dispose()
+
+
+def test_schema_shards_share_engine(shards):
+    router = ShardRouter(HeaderShardResolver("X-Tenant"), {})
+    engine_a = router.get_engine(Shard(shards["zerg"], schema="tenant_a"))
+    engine_b = router.get_engine(Shard(shards["zerg"], schema="tenant_b"))
+    assert engine_a.pool is engine_b.pool
+    assert engine_a.get_execution_options()["schema_translate_map"] == {None: "tenant_a"}
+    assert engine_b.get_execution_options()["schema_translate_map"] == {None: "tenant_b"}
+    router.dispose()
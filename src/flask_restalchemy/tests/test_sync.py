@@ -0,0 +1,154 @@
+import json
+from datetime import datetime, timedelta
+from http import HTTPStatus
+
+import pytest
+from flask import Blueprint
+
+from flask_restalchemy import Api
+from flask_restalchemy.sync import IncrementalSync, TombstoneLog, Watermark
+from flask_restalchemy.tests.sample_model import Company, Employee, Note, db
+
+tombstones = TombstoneLog(db.metadata)
+
+
+@pytest.fixture(autouse=True)
+def create_test_sample(db_session):
+    db_session.add_all(
+        [
+            Note(id=1, text="Build pylons", updated_at=datetime(2020, 1, 1)),
+            Note(id=2, text="Gather minerals", updated_at=datetime(2020, 1, 3)),
+            Note(id=3, text="Build gateway", updated_at=datetime(2020, 1, 2)),
+            # Same update time of another note
+            Note(id=4, text="Scout", updated_at=datetime(2020, 1, 3)),
+        ]
+    )
+    db_session.commit()
+
+
+@pytest.fixture(autouse=True)
+def sample_api(flask_app):
+    api = Api(flask_app)
+    api.add_model(Note, incremental_sync=IncrementalSync("updated_at", tombstones))
+    api.add_model(Company, incremental_sync=IncrementalSync("id"))
+    api.add_relation(Company.employees, incremental_sync=IncrementalSync("id", tombstones))
+    return api
+
+
+def sync(client, since, **args):
+    resp = client.get("/note", query_string={"since": since, **args})
+    assert resp.status_code == HTTPStatus.OK
+    data = resp.get_json()
+    return [note["id"] for note in data["changes"]], data["deleted"], data["watermark"]
+
+
+def test_sync(client):
+    assert sync(client, "") == ([1, 3, 2, 4], [], Watermark("2020-01-03T00:00:00", 4).encode())
+    changes, deleted, watermark = sync(client, "")
+    assert sync(client, watermark) == ([], [], watermark)
+
+    client.put("/note/1", data={"text": "Build more pylons"})
+    resp = client.post("/note", data={"text": "Expand"})
+    assert resp.status_code == HTTPStatus.CREATED
+    assert client.delete("/note/2").status_code == HTTPStatus.NO_CONTENT
+
+    changes, deleted, next_watermark = sync(client, watermark)
+    assert changes == [1, 5]
+    assert deleted == [2]
+    assert sync(client, next_watermark) == ([], [], next_watermark)
+
+    # Other arguments still work without `since`
+    assert [note["id"] for note in client.get("/note?order_by=id").get_json()] == [1, 3, 4, 5]
+
+
+def test_sync_pages(client):
+    watermark = ""
+    pages = []
+    has_more = True
+    while has_more:
+        resp = client.get("/note", query_string={"since": watermark, "limit": 3})
+        data = resp.get_json()
+        pages.append([note["id"] for note in data["changes"]])
+        watermark, has_more = data["watermark"], data["has_more"]
+    assert pages == [[1, 3, 2], [4]]
+
+    filters = json.dumps({"text": {"startswith": "Build"}})
+    assert sync(client, "", filter=filters)[0] == [1, 3]
+
+    # Deletions are limited as well
+    for note_id in (1, 3, 4):
+        client.delete(f"/note/{note_id}")
+    data = client.get("/note", query_string={"since": watermark, "limit": 2}).get_json()
+    assert (data["deleted"], data["has_more"]) == ([1, 3], True)
+    data = client.get("/note", query_string={"since": data["watermark"], "limit": 2}).get_json()
+    assert (data["deleted"], data["has_more"]) == ([4], False)
+
+
+def test_sync_settle_time(flask_app, client, db_session):
+    now = datetime(2020, 1, 3, 12)
+    # A blueprint, since the Note endpoints have the same names
+    blueprint = Blueprint("settled", __name__, url_prefix="/settled")
+    api = Api(blueprint)
+    incremental_sync = IncrementalSync(
+        "updated_at", settle_time=timedelta(hours=1), clock=lambda: now
+    )
+    api.add_model(Note, incremental_sync=incremental_sync)
+    flask_app.register_blueprint(blueprint)
+
+    db_session.add(Note(id=5, text="Expand", updated_at=datetime(2020, 1, 3, 11, 30)))
+    db_session.commit()
+    data = client.get("/settled/note?since=").get_json()
+    assert [note["id"] for note in data["changes"]] == [1, 3, 2, 4]
+
+    # Committed late, with an update time older than the last change returned
+    db_session.add(Note(id=6, text="Tech", updated_at=datetime(2020, 1, 3, 11)))
+    db_session.commit()
+    now = datetime(2020, 1, 3, 13)
+    data = client.get("/settled/note", query_string={"since": data["watermark"]}).get_json()
+    assert [note["id"] for note in data["changes"]] == [6, 5]
+
+
+def test_sync_without_tombstones(client, db_session):
+    db_session.add_all([Company(id=1, name="Protoss"), Company(id=2, name="Zerg")])
+    db_session.commit()
+    data = client.get("/company?since=").get_json()
+    assert [c["id"] for c in data["changes"]] == [1, 2]
+
+    client.delete("/company/1")
+    client.post("/company", data={"name": "Terrans"})
+    data = client.get("/company", query_string={"since": data["watermark"]}).get_json()
+    assert [c["id"] for c in data["changes"]] == [3]
+    assert data["deleted"] == []
+
+
+def test_sync_relation(client, db_session):
+    db_session.add(Company(id=1, name="Terrans"))
+    db_session.add_all([Employee(id=i, firstname=f"Marine {i}", company_id=1) for i in (1, 2)])
+    db_session.add(Employee(id=3, firstname="Zergling"))
+    db_session.commit()
+    data = client.get("/company/1/employees?since=").get_json()
+    assert [e["id"] for e in data["changes"]] == [1, 2]
+
+    assert client.delete("/company/1/employees/1").status_code == HTTPStatus.NO_CONTENT
+    client.post("/company/1/employees", data={"firstname": "Marine 4"})
+    data = client.get("/company/1/employees", query_string={"since": data["watermark"]})
+    data = data.get_json()
+    assert [e["id"] for e in data["changes"]] == [4]
+    assert data["deleted"] == [1]
+
+    resp = client.get("/company/999/employees?since=")
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_invalid_watermark(client):
+    invalid_watermarks = [
+        "invalid",
+        Watermark().encode()[:-2],
+        Watermark(deleted="1").encode(),
+        Watermark("1st of January").encode(),
+    ]
+    for since in invalid_watermarks:
+        resp = client.get("/note", query_string={"since": since})
+        assert resp.status_code == HTTPStatus.BAD_REQUEST
+    resp = client.get("/note", query_string={"since": "", "limit": "all"})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST